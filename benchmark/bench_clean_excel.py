@@ -0,0 +1,104 @@
+"""
+Benchmark pembersihan hasil upload Excel:
+clean_excel_apostrophe_loop (apply per sel, semua kolom jadi str) vs
+clean_excel_apostrophe (vectorized, hanya kolom teks)
+
+CARA PAKAI:
+1. Jalankan dari root project: python benchmark/bench_clean_excel.py
+2. Opsional: --rows 100000 --kolom-teks 8 --kolom-angka 6 --seed 42
+
+CATATAN:
+- Data dibuat sintetis di memory (mirip export faktur lebar), TIDAK
+  menyentuh database
+- Kolom teks dibandingkan persis; kolom angka versi baru tetap numerik,
+  dibandingkan dengan hasil versi lama yang di-parse ulang ke angka
+"""
+
+import sys
+import os
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import excel_reader
+
+
+def generate_data(n_rows, n_teks, n_angka, seed=42):
+    """DataFrame seperti hasil baca Excel: teks ber-apostrof/spasi, angka, sel kosong"""
+    rng = np.random.default_rng(seed)
+    data = {}
+
+    pilihan = np.array(["'F-001", " Barang A ", "'  ", "Customer B", "'00123", "", "PT. Maju  "], dtype=object)
+    for i in range(n_teks):
+        kolom = pilihan[rng.integers(0, len(pilihan), n_rows)].copy()
+        kolom[rng.random(n_rows) < 0.05] = None
+        data[f"'Teks {i}" if i == 0 else f"Teks {i}"] = kolom
+
+    for i in range(n_angka):
+        kolom = rng.integers(1, 1_000_000, n_rows).astype(float)
+        kolom[rng.random(n_rows) < 0.05] = np.nan
+        data[f"Angka {i}"] = kolom
+
+    return pd.DataFrame(data)
+
+
+def hasil_sama(lama, baru):
+    """Bandingkan hasil versi lama (semua str) dengan versi vectorized"""
+    if list(lama.columns) != list(baru.columns):
+        return False
+
+    for col in baru.columns:
+        if pd.api.types.is_numeric_dtype(baru[col]):
+            kiri = pd.to_numeric(lama[col]).to_numpy(dtype=float)
+            kanan = baru[col].to_numpy(dtype=float)
+            if not np.array_equal(kiri, kanan, equal_nan=True):
+                return False
+        else:
+            kiri = lama[col].where(lama[col].notna(), None).tolist()
+            kanan = baru[col].where(baru[col].notna(), None).tolist()
+            if kiri != kanan:
+                return False
+    return True
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark clean_excel_apostrophe")
+    parser.add_argument("--rows", type=int, default=100_000, help="Jumlah baris")
+    parser.add_argument("--kolom-teks", type=int, default=8, help="Jumlah kolom teks")
+    parser.add_argument("--kolom-angka", type=int, default=6, help="Jumlah kolom angka")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    df = generate_data(args.rows, args.kolom_teks, args.kolom_angka, args.seed)
+    print(f"Generate data sintetis: {len(df):,} baris x {len(df.columns)} kolom")
+    print("=" * 70)
+
+    hasil_baru, waktu_baru = timed(excel_reader.clean_excel_apostrophe, df)
+    print(f"Vectorized : {waktu_baru:8.3f} detik")
+
+    hasil_lama, waktu_lama = timed(excel_reader.clean_excel_apostrophe_loop, df)
+    print(f"Loop       : {waktu_lama:8.3f} detik")
+    print(f"Speedup    : {waktu_lama / waktu_baru:8.1f}x")
+    print("=" * 70)
+
+    angka_tetap = all(
+        hasil_baru[col].dtype == df[col].dtype
+        for col in df.columns if pd.api.types.is_numeric_dtype(df[col])
+    )
+    print(f"Dtype angka tetap : {'✅' if angka_tetap else '❌'}")
+    print(f"Nilai sama        : {'✅' if hasil_sama(hasil_lama, hasil_baru) else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
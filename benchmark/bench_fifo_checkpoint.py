@@ -0,0 +1,89 @@
+"""
+Benchmark Gross Profit FIFO 1 bulan: replay seluruh histori vs
+mulai dari checkpoint akhir bulan (fifo_checkpoint)
+
+CARA PAKAI:
+1. Jalankan dari root project: python benchmark/bench_fifo_checkpoint.py
+2. Opsional: --histori 12 24 48 96 --rows-per-bulan 20000 --barang 150
+
+CATATAN:
+- Data dibuat sintetis di memory, TIDAK menyentuh database
+- Checkpoint dihitung dengan fungsi yang sama seperti build_fifo_checkpoint
+  (_hitung_checkpoint_fifo); biaya pembuatannya dicatat terpisah karena
+  di aplikasi hanya dibuat 1x lalu dipakai ulang
+- Waktu query dengan checkpoint seharusnya tetap walaupun histori bertambah
+"""
+
+import sys
+import os
+import argparse
+
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import new_database
+from bench_gross_profit_fifo import generate_data, hasil_sama, timed
+
+
+def query_replay_penuh(pembelian_df, penjualan_df, start_date):
+    """Cara lama: semua transaksi s/d end_date di-replay"""
+    return new_database.calculate_gross_profit_fifo(pembelian_df, penjualan_df, start_date=start_date)
+
+
+def query_checkpoint(pembelian_df, penjualan_df, saldo_awal, start_date):
+    """Cara baru: saldo checkpoint + transaksi setelah checkpoint s/d end_date"""
+    return new_database.calculate_gross_profit_fifo(
+        pembelian_df, penjualan_df, saldo_awal=saldo_awal, start_date=start_date
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark checkpoint FIFO bulanan")
+    parser.add_argument("--histori", type=int, nargs="+", default=[12, 24, 48, 96], help="Panjang histori (bulan)")
+    parser.add_argument("--rows-per-bulan", type=int, default=20_000, help="Baris detail per bulan")
+    parser.add_argument("--barang", type=int, default=150, help="Jumlah barang")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'Histori':>8} {'Baris':>11} {'Replay':>10} {'Checkpoint':>11} {'Speedup':>8} {'Build CP':>9}  Sama")
+    print("=" * 70)
+
+    for n_bulan in args.histori:
+        n_hari = int(n_bulan * 365 / 12)
+        pembelian_df, penjualan_df = generate_data(
+            args.rows_per_bulan * n_bulan, args.barang, args.seed, n_hari=n_hari
+        )
+        for df in (pembelian_df, penjualan_df):
+            df['tanggal'] = pd.to_datetime(df['tanggal']).dt.date
+
+        # Query: bulan terakhir histori (data sintetis berakhir di end_date)
+        end_date = max(pembelian_df['tanggal'].max(), penjualan_df['tanggal'].max())
+        start_date = end_date.replace(day=1)
+        bulan = new_database._akhir_bulan_sebelum(start_date)
+
+        checkpoint, waktu_build = timed(
+            new_database._hitung_checkpoint_fifo,
+            pembelian_df[pembelian_df['tanggal'] <= bulan],
+            penjualan_df[penjualan_df['tanggal'] <= bulan],
+            [bulan]
+        )
+        saldo_awal = checkpoint.drop(columns=['bulan', 'urutan'])
+
+        # Rentang data yang dibaca masing-masing cara (di aplikasi: WHERE tanggal)
+        beli_window = pembelian_df[pembelian_df['tanggal'] > bulan]
+        jual_window = penjualan_df[penjualan_df['tanggal'] > bulan]
+
+        hasil_replay, waktu_replay = timed(query_replay_penuh, pembelian_df, penjualan_df, start_date)
+        hasil_cp, waktu_cp = timed(query_checkpoint, beli_window, jual_window, saldo_awal, start_date)
+
+        print(
+            f"{n_bulan:>5} bln {len(pembelian_df) + len(penjualan_df):>11,} "
+            f"{waktu_replay:>9.3f}s {waktu_cp:>10.3f}s {waktu_replay / waktu_cp:>7.1f}x "
+            f"{waktu_build:>8.2f}s  {'✅' if hasil_sama(hasil_replay, hasil_cp) else '❌'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark perhitungan Gross Profit FIFO:
+calculate_gross_profit_fifo_loop (iterrows + pop(0)) vs
+calculate_gross_profit_fifo (vectorized, cumsum + searchsorted)
+
+CARA PAKAI:
+1. Jalankan dari root project: python benchmark/bench_gross_profit_fifo.py
+2. Opsional: --rows 1000000 --barang 150 --seed 42
+3. Gunakan --skip-loop untuk hanya mengukur versi vectorized
+
+CATATAN:
+- Data dibuat sintetis di memory, TIDAK menyentuh database
+- Hasil kedua versi dibandingkan (toleransi pembulatan float)
+"""
+
+import sys
+import os
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import new_database
+
+
+def generate_data(n_rows, n_barang, seed=42, n_hari=365 * 4):
+    """Buat pembelian_df & penjualan_df sintetis dengan total n_rows baris detail selama n_hari"""
+    rng = np.random.default_rng(seed)
+
+    n_beli = max(n_rows // 5, n_barang)
+    n_jual = n_rows - n_beli
+    tanggal_awal = np.datetime64('2021-01-01')
+
+    # Pembelian: ~10% baris ongkir di (tanggal, id_barang) yang sama dengan pembelian barang
+    beli_hari = np.sort(rng.integers(0, n_hari, n_beli))
+    beli_barang = rng.integers(1, n_barang + 1, n_beli)
+    beli_qty = rng.integers(50, 500, n_beli)
+    beli_harga = rng.integers(10_000, 50_000, n_beli).astype(float)
+    tipe = np.where(rng.random(n_beli) < 0.1, 'Ongkir', 'Barang')
+
+    pembelian_df = pd.DataFrame({
+        'id': np.arange(1, n_beli + 1),
+        'tanggal': (tanggal_awal + beli_hari).astype('datetime64[D]').astype(object),
+        'no_nota': [f"PB-{i}" for i in range(n_beli)],
+        'id_barang': beli_barang,
+        'nama_barang': [f"Barang {b}" for b in beli_barang],
+        'kuantitas': beli_qty,
+        'harga_satuan': beli_harga,
+        'subtotal': beli_qty * beli_harga,
+        'tipe': tipe
+    })
+
+    # Penjualan: total qty per barang kira-kira sama dengan pembelian
+    jual_hari = np.sort(rng.integers(0, n_hari, n_jual))
+    jual_barang = rng.integers(1, n_barang + 1, n_jual)
+    jual_qty = rng.integers(1, 100, n_jual)
+    jual_harga = rng.integers(15_000, 70_000, n_jual).astype(float)
+
+    penjualan_df = pd.DataFrame({
+        'id': np.arange(1, n_jual + 1),
+        'tanggal': (tanggal_awal + jual_hari).astype('datetime64[D]').astype(object),
+        'no_nota': [f"PJ-{i}" for i in range(n_jual)],
+        'id_barang': jual_barang,
+        'nama_barang': [f"Barang {b}" for b in jual_barang],
+        'kuantitas': jual_qty,
+        'harga_satuan': jual_harga,
+        'subtotal': jual_qty * jual_harga
+    })
+
+    return pembelian_df, penjualan_df
+
+
+def hasil_sama(kiri, kanan):
+    """Bandingkan 2 hasil gross profit per barang (toleransi pembulatan float)"""
+    kiri = kiri.sort_values('id_barang').reset_index(drop=True)
+    kanan = kanan.sort_values('id_barang').reset_index(drop=True)
+    return (
+        len(kiri) == len(kanan)
+        and (kiri['id_barang'].to_numpy() == kanan['id_barang'].to_numpy()).all()
+        and all(
+            np.allclose(kiri[col].astype(float), kanan[col].astype(float), rtol=1e-9, atol=1e-3)
+            for col in ['total_penjualan', 'total_hpp', 'gross_profit', 'margin_persen', 'qty_terjual']
+        )
+    )
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Gross Profit FIFO")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Total baris detail (pembelian + penjualan)")
+    parser.add_argument("--barang", type=int, default=150, help="Jumlah barang")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-loop", action="store_true", help="Lewati versi loop (lambat)")
+    args = parser.parse_args()
+
+    print(f"Generate data sintetis: {args.rows:,} baris detail, {args.barang} barang")
+    pembelian_df, penjualan_df = generate_data(args.rows, args.barang, args.seed)
+    print(f"  Pembelian: {len(pembelian_df):,} baris | Penjualan: {len(penjualan_df):,} baris")
+    print("=" * 70)
+
+    hasil_vec, waktu_vec = timed(new_database.calculate_gross_profit_fifo, pembelian_df, penjualan_df)
+    print(f"Vectorized : {waktu_vec:8.2f} detik")
+
+    if args.skip_loop:
+        return
+
+    hasil_loop, waktu_loop = timed(new_database.calculate_gross_profit_fifo_loop, pembelian_df, penjualan_df)
+    print(f"Loop       : {waktu_loop:8.2f} detik")
+    print(f"Speedup    : {waktu_loop / waktu_vec:8.1f}x")
+    print("=" * 70)
+
+    # Validasi hasil
+    sama_kolom = list(hasil_loop.columns) == list(hasil_vec.columns)
+    print(f"Kolom sama : {'✅' if sama_kolom else '❌'}")
+    print(f"Nilai sama : {'✅' if hasil_sama(hasil_loop, hasil_vec) else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmark import pembelian dari Excel (export supplier, Barang + Ongkir):
+insert_pembelian_loop (2-6 query per baris) vs
+insert_pembelian (bulk, executemany per batch)
+
+CARA PAKAI:
+1. Siapkan database KOSONG khusus benchmark dengan skema terbaru
+   (DB_NAME=bench_trading_db python tools/migrate.py)
+2. Jalankan dari root project:
+   DB_NAME=bench_trading_db python benchmark/bench_insert_pembelian.py
+3. Opsional: --rows 50000 --barang 200 --supplier 20 --ongkir 0.1 --seed 42
+4. Gunakan --skip-loop untuk hanya mengukur versi bulk
+
+CATATAN:
+- MENULIS ke database (master data BENCH ..., pembelian, hutang, ledger);
+  jangan dijalankan ke database produksi (trading_db ditolak)
+- Kedua versi mengimport data yang sama dengan prefix nota berbeda, lalu
+  total, jumlah detail & stok masuk dibandingkan
+- Target: bulk minimal 20x lebih cepat dari loop untuk export besar
+"""
+
+import sys
+import os
+import argparse
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import new_database
+from bench_insert_penjualan import siapkan_master, jalankan
+
+
+def siapkan_supplier(n_supplier):
+    """Pastikan supplier Bench Supplier i ada"""
+    conn = new_database.get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT nama FROM supplier WHERE nama LIKE %s", ("Bench Supplier %",))
+        sudah = {row[0] for row in cursor.fetchall()}
+        baru = [
+            (f"Bench Supplier {i}", 0)
+            for i in range(1, n_supplier + 1) if f"Bench Supplier {i}" not in sudah
+        ]
+        if baru:
+            cursor.executemany("INSERT INTO supplier (nama, top) VALUES (%s, %s)", baru)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    new_database.invalidasi_master_cache()
+
+
+def generate_data(n_rows, n_barang, n_supplier, prefix, seed=42, ongkir=0.1, baris_per_nota=10, n_hari=90):
+    """
+    DataFrame format Excel pembelian: ~baris_per_nota baris per nota,
+    sebagian nota Ongkir, nota genap TOP 30 (hutang)
+    """
+    rng = np.random.default_rng(seed)
+
+    n_nota = max(n_rows // baris_per_nota, 1)
+    nota = rng.integers(0, n_nota, n_rows)
+    tanggal = pd.Timestamp('2024-01-01') + pd.to_timedelta(nota % n_hari, unit='D')
+    nota_ongkir = rng.random(n_nota) < ongkir
+    kuantitas = rng.integers(1, 200, n_rows).astype(float)
+    harga = rng.integers(1, 400, n_rows) * 1000.0
+
+    return pd.DataFrame({
+        'No. Faktur': [f"{prefix}-{n}" for n in nota],
+        'Tgl Faktur': tanggal.strftime('%Y-%m-%d'),
+        'Nama Supplier': [f"Bench Supplier {s}" for s in nota % n_supplier + 1],
+        'Keterangan Barang': [f"BENCH Barang {b}" for b in rng.integers(1, n_barang + 1, n_rows)],
+        'Kuantitas': kuantitas,
+        'Harga Satuan': harga,
+        'Jumlah': harga * kuantitas,
+        'TOP': np.where(nota % 2 == 0, 30, 0),
+        'Tipe': np.where(nota_ongkir[nota], 'Ongkir', 'Barang')
+    })
+
+
+def ringkasan(prefix):
+    """(jumlah nota, jumlah detail, total, total kuantitas, jumlah hutang) untuk nota prefix"""
+    conn = new_database.get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("""
+            SELECT COUNT(DISTINCT p.id), COUNT(pd.id), COALESCE(SUM(pd.subtotal), 0), COALESCE(SUM(pd.kuantitas), 0)
+            FROM pembelian p
+            LEFT JOIN pembelian_detail pd ON pd.id_pembelian = p.id
+            WHERE p.no_nota LIKE %s
+        """, (f"{prefix}-%",))
+        nota, detail, total, kuantitas = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*) FROM hutang WHERE no_nota LIKE %s", (f"{prefix}-%",))
+        hutang = cursor.fetchone()[0]
+        return int(nota), int(detail), round(float(total), 2), int(kuantitas), int(hutang)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import pembelian")
+    parser.add_argument("--rows", type=int, default=50_000, help="Jumlah baris Excel")
+    parser.add_argument("--barang", type=int, default=200, help="Jumlah barang")
+    parser.add_argument("--supplier", type=int, default=20, help="Jumlah supplier")
+    parser.add_argument("--ongkir", type=float, default=0.1, help="Proporsi nota Ongkir")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-loop", action="store_true", help="Lewati versi loop (lambat)")
+    args = parser.parse_args()
+
+    if new_database.DB_NAME == 'trading_db':
+        print("❌ Set DB_NAME ke database khusus benchmark (bukan trading_db)")
+        sys.exit(1)
+
+    print(f"Database: {new_database.DB_NAME}")
+    siapkan_master(args.barang, 0)
+    siapkan_supplier(args.supplier)
+
+    run_id = uuid.uuid4().hex[:6].upper()
+    prefix_bulk, prefix_loop = f"PB{run_id}", f"PL{run_id}"
+    df_bulk = generate_data(args.rows, args.barang, args.supplier, prefix_bulk, args.seed, args.ongkir)
+    print(f"Generate data sintetis: {len(df_bulk):,} baris, {df_bulk['No. Faktur'].nunique():,} nota")
+    print("=" * 70)
+
+    hasil_bulk, waktu_bulk, stmt_bulk = jalankan(new_database.insert_pembelian, df_bulk)
+    print(f"Bulk  : {waktu_bulk:8.2f} detik | {stmt_bulk:,} statement | hasil {hasil_bulk[:2]}")
+    if hasil_bulk[2]:
+        print(f"❌ {hasil_bulk[2][0]}")
+        sys.exit(1)
+
+    if args.skip_loop:
+        return
+
+    df_loop = generate_data(args.rows, args.barang, args.supplier, prefix_loop, args.seed, args.ongkir)
+    hasil_loop, waktu_loop, stmt_loop = jalankan(new_database.insert_pembelian_loop, df_loop)
+    print(f"Loop  : {waktu_loop:8.2f} detik | {stmt_loop:,} statement | hasil {hasil_loop[:2]}")
+    speedup = waktu_loop / waktu_bulk
+    print(f"Speedup : {speedup:6.1f}x {'✅' if speedup >= 20 else '⚠️ (target 20x)'}")
+    print("=" * 70)
+
+    # Validasi hasil: nota, detail, total, kuantitas & hutang harus sama
+    sama = ringkasan(prefix_bulk) == ringkasan(prefix_loop)
+    print(f"Nota/detail/total/kuantitas/hutang sama : {'✅' if sama else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Benchmark import penjualan dari Excel:
+insert_penjualan_loop (2-6 query per baris) vs
+insert_penjualan (bulk, executemany per batch)
+
+CARA PAKAI:
+1. Siapkan database KOSONG khusus benchmark dengan skema terbaru
+   (DB_NAME=bench_trading_db python tools/migrate.py)
+2. Jalankan dari root project:
+   DB_NAME=bench_trading_db python benchmark/bench_insert_penjualan.py
+3. Opsional: --rows 50000 --barang 200 --customer 50 --seed 42
+4. Gunakan --skip-loop untuk hanya mengukur versi bulk
+
+CATATAN:
+- MENULIS ke database (master data BENCH ..., penjualan, piutang, ledger);
+  jangan dijalankan ke database produksi (trading_db ditolak)
+- Kedua versi mengimport data yang sama dengan prefix nota berbeda, lalu
+  total, jumlah detail & stok keluar dibandingkan
+- TOP dibuat 0 (tanpa piutang) agar kedua versi menulis tabel yang sama
+"""
+
+import sys
+import os
+import time
+import argparse
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import new_database
+
+
+class CursorHitung:
+    """Cursor yang menghitung jumlah statement yang dikirim ke MySQL"""
+
+    def __init__(self, cursor, hitung):
+        self._cursor = cursor
+        self._hitung = hitung
+
+    def execute(self, *args, **kwargs):
+        self._hitung['statement'] += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._hitung['statement'] += 1
+        return self._cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, nama):
+        return getattr(self._cursor, nama)
+
+
+class KoneksiHitung:
+    def __init__(self, conn, hitung):
+        self._conn = conn
+        self._hitung = hitung
+
+    def cursor(self, *args, **kwargs):
+        return CursorHitung(self._conn.cursor(*args, **kwargs), self._hitung)
+
+    def __getattr__(self, nama):
+        return getattr(self._conn, nama)
+
+
+def siapkan_master(n_barang, n_customer):
+    """Pastikan master data BENCH Barang i / BENCH Customer i ada"""
+    conn = new_database.get_connection()
+    cursor = conn.cursor()
+
+    try:
+        for tabel, nama, kolom_lain, nilai_lain, jumlah in [
+            ('barang', 'BENCH Barang', 'satuan', 'pcs', n_barang),
+            ('customer', 'Bench Customer', 'top', 0, n_customer)
+        ]:
+            cursor.execute(f"SELECT nama FROM {tabel} WHERE nama LIKE %s", (f"{nama} %",))
+            sudah = {row[0] for row in cursor.fetchall()}
+            baru = [(f"{nama} {i}", nilai_lain) for i in range(1, jumlah + 1) if f"{nama} {i}" not in sudah]
+            if baru:
+                cursor.executemany(f"INSERT INTO {tabel} (nama, {kolom_lain}) VALUES (%s, %s)", baru)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    new_database.invalidasi_master_cache()
+
+
+def generate_data(n_rows, n_barang, n_customer, prefix, seed=42, baris_per_nota=5, n_hari=90):
+    """DataFrame format Excel penjualan: ~baris_per_nota baris per nota selama n_hari"""
+    rng = np.random.default_rng(seed)
+
+    n_nota = max(n_rows // baris_per_nota, 1)
+    nota = rng.integers(0, n_nota, n_rows)
+    tanggal = pd.Timestamp('2024-01-01') + pd.to_timedelta(nota % n_hari, unit='D')
+    kuantitas = rng.integers(1, 50, n_rows).astype(float)
+    harga = rng.integers(1, 500, n_rows) * 1000.0
+    pakai_harga = rng.random(n_rows) < 0.7
+
+    return pd.DataFrame({
+        'No. Faktur': [f"{prefix}-{n}" for n in nota],
+        'Tgl Faktur': tanggal.strftime('%Y-%m-%d'),
+        'Nama Pelanggan': [f"Bench Customer {c}" for c in nota % n_customer + 1],
+        'Keterangan Barang': [f"BENCH Barang {b}" for b in rng.integers(1, n_barang + 1, n_rows)],
+        'Kuantitas': kuantitas,
+        'Harga Satuan': np.where(pakai_harga, harga, np.nan),
+        'Jumlah': np.where(pakai_harga, np.nan, harga * kuantitas),
+        'TOP': 0
+    })
+
+
+def ringkasan(prefix):
+    """(jumlah nota, jumlah detail, total, total kuantitas) untuk nota prefix"""
+    conn = new_database.get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("""
+            SELECT COUNT(DISTINCT p.id), COUNT(pd.id), COALESCE(SUM(pd.subtotal), 0), COALESCE(SUM(pd.kuantitas), 0)
+            FROM penjualan p
+            LEFT JOIN penjualan_detail pd ON pd.id_penjualan = p.id
+            WHERE p.no_nota LIKE %s
+        """, (f"{prefix}-%",))
+        nota, detail, total, kuantitas = cursor.fetchone()
+        return int(nota), int(detail), round(float(total), 2), int(kuantitas)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def jalankan(func, df):
+    """Jalankan import dengan koneksi yang menghitung statement"""
+    hitung = {'statement': 0}
+    get_connection = new_database.get_connection
+    new_database.get_connection = lambda: KoneksiHitung(get_connection(), hitung)
+
+    try:
+        start = time.perf_counter()
+        hasil = func(df)
+        waktu = time.perf_counter() - start
+    finally:
+        new_database.get_connection = get_connection
+
+    return hasil, waktu, hitung['statement']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import penjualan")
+    parser.add_argument("--rows", type=int, default=50_000, help="Jumlah baris Excel")
+    parser.add_argument("--barang", type=int, default=200, help="Jumlah barang")
+    parser.add_argument("--customer", type=int, default=50, help="Jumlah customer")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-loop", action="store_true", help="Lewati versi loop (lambat)")
+    args = parser.parse_args()
+
+    if new_database.DB_NAME == 'trading_db':
+        print("❌ Set DB_NAME ke database khusus benchmark (bukan trading_db)")
+        sys.exit(1)
+
+    print(f"Database: {new_database.DB_NAME}")
+    siapkan_master(args.barang, args.customer)
+
+    run_id = uuid.uuid4().hex[:6].upper()
+    prefix_bulk, prefix_loop = f"BB{run_id}", f"BL{run_id}"
+    df_bulk = generate_data(args.rows, args.barang, args.customer, prefix_bulk, args.seed)
+    print(f"Generate data sintetis: {len(df_bulk):,} baris, {df_bulk['No. Faktur'].nunique():,} nota")
+    print("=" * 70)
+
+    hasil_bulk, waktu_bulk, stmt_bulk = jalankan(new_database.insert_penjualan, df_bulk)
+    print(f"Bulk  : {waktu_bulk:8.2f} detik | {stmt_bulk:,} statement | hasil {hasil_bulk[:2]}")
+    if hasil_bulk[2]:
+        print(f"❌ {hasil_bulk[2][0]}")
+        sys.exit(1)
+
+    if args.skip_loop:
+        return
+
+    df_loop = generate_data(args.rows, args.barang, args.customer, prefix_loop, args.seed)
+    hasil_loop, waktu_loop, stmt_loop = jalankan(new_database.insert_penjualan_loop, df_loop)
+    print(f"Loop  : {waktu_loop:8.2f} detik | {stmt_loop:,} statement | hasil {hasil_loop[:2]}")
+    print(f"Speedup : {waktu_loop / waktu_bulk:6.1f}x")
+    print("=" * 70)
+
+    # Validasi hasil: nota, detail, total & kuantitas harus sama
+    sama = ringkasan(prefix_bulk) == ringkasan(prefix_loop)
+    print(f"Nota/detail/total/kuantitas sama : {'✅' if sama else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
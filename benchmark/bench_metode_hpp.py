@@ -0,0 +1,131 @@
+"""
+Benchmark metode HPP (METODE_HPP): FIFO, Moving Average, LIFO
+Mengukur waktu & puncak memori calculate_gross_profit per metode
+pada beberapa ukuran ledger sintetis (default sampai 1 juta baris,
+sama dengan bench_gross_profit_fifo.py).
+
+CARA PAKAI:
+1. Jalankan dari root project: python benchmark/bench_metode_hpp.py
+2. Opsional: --rows 100000 500000 1000000 --barang 150 --seed 42
+3. Gunakan --skip-loop untuk melewati pembanding LIFO versi loop (lambat)
+
+CATATAN:
+- Data dibuat sintetis di memory, TIDAK menyentuh database
+- Waktu diukur tanpa tracemalloc; memori diukur di run terpisah dengan
+  tracemalloc (alokasi Python & numpy selama perhitungan)
+- Kolom "vs FIFO" = waktu metode / waktu FIFO pada ukuran yang sama
+- LIFO (_hpp_lifo) masih memakai stack per baris, jadi hasilnya dicek
+  terhadap lifo_loop (iterrows per barang) dan waktunya dibandingkan
+- Setiap metode dicek punya kolom hasil yang sama (KOLOM_GROSS_PROFIT)
+"""
+
+import sys
+import os
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import new_database
+from bench_gross_profit_fifo import generate_data, hasil_sama, timed
+
+
+def ukur_memori(func, *args):
+    """Jalankan func, kembalikan puncak memori MB"""
+    tracemalloc.start()
+    func(*args)
+    _, puncak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return puncak / 1024 / 1024
+
+
+def lifo_loop(pembelian_df, penjualan_df):
+    """
+    LIFO perpetual versi loop per barang (iterrows + list sebagai stack).
+    Referensi untuk _hpp_lifo: urutan mutasi sama (per tanggal,
+    pembelian sebelum penjualan di tanggal yang sama).
+    """
+    layer = new_database._hitung_layer_pembelian(pembelian_df)
+    hpp = np.zeros(len(penjualan_df))
+    posisi = pd.Series(np.arange(len(penjualan_df)), index=penjualan_df.index)
+    jual_tanggal = pd.to_datetime(penjualan_df['tanggal'])
+    layer_tanggal = pd.to_datetime(layer['tanggal'])
+
+    for barang_id in penjualan_df['id_barang'].unique():
+        beli = layer[layer['id_barang'] == barang_id].assign(_tgl=layer_tanggal, _jual=0)
+        jual = penjualan_df[penjualan_df['id_barang'] == barang_id].assign(_tgl=jual_tanggal, _jual=1)
+        mutasi = pd.concat([beli, jual]).sort_values(['_tgl', '_jual'], kind='stable')
+
+        stack = []  # [qty_sisa, harga_per_unit]
+        for idx, row in mutasi.iterrows():
+            qty = max(float(row['kuantitas']), 0)
+            if not row['_jual']:
+                if qty > 0:
+                    stack.append([qty, float(row['harga_per_unit'])])
+                continue
+
+            total = 0.0
+            while qty > 0 and stack:
+                ambil = min(stack[-1][0], qty)
+                total += ambil * stack[-1][1]
+                stack[-1][0] -= ambil
+                qty -= ambil
+                if stack[-1][0] <= 0:
+                    stack.pop()
+            hpp[posisi[idx]] = total
+
+    return new_database._ringkas_gross_profit(penjualan_df, hpp, layer['id_barang'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark metode HPP")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 500_000, 1_000_000], help="Total baris detail")
+    parser.add_argument("--barang", type=int, default=150, help="Jumlah barang")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-loop", action="store_true", help="Lewati pembanding LIFO versi loop (lambat)")
+    args = parser.parse_args()
+
+    print(f"{'Baris':>11} {'Metode':<16} {'Waktu':>9} {'vs FIFO':>8} {'Memori':>10} {'Total HPP':>20}  Kolom")
+    print("=" * 87)
+
+    for n_rows in args.rows:
+        pembelian_df, penjualan_df = generate_data(n_rows, args.barang, args.seed)
+        hasil_metode = {}
+        waktu_fifo = None
+
+        for metode in new_database.METODE_HPP:
+            hasil, waktu = timed(
+                new_database.calculate_gross_profit, pembelian_df, penjualan_df, metode
+            )
+            memori = ukur_memori(
+                new_database.calculate_gross_profit, pembelian_df, penjualan_df, metode
+            )
+            hasil_metode[metode] = (hasil, waktu)
+            if waktu_fifo is None:
+                waktu_fifo = waktu
+
+            kolom_ok = list(hasil.columns) == new_database.KOLOM_GROSS_PROFIT
+            print(
+                f"{n_rows:>11,} {metode:<16} {waktu:>8.2f}s {waktu / waktu_fifo:>7.1f}x {memori:>8.1f}MB "
+                f"{hasil['total_hpp'].sum():>20,.0f}  {'✅' if kolom_ok else '❌'}"
+            )
+
+        if not args.skip_loop:
+            hasil_loop, waktu_loop = timed(lifo_loop, pembelian_df, penjualan_df)
+            hasil_lifo, waktu_lifo = hasil_metode['LIFO']
+            sama = hasil_sama(hasil_loop, hasil_lifo)
+            print(
+                f"{n_rows:>11,} {'LIFO (loop)':<16} {waktu_loop:>8.2f}s {waktu_loop / waktu_fifo:>7.1f}x "
+                f"{'':>10} {hasil_loop['total_hpp'].sum():>20,.0f}  "
+                f"nilai {'✅' if sama else '❌'} | _hpp_lifo {waktu_loop / waktu_lifo:.1f}x lebih cepat"
+            )
+        print("-" * 87)
+
+
+if __name__ == "__main__":
+    main()
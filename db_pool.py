@@ -0,0 +1,251 @@
+"""
+Pool koneksi MySQL bersama untuk new_database, prediksi/database dan
+manual/manual_database. 1 pool per nama database.
+
+Konfigurasi dari environment:
+- DB_HOST (localhost), DB_PORT (3306), DB_USER (root), DB_PASSWORD ("")
+- DB_POOL_SIZE (5)           : maksimal koneksi terbuka per database
+- DB_POOL_TIMEOUT (30)       : detik menunggu koneksi kosong sebelum error
+- DB_CONNECT_TIMEOUT (10)    : detik timeout membuka koneksi baru
+- DB_POOL_PING_AFTER (60)    : koneksi yang menganggur lebih lama dari ini
+                               di-ping (reconnect) sebelum dipakai lagi
+
+Pemakaian tidak berubah: conn = get_connection(...); ...; conn.close()
+mengembalikan koneksi ke pool. Bisa juga dengan context manager:
+
+    with get_connection("trading_db") as conn:
+        ...
+
+Backfill historis memakai koneksi terpisah (get_connection_infile) dan
+load_dataframe: DataFrame -> CSV sementara -> LOAD DATA LOCAL INFILE.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+
+
+def _env_int(nama, default):
+    return int(os.environ.get(nama, default))
+
+
+def config_koneksi(database, **config):
+    """Parameter mysql.connector.connect dari environment (+ override config)"""
+    return {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'port': _env_int('DB_PORT', 3306),
+        'user': os.environ.get('DB_USER', 'root'),
+        'password': os.environ.get('DB_PASSWORD', ''),
+        'database': database,
+        'connection_timeout': _env_int('DB_CONNECT_TIMEOUT', 10),
+        **config
+    }
+
+
+class PooledConnection:
+    """
+    Koneksi pinjaman dari pool. Semua atribut diteruskan ke koneksi
+    mysql.connector asli; close() mengembalikan koneksi ke pool.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, nama):
+        if self._conn is None:
+            raise Exception("Koneksi sudah dikembalikan ke pool")
+        return getattr(self._conn, nama)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._kembalikan(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        # Koneksi yang lupa di-close tetap kembali ke pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Pool koneksi untuk 1 database, aman dipakai banyak thread (Streamlit)"""
+
+    def __init__(self, database, size=None, timeout=None, **config):
+        self.database = database
+        self.size = size or _env_int('DB_POOL_SIZE', 5)
+        self.timeout = timeout if timeout is not None else _env_int('DB_POOL_TIMEOUT', 30)
+        self.ping_after = _env_int('DB_POOL_PING_AFTER', 60)
+        self.config = config_koneksi(database, **config)
+
+        self._kondisi = threading.Condition()
+        self._idle = deque()     # (koneksi, waktu dikembalikan)
+        self._dipakai = 0
+        self._pid = os.getpid()
+        self._metrics = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'peak_in_use': 0
+        }
+
+    def _reset_setelah_fork(self):
+        # Socket koneksi tidak boleh dipakai bersama proses anak
+        if os.getpid() != self._pid:
+            self._kondisi = threading.Condition()
+            self._idle = deque()
+            self._dipakai = 0
+            self._pid = os.getpid()
+
+    def get_connection(self):
+        """Pinjam 1 koneksi; tunggu maksimal `timeout` detik jika pool penuh"""
+        self._reset_setelah_fork()
+
+        with self._kondisi:
+            if self._dipakai >= self.size:
+                self._metrics['waits'] += 1
+                mulai = time.perf_counter()
+                siap = self._kondisi.wait_for(lambda: self._dipakai < self.size, self.timeout)
+                self._metrics['wait_seconds'] += time.perf_counter() - mulai
+                if not siap:
+                    self._metrics['timeouts'] += 1
+                    raise Exception(
+                        f"Pool koneksi {self.database} penuh ({self.size} koneksi) "
+                        f"setelah menunggu {self.timeout} detik"
+                    )
+
+            self._dipakai += 1
+            self._metrics['checkouts'] += 1
+            self._metrics['peak_in_use'] = max(self._metrics['peak_in_use'], self._dipakai)
+            idle = self._idle.pop() if self._idle else None
+
+        try:
+            if idle is None:
+                conn = mysql.connector.connect(**self.config)
+                with self._kondisi:
+                    self._metrics['created'] += 1
+            else:
+                conn, sejak = idle
+                if time.monotonic() - sejak > self.ping_after:
+                    conn.ping(reconnect=True, attempts=1)
+        except Exception:
+            with self._kondisi:
+                self._dipakai -= 1
+                self._kondisi.notify()
+            raise
+
+        return PooledConnection(self, conn)
+
+    def _kembalikan(self, conn):
+        if os.getpid() != self._pid:
+            return
+
+        try:
+            # Tutup transaksi / snapshot baca yang masih terbuka (autocommit mati)
+            conn.rollback()
+            sehat = True
+        except Exception:
+            sehat = False
+
+        with self._kondisi:
+            self._dipakai -= 1
+            if sehat:
+                self._idle.append((conn, time.monotonic()))
+            self._kondisi.notify()
+
+        if not sehat:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def metrics(self):
+        """Snapshot metrik pool"""
+        with self._kondisi:
+            return {
+                'database': self.database,
+                'size': self.size,
+                'in_use': self._dipakai,
+                'idle': len(self._idle),
+                **self._metrics
+            }
+
+    def tutup_semua(self):
+        """Tutup koneksi idle (koneksi yang sedang dipinjam tidak diganggu)"""
+        with self._kondisi:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(database):
+    """Pool untuk `database` (dibuat saat pertama dipakai)"""
+    with _pools_lock:
+        if database not in _pools:
+            _pools[database] = ConnectionPool(database)
+        return _pools[database]
+
+def get_connection(database):
+    """Pinjam koneksi ke `database` dari pool bersama"""
+    return get_pool(database).get_connection()
+
+def get_metrics():
+    """Metrik semua pool: list dict per database"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.metrics() for pool in pools]
+
+def get_connection_infile(database):
+    """
+    Koneksi BARU di luar pool dengan LOAD DATA LOCAL INFILE diaktifkan
+    (backfill historis, lihat load_dataframe). Server MySQL juga harus
+    local_infile=ON. Tutup sendiri dengan conn.close().
+    """
+    return mysql.connector.connect(**config_koneksi(database, allow_local_infile=True))
+
+def load_dataframe(cursor, tabel, df):
+    """
+    Tulis df ke CSV sementara lalu LOAD DATA LOCAL INFILE ke `tabel`
+    (kolom tabel = nama kolom df). Sel kosong / NaN masuk sebagai NULL.
+    Return jumlah baris yang dimuat.
+    """
+    kolom = list(df.columns)
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', newline='', delete=False) as f:
+        path = f.name
+        # ESCAPED BY '' : backslash di data tetap literal; NULL lewat NULLIF('')
+        df.to_csv(f, index=False, header=False, na_rep='', lineterminator='\n')
+
+    try:
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s
+            INTO TABLE {tabel}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\n'
+            ({', '.join(f'@k{i}' for i in range(len(kolom)))})
+            SET {', '.join(f"{nama} = NULLIF(@k{i}, '')" for i, nama in enumerate(kolom))}
+        """, (path,))
+        return cursor.rowcount
+    finally:
+        os.remove(path)
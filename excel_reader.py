@@ -0,0 +1,396 @@
+"""
+Pembaca Excel upload (penjualan, pembelian, customer, supplier, prediksi)
+berbasis openpyxl read-only: file di-parse 1x secara streaming.
+
+- Header dicari di EXCEL_HEADER_ROWS baris pertama: baris pertama yang
+  setiap kolom wajibnya muncul (case-insensitive, boleh bagian dari teks sel)
+- Data dikirim per potongan DataFrame berisi EXCEL_CHUNK_SIZE baris,
+  index lanjut antar potongan (baris data ke-i = index i, sama seperti
+  pd.read_excel(header=...)), sehingga nomor baris Excel = index + header + 2
+
+hash_file, HashIsiFile & hash_potongan dipakai registry import (file /
+potongan yang sudah pernah diimport dilewati): hash_file dari byte file
+(dicek sebelum parse), HashIsiFile & hash_potongan dari isi sel, sehingga
+file yang sama yang di-export / disimpan ulang tetap dikenali.
+
+Konfigurasi dari environment:
+- EXCEL_CHUNK_SIZE (5000)   : baris per potongan
+- EXCEL_HEADER_ROWS (50)    : maksimal baris yang diperiksa untuk header
+
+Pemakaian:
+
+    potongan = baca_excel_bertahap(uploaded_file, ["No. Faktur", "Tgl Faktur"])
+    print(potongan.header_row_index)
+    for df in potongan:
+        df = clean_excel_apostrophe(df)
+        tanggal, gagal = parse_tanggal_kolom(df["Tgl Faktur"])
+        ...
+"""
+
+import hashlib
+import os
+import re
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+EXCEL_CHUNK_SIZE = int(os.environ.get('EXCEL_CHUNK_SIZE', 5000))
+EXCEL_HEADER_ROWS = int(os.environ.get('EXCEL_HEADER_ROWS', 50))
+
+
+class HeaderTidakDitemukan(Exception):
+    """Baris header dengan semua kolom wajib tidak ada di EXCEL_HEADER_ROWS baris pertama"""
+
+
+def _baris_header(baris, expected_cols):
+    """True jika setiap kolom wajib muncul di salah satu sel baris"""
+    sel = [str(nilai).upper() for nilai in baris]
+    return all(any(col.upper() in cell for cell in sel) for col in expected_cols)
+
+
+def _nama_kolom(baris):
+    """Nama kolom seperti pd.read_excel: sel kosong -> 'Unnamed: i', kembar -> 'X.1'"""
+    kolom = []
+    dipakai = {}
+    for i, nilai in enumerate(baris):
+        nama = f"Unnamed: {i}" if nilai is None else nilai
+        if nama in dipakai:
+            dipakai[nama] += 1
+            nama = f"{nama}.{dipakai[nama]}"
+        else:
+            dipakai[nama] = 0
+        kolom.append(nama)
+    return kolom
+
+
+def _nilai_sel(nilai):
+    # Angka bulat dari Excel (float) jadi int, seperti pd.read_excel
+    if isinstance(nilai, float) and nilai.is_integer():
+        return int(nilai)
+    return nilai
+
+
+class PotonganExcel:
+    """
+    Iterator potongan DataFrame dari 1 sheet Excel.
+    header_row_index & columns sudah terisi sebelum iterasi dimulai.
+    Hanya bisa diiterasi 1x (streaming).
+    """
+
+    def __init__(self, workbook, rows, header_row_index, columns, chunk_size):
+        self._workbook = workbook
+        self._rows = rows
+        self.header_row_index = header_row_index
+        self.columns = columns
+        self.chunk_size = chunk_size
+
+    def _potongan(self, buffer, mulai):
+        lebar = len(self.columns)
+        data = [
+            [_nilai_sel(v) for v in baris[:lebar]] + [None] * (lebar - len(baris))
+            for baris in buffer
+        ]
+        df = pd.DataFrame(data, columns=self.columns, index=range(mulai, mulai + len(buffer)))
+        return df.infer_objects()
+
+    def __iter__(self):
+        buffer = []
+        mulai = 0
+        try:
+            for baris in self._rows:
+                buffer.append(baris)
+                if len(buffer) >= self.chunk_size:
+                    yield self._potongan(buffer, mulai)
+                    mulai += len(buffer)
+                    buffer = []
+            if buffer:
+                yield self._potongan(buffer, mulai)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+
+
+def baca_excel_bertahap(file, expected_cols, chunk_size=None, max_header_rows=None):
+    """
+    Buka sheet pertama `file` (path / file upload Streamlit), cari header
+    berisi `expected_cols`, lalu kembalikan PotonganExcel.
+    Raise HeaderTidakDitemukan jika header tidak ditemukan.
+    """
+    # Import di sini agar modul lain (clean_excel_apostrophe) tidak butuh openpyxl
+    from openpyxl import load_workbook
+
+    chunk_size = chunk_size or EXCEL_CHUNK_SIZE
+    max_header_rows = max_header_rows or EXCEL_HEADER_ROWS
+
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # Dimensi sheet dari aplikasi lain sering salah, baca apa adanya
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+
+        for i, baris in enumerate(rows):
+            if i >= max_header_rows:
+                break
+            if _baris_header(baris, expected_cols):
+                return PotonganExcel(workbook, rows, i, _nama_kolom(baris), chunk_size)
+    except Exception:
+        workbook.close()
+        raise
+
+    workbook.close()
+    raise HeaderTidakDitemukan(
+        f"Header kolom {', '.join(expected_cols)} tidak ditemukan "
+        f"di {max_header_rows} baris pertama"
+    )
+
+
+def baca_excel(file, expected_cols, max_header_rows=None):
+    """
+    Versi tidak bertahap untuk file kecil (master data):
+    return (DataFrame seluruh data, header_row_index)
+    """
+    potongan = baca_excel_bertahap(file, expected_cols, max_header_rows=max_header_rows)
+    daftar = list(potongan)
+    if daftar:
+        df = pd.concat(daftar)
+    else:
+        df = pd.DataFrame(columns=potongan.columns)
+    return df, potongan.header_row_index
+
+
+def hash_file(file):
+    """
+    sha256 (hex) byte file upload (UploadedFile / file-like / path), dibaca
+    per blok tanpa parse Excel. Posisi file-like dikembalikan ke awal.
+    """
+    hasher = hashlib.sha256()
+    if hasattr(file, 'read'):
+        file.seek(0)
+        for blok in iter(lambda: file.read(1 << 20), b''):
+            hasher.update(blok)
+        file.seek(0)
+    else:
+        with open(file, 'rb') as f:
+            for blok in iter(lambda: f.read(1 << 20), b''):
+                hasher.update(blok)
+    return hasher.hexdigest()
+
+
+def _hash_baris(df):
+    """Hash uint64 per baris dari nilai sel sebagai teks (tanpa index)"""
+    teks = df.astype(object).where(df.notna(), None).astype(str)
+    return pd.util.hash_pandas_object(teks, index=False).to_numpy()
+
+
+class HashIsiFile:
+    """
+    sha256 (hex) isi 1 file upload yang diisi per potongan (streaming):
+    nama kolom + hash baris bersih sesuai urutan di file. Baris kosong,
+    batas potongan dan container xlsx (zip, metadata, style) tidak ikut,
+    jadi data yang sama yang di-export ulang menghasilkan hash yang sama.
+    """
+
+    def __init__(self, columns):
+        self._hasher = hashlib.sha256("\x1f".join(map(str, columns)).encode('utf-8'))
+
+    def update(self, df):
+        self._hasher.update(_hash_baris(df).tobytes())
+
+    def hexdigest(self):
+        return self._hasher.hexdigest()
+
+
+def hash_potongan(df):
+    """
+    sha256 (hex) isi potongan DataFrame: nama kolom + nilai sel sebagai teks
+    (tanpa index), sehingga baris yang sama menghasilkan hash yang sama
+    walaupun file disimpan ulang / posisinya di file bergeser.
+    """
+    hasher = hashlib.sha256("\x1f".join(map(str, df.columns)).encode('utf-8'))
+    hasher.update(_hash_baris(df).tobytes())
+    return hasher.hexdigest()
+
+
+# Nama bulan Indonesia (lengkap & singkatan) -> Inggris, yang lain sudah sama
+BULAN_ID = {
+    'januari': 'January', 'februari': 'February', 'maret': 'March',
+    'mei': 'May', 'juni': 'June', 'juli': 'July', 'agustus': 'August',
+    'oktober': 'October', 'desember': 'December',
+    'agu': 'Aug', 'agt': 'Aug', 'okt': 'Oct', 'des': 'Dec'
+}
+_POLA_BULAN_ID = re.compile(
+    r"\b(" + "|".join(sorted(BULAN_ID, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+
+# Tanggal 0 serial Excel (sistem 1900, termasuk bug tahun kabisat 1900)
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+# Batas atas datetime64[ns] pandas (tahun 2262)
+_SERIAL_MAKS = (datetime(2262, 1, 1) - EXCEL_EPOCH.to_pydatetime()).days
+
+
+def _dari_serial(angka):
+    """Angka serial Excel -> array datetime64[ns], NaT jika di luar jangkauan"""
+    angka = pd.to_numeric(angka, errors='coerce').to_numpy(dtype=float)
+    angka = np.where((angka >= 0) & (angka <= _SERIAL_MAKS), angka, np.nan)
+    hari = pd.to_timedelta(angka, unit='D').to_numpy(dtype='timedelta64[ns]')
+    return np.datetime64(EXCEL_EPOCH, 'ns') + hari
+
+
+def _ke_ns(nilai, format=None):
+    return pd.to_datetime(nilai, format=format, errors='coerce').to_numpy(dtype='datetime64[ns]')
+
+
+def _parse_teks_tanggal(teks):
+    """Series teks unik -> array datetime64[ns], format di-infer 1x untuk seluruh kolom"""
+    teks = teks.str.replace(_POLA_BULAN_ID, lambda m: BULAN_ID[m.group(1).lower()], regex=True)
+
+    # Angka dalam bentuk teks (mis. '45292') dianggap serial Excel
+    hasil = _dari_serial(teks)
+
+    sisa = pd.to_numeric(teks, errors='coerce').isna().to_numpy()
+    if sisa.any():
+        # Format di-infer sendiri dari nilai pertama (tanpa UserWarning
+        # "Could not infer format" dari pandas); tidak dikenali = per nilai
+        contoh = teks[sisa].dropna()
+        format_kolom = guess_datetime_format(contoh.iloc[0]) if len(contoh) else None
+        hasil[sisa] = _ke_ns(teks[sisa], format=format_kolom or 'mixed')
+
+        # Kolom campuran format: yang tidak cocok format hasil infer di-parse per nilai
+        sisa = sisa & np.isnat(hasil)
+        if sisa.any():
+            hasil[sisa] = pd.to_datetime(teks[sisa], format='mixed', errors='coerce').to_numpy(dtype='datetime64[ns]')
+    return hasil
+
+
+def parse_tanggal_kolom(series):
+    """
+    Parse 1 kolom tanggal hasil upload Excel sekaligus. Nilai yang dikenali:
+    sel tanggal Excel, serial Excel (angka), ISO (2024-05-01) dan teks dengan
+    nama bulan Indonesia (1 Mei 2024, 17-Agu-2024, 3 Desember 2024).
+
+    Return (tanggal, gagal):
+    - tanggal : Series datetime64 (jam dibuang), NaT untuk sel kosong/gagal
+    - gagal   : Index baris yang terisi tapi tidak bisa di-parse
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        hasil = series.to_numpy(dtype='datetime64[ns]')
+        terisi = np.zeros(len(series), dtype=bool)
+    elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        hasil = _dari_serial(series)
+        terisi = series.notna().to_numpy()
+    else:
+        nilai = series.astype(object)
+        hasil = np.full(len(nilai), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+        # Klasifikasi per tipe unik, bukan per sel
+        jenis = nilai.map(type)
+        kelompok = jenis.map({
+            tipe: 'teks' if issubclass(tipe, str)
+            else 'tanggal' if issubclass(tipe, (datetime, date))
+            else 'angka' if issubclass(tipe, (int, float, np.number)) and not issubclass(tipe, (bool, np.bool_))
+            else None
+            for tipe in jenis.unique()
+        }).to_numpy()
+        adalah_teks = kelompok == 'teks'
+        adalah_tanggal = kelompok == 'tanggal'
+        adalah_angka = kelompok == 'angka'
+
+        if adalah_tanggal.any():
+            hasil[adalah_tanggal] = _ke_ns(nilai[adalah_tanggal].map(pd.Timestamp))
+        if adalah_angka.any():
+            hasil[adalah_angka] = _dari_serial(nilai[adalah_angka])
+
+        terisi = nilai.notna().to_numpy().copy()
+        if adalah_teks.any():
+            # Parse per nilai unik (biasanya hanya puluhan tanggal berbeda)
+            teks = nilai[adalah_teks].str.strip()
+            unik = pd.Series(teks.unique(), dtype=object)
+            kode = pd.Index(unik).get_indexer(teks)
+            hasil[adalah_teks] = _parse_teks_tanggal(unik)[kode]
+            terisi[adalah_teks] = (teks != '').to_numpy()
+
+    tanggal = pd.Series(hasil, index=series.index).dt.normalize()
+    return tanggal, series.index[terisi & np.isnat(hasil)]
+
+
+def _kolom_teks(series):
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+
+def clean_excel_apostrophe(df):
+    """
+    Bersihkan hasil baca Excel (dipakai new_database & prediksi/database):
+    - apostrof di awal nama kolom dibuang
+    - sel teks di-strip, 1 apostrof di awal (format teks Excel) dibuang,
+      teks kosong jadi None
+    Hanya kolom teks (object / string) yang disentuh, kolom angka & tanggal
+    tetap dengan dtype aslinya. Nilai bukan teks di kolom object dibiarkan.
+    """
+    # Copy df agar tidak ubah yang asli
+    df = df.copy()
+
+    # --- Bersihkan Nama Kolom ---
+    df.columns = [
+        col[1:] if isinstance(col, str) and col.startswith("'") else col
+        for col in df.columns
+    ]
+
+    # --- Bersihkan Isi Cell (kolom teks saja) ---
+    for i, col in enumerate(df.columns):
+        series = df.iloc[:, i]
+        if not _kolom_teks(series):
+            continue
+
+        teks = series.str.strip()
+        adalah_teks = teks.notna()
+        teks = teks.str.removeprefix("'")
+        teks = teks.where(teks != "", None)
+
+        hasil = series.astype(object).where(~adalah_teks, teks.astype(object))
+        df.iloc[:, i] = hasil.where(hasil.notna(), None) if series.dtype == object else hasil
+
+    return df
+
+
+# Versi lama per sel (semua kolom jadi str), dipertahankan untuk
+# benchmark/bench_clean_excel.py
+def clean_excel_apostrophe_loop(df):   
+    def clean_value(value):
+        # Handle NaN/None
+        if pd.isna(value):
+            return None
+        
+        # Convert ke string dan strip
+        str_value = str(value).strip()
+        
+        # Remove leading apostrophe
+        if str_value.startswith("'"):
+            str_value = str_value[1:]
+        
+        return str_value if str_value else None
+
+    # Copy df agar tidak ubah yang asli
+    df = df.copy()
+
+    # --- Bersihkan Nama Kolom ---
+    df.columns = [
+        col[1:] if isinstance(col, str) and col.startswith("'") else col
+        for col in df.columns
+    ]
+
+    # --- Bersihkan Isi Cell ---
+    for col in df.columns:
+        df[col] = df[col].apply(clean_value)
+
+    return df
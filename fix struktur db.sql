@@ -24,7 +24,8 @@ CREATE TABLE IF NOT EXISTS `barang` (
   `id` bigint unsigned NOT NULL AUTO_INCREMENT,
   `nama` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
   `satuan` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci DEFAULT NULL,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `idx_nama` (`nama`)
 ) ENGINE=InnoDB AUTO_INCREMENT=155 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 -- Data exporting was unselected.
@@ -45,7 +46,8 @@ CREATE TABLE IF NOT EXISTS `customer` (
   `id` bigint unsigned NOT NULL AUTO_INCREMENT,
   `nama` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
   `top` bigint DEFAULT NULL,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `idx_nama` (`nama`)
 ) ENGINE=InnoDB AUTO_INCREMENT=13 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 -- Data exporting was unselected.
@@ -58,6 +60,7 @@ CREATE TABLE IF NOT EXISTS `customer_pricelist` (
   `harga` decimal(15,2) NOT NULL,
   `updated_at` date DEFAULT NULL,
   PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_customer_barang` (`id_customer`,`id_barang`),
   KEY `id_customer` (`id_customer`),
   KEY `id_barang` (`id_barang`),
   CONSTRAINT `FK_cust_pricelist_id_barang` FOREIGN KEY (`id_barang`) REFERENCES `barang` (`id`) ON DELETE CASCADE,
@@ -66,6 +69,77 @@ CREATE TABLE IF NOT EXISTS `customer_pricelist` (
 
 -- Data exporting was unselected.
 
+-- Dumping structure for table trading_db.fifo_checkpoint
+CREATE TABLE IF NOT EXISTS `fifo_checkpoint` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `bulan` date NOT NULL,
+  `id_barang` bigint unsigned NOT NULL,
+  `urutan` int NOT NULL,
+  `id_pembelian_detail` bigint unsigned DEFAULT NULL,
+  `no_nota` varchar(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `qty_sisa` bigint NOT NULL,
+  `unit_cost` decimal(20,6) NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_bulan_barang_urutan` (`bulan`,`id_barang`,`urutan`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Data exporting was unselected.
+
+-- Dumping structure for table trading_db.fifo_checkpoint_status
+CREATE TABLE IF NOT EXISTS `fifo_checkpoint_status` (
+  `bulan` date NOT NULL,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`bulan`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Data exporting was unselected.
+
+-- Dumping structure for table trading_db.fifo_checkpoint_lock
+CREATE TABLE IF NOT EXISTS `fifo_checkpoint_lock` (
+  `id` tinyint unsigned NOT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Baris sentinel (dikunci SELECT ... FOR UPDATE saat build/invalidasi checkpoint)
+INSERT IGNORE INTO `fifo_checkpoint_lock` (`id`) VALUES (1);
+
+-- Dumping structure for table trading_db.gp_cube
+CREATE TABLE IF NOT EXISTS `gp_cube` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `id_barang` bigint unsigned NOT NULL,
+  `id_customer` bigint unsigned DEFAULT NULL,
+  `bulan` date NOT NULL,
+  `total_penjualan` decimal(20,2) NOT NULL,
+  `total_hpp` decimal(20,6) NOT NULL,
+  `qty` bigint NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_barang_bulan` (`id_barang`,`bulan`),
+  KEY `idx_customer_bulan` (`id_customer`,`bulan`),
+  KEY `idx_bulan` (`bulan`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Data exporting was unselected.
+
+-- Dumping structure for table trading_db.hpp_allocation
+CREATE TABLE IF NOT EXISTS `hpp_allocation` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `id_penjualan_detail` bigint unsigned NOT NULL,
+  `id_pembelian_detail` bigint unsigned DEFAULT NULL,
+  `id_barang` bigint unsigned NOT NULL,
+  `tanggal` date NOT NULL,
+  `qty` bigint NOT NULL,
+  `unit_cost` decimal(20,6) NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `id_penjualan_detail` (`id_penjualan_detail`),
+  KEY `id_pembelian_detail` (`id_pembelian_detail`),
+  KEY `idx_barang_tanggal` (`id_barang`,`tanggal`),
+  KEY `idx_tanggal_barang` (`tanggal`,`id_barang`),
+  CONSTRAINT `FK_hpp_allocation_id_penjualan_detail` FOREIGN KEY (`id_penjualan_detail`) REFERENCES `penjualan_detail` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `FK_hpp_allocation_id_pembelian_detail` FOREIGN KEY (`id_pembelian_detail`) REFERENCES `pembelian_detail` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Data exporting was unselected.
+
 -- Dumping structure for table trading_db.hutang
 CREATE TABLE IF NOT EXISTS `hutang` (
   `id` bigint unsigned NOT NULL AUTO_INCREMENT,
@@ -81,12 +155,94 @@ CREATE TABLE IF NOT EXISTS `hutang` (
   `created_at` date DEFAULT NULL,
   `updated_at` date DEFAULT NULL,
   PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_id_pembelian` (`id_pembelian`),
   KEY `id_pembelian` (`id_pembelian`),
-  KEY `id_supplier` (`id_supplier`)
+  KEY `id_supplier` (`id_supplier`),
+  KEY `idx_due_date` (`due_date`),
+  KEY `idx_sisa_due_date` (`sisa`,`due_date`)
 ) ENGINE=InnoDB AUTO_INCREMENT=2 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 -- Data exporting was unselected.
 
+-- Dumping structure for table trading_db.import_job
+CREATE TABLE IF NOT EXISTS `import_job` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `jenis` varchar(20) NOT NULL,
+  `nama_file` varchar(255) DEFAULT NULL,
+  `status` varchar(20) NOT NULL DEFAULT 'ANTRI',
+  `total_baris` int NOT NULL DEFAULT '0',
+  `total_potongan` int NOT NULL DEFAULT '0',
+  `baris_diproses` int NOT NULL DEFAULT '0',
+  `potongan_diproses` int NOT NULL DEFAULT '0',
+  `sukses` int NOT NULL DEFAULT '0',
+  `gagal` int NOT NULL DEFAULT '0',
+  `pesan` varchar(500) DEFAULT NULL,
+  `host` varchar(255) DEFAULT NULL,
+  `pid` int DEFAULT NULL,
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `started_at` datetime DEFAULT NULL,
+  `finished_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_jenis_created` (`jenis`,`created_at`),
+  KEY `idx_status` (`status`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Data exporting was unselected.
+
+-- Dumping structure for table trading_db.import_job_error
+CREATE TABLE IF NOT EXISTS `import_job_error` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `id_job` bigint unsigned NOT NULL,
+  `potongan` int DEFAULT NULL,
+  `pesan` text NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_job_potongan` (`id_job`,`potongan`),
+  CONSTRAINT `FK_import_job_error_id_job` FOREIGN KEY (`id_job`) REFERENCES `import_job` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Data exporting was unselected.
+
+-- Dumping structure for table trading_db.import_registry
+CREATE TABLE IF NOT EXISTS `import_registry` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `jenis` varchar(20) NOT NULL,
+  `hash_file` char(64) NOT NULL,
+  `hash_isi` char(64) DEFAULT NULL,
+  `nama_file` varchar(255) DEFAULT NULL,
+  `jumlah_baris` int NOT NULL DEFAULT '0',
+  `jumlah_import` int NOT NULL DEFAULT '1',
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_jenis_hash_file` (`jenis`,`hash_file`),
+  KEY `idx_jenis_hash_isi` (`jenis`,`hash_isi`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Data exporting was unselected.
+
+-- Dumping structure for table trading_db.import_registry_potongan
+CREATE TABLE IF NOT EXISTS `import_registry_potongan` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `id_registry` bigint unsigned NOT NULL,
+  `jenis` varchar(20) NOT NULL,
+  `hash_potongan` char(64) NOT NULL,
+  `jumlah_baris` int NOT NULL DEFAULT '0',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_jenis_hash_potongan` (`jenis`,`hash_potongan`),
+  KEY `id_registry` (`id_registry`),
+  CONSTRAINT `FK_import_registry_potongan_id_registry` FOREIGN KEY (`id_registry`) REFERENCES `import_registry` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Data exporting was unselected.
+
+-- Dumping structure for table trading_db.ledger_barang_lock
+CREATE TABLE IF NOT EXISTS `ledger_barang_lock` (
+  `id_barang` bigint unsigned NOT NULL,
+  PRIMARY KEY (`id_barang`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Data exporting was unselected.
+
 -- Dumping structure for table trading_db.pembayaran_hutang
 CREATE TABLE IF NOT EXISTS `pembayaran_hutang` (
   `id` bigint unsigned NOT NULL AUTO_INCREMENT,
@@ -130,6 +286,9 @@ CREATE TABLE IF NOT EXISTS `pembelian` (
   `tipe` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
   PRIMARY KEY (`id`),
   KEY `id_supplier` (`id_supplier`),
+  KEY `idx_tanggal` (`tanggal`),
+  KEY `idx_tipe_tanggal` (`tipe`,`tanggal`),
+  UNIQUE KEY `uq_nota_tanggal_supplier` (`no_nota`,`tanggal`,`id_supplier`),
   CONSTRAINT `FK_pembelian_id_supplier` FOREIGN KEY (`id_supplier`) REFERENCES `supplier` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=10 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
@@ -143,11 +302,13 @@ CREATE TABLE IF NOT EXISTS `pembelian_detail` (
   `kuantitas` bigint NOT NULL,
   `harga_satuan` decimal(15,2) NOT NULL,
   `subtotal` decimal(15,2) NOT NULL,
+  `qty_sisa` bigint NOT NULL DEFAULT '0',
   PRIMARY KEY (`id`),
   KEY `id_pembelian` (`id_pembelian`),
   KEY `id_barang` (`id_barang`),
   CONSTRAINT `FK_pembelian_detail_id_barang` FOREIGN KEY (`id_barang`) REFERENCES `barang` (`id`),
-  CONSTRAINT `FK_pembelian_detail_id_pembelian` FOREIGN KEY (`id_pembelian`) REFERENCES `pembelian` (`id`) ON DELETE CASCADE
+  CONSTRAINT `FK_pembelian_detail_id_pembelian` FOREIGN KEY (`id_pembelian`) REFERENCES `pembelian` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `chk_pembelian_detail_qty_sisa` CHECK ((`qty_sisa` >= 0))
 ) ENGINE=InnoDB AUTO_INCREMENT=13 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 -- Data exporting was unselected.
@@ -162,6 +323,8 @@ CREATE TABLE IF NOT EXISTS `penjualan` (
   `top` bigint DEFAULT NULL,
   PRIMARY KEY (`id`),
   KEY `id_customer` (`id_customer`),
+  KEY `idx_tanggal` (`tanggal`),
+  UNIQUE KEY `uq_nota_tanggal_customer` (`no_nota`,`tanggal`,`id_customer`),
   CONSTRAINT `FK_penjualan_id_customer` FOREIGN KEY (`id_customer`) REFERENCES `customer` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=11 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
@@ -199,19 +362,47 @@ CREATE TABLE IF NOT EXISTS `piutang` (
   `created_at` date DEFAULT NULL,
   `updated_at` date DEFAULT NULL,
   PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_id_penjualan` (`id_penjualan`),
   KEY `id_penjualan` (`id_penjualan`),
   KEY `id_customer` (`id_customer`),
+  KEY `idx_due_date` (`due_date`),
+  KEY `idx_sisa_due_date` (`sisa`,`due_date`),
   CONSTRAINT `FK_piutang_id_penjualan` FOREIGN KEY (`id_penjualan`) REFERENCES `penjualan` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=6 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 -- Data exporting was unselected.
 
+-- Dumping structure for table trading_db.schema_migrations
+CREATE TABLE IF NOT EXISTS `schema_migrations` (
+  `versi` int NOT NULL,
+  `nama` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+  `applied_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`versi`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Data exporting was unselected.
+
+-- Dumping structure for table trading_db.stok_harian
+CREATE TABLE IF NOT EXISTS `stok_harian` (
+  `id_barang` bigint unsigned NOT NULL,
+  `tanggal` date NOT NULL,
+  `masuk` bigint NOT NULL DEFAULT '0',
+  `keluar` bigint NOT NULL DEFAULT '0',
+  `total_masuk` bigint NOT NULL DEFAULT '0',
+  `total_keluar` bigint NOT NULL DEFAULT '0',
+  `saldo` bigint NOT NULL DEFAULT '0',
+  PRIMARY KEY (`id_barang`,`tanggal`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Data exporting was unselected.
+
 -- Dumping structure for table trading_db.supplier
 CREATE TABLE IF NOT EXISTS `supplier` (
   `id` bigint unsigned NOT NULL AUTO_INCREMENT,
   `nama` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
   `top` bigint DEFAULT NULL,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `idx_nama` (`nama`)
 ) ENGINE=InnoDB AUTO_INCREMENT=8 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 -- Data exporting was unselected.
@@ -224,6 +415,7 @@ CREATE TABLE IF NOT EXISTS `supplier_pricelist` (
   `harga` decimal(15,2) NOT NULL,
   `updated_at` date DEFAULT NULL,
   PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_supplier_barang` (`id_supplier`,`id_barang`),
   KEY `id_supplier` (`id_supplier`),
   KEY `id_barang` (`id_barang`),
   CONSTRAINT `FK_supp_pricelist_id_barang` FOREIGN KEY (`id_barang`) REFERENCES `barang` (`id`) ON DELETE CASCADE,
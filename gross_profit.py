@@ -82,22 +82,24 @@ with col_filter3:
         st.error("Gagal memuat list barang. Pastikan database terkoneksi.")
         filter_barang = None
 
+    metode_hpp = st.selectbox(
+        "Metode HPP",
+        list(new_database.METODE_HPP),
+        help="Metode perhitungan HPP. Kartu stok di tab detail tetap memakai FIFO."
+    )
+
 st.markdown("---")
 
 # ==================== MAIN CONTENT ====================
 try:
-    with st.spinner("Sedang menghitung Gross Profit (FIFO)..."):
-        # 1. Ambil Data Mentah (Query ada di new_database.py)
-        pembelian_df = new_database.get_pembelian_data(start_date, end_date)
-        penjualan_df = new_database.get_penjualan_data(start_date, end_date)
+    with st.spinner(f"Sedang menghitung Gross Profit ({metode_hpp})..."):
+        # 1. Ambil Gross Profit sesuai metode HPP (FIFO dari checkpoint / ledger, Query ada di new_database.py)
+        gp_df = new_database.get_gross_profit_metode(metode_hpp, start_date, end_date)
     
-    if pembelian_df.empty or penjualan_df.empty:
+    if gp_df.empty:
         st.warning("⚠️ Tidak ada data transaksi pembelian/penjualan untuk periode yang dipilih.")
     else:
-        # 2. Hitung Logic FIFO (Logic ada di new_database.py)
-        gp_df = new_database.calculate_gross_profit_fifo(pembelian_df, penjualan_df)
-        
-        # 3. Terapkan Filter Barang di Hasil Akhir
+        # 2. Terapkan Filter Barang di Hasil Akhir
         if filter_barang:
             gp_df = gp_df[gp_df['nama_barang'].isin(filter_barang)]
         
@@ -141,10 +143,11 @@ try:
             st.markdown("---")
             
             # === TABS VISUALISASI ===
-            tab1, tab2, tab3 = st.tabs([
+            tab1, tab2, tab3, tab4 = st.tabs([
                 "📋 Tabel Gross Profit", 
                 "📐 Detail Perhitungan",
-                "📊 Visualisasi"
+                "📊 Visualisasi",
+                "👥 Per Customer & Bulan"
             ])
             
             # TAB 1: TABEL
@@ -233,13 +236,18 @@ try:
                     st.markdown("---")
                     
                     # === GENERATE KARTU STOK ===
-                    kartu_stok = new_database.generate_kartu_stok_fifo(
+                    # Antrian FIFO dimulai dari checkpoint akhir bulan sebelum start_date
+                    saldo_awal, pembelian_df, penjualan_df = new_database.get_fifo_window_data(start_date, end_date)
+
+                    total_baris = new_database.count_kartu_stok_fifo(
                         barang_id, 
                         pembelian_df, 
-                        penjualan_df
+                        penjualan_df,
+                        saldo_awal=saldo_awal,
+                        start_date=start_date
                     )
                     
-                    if not kartu_stok.empty:
+                    if total_baris > 0:
                         # === SECTION 1: RIWAYAT PEMBELIAN (Stock In) ===
                         st.markdown("### 📥 Riwayat Pembelian (Stock In)")
                         
@@ -248,6 +256,12 @@ try:
                             (pembelian_df['tipe'] == 'Barang')
                         ].copy()
                         
+                        # Pembelian antara checkpoint & start_date hanya untuk FIFO
+                        if start_date:
+                            pembelian_barang = pembelian_barang[
+                                pd.to_datetime(pembelian_barang['tanggal']) >= pd.Timestamp(start_date)
+                            ]
+                        
                         # Mapping ongkir
                         ongkir_map = {}
                         ongkir_rows = pembelian_df[
@@ -256,23 +270,24 @@ try:
                         ]
                         for _, ongkir_row in ongkir_rows.iterrows():
                             key = (ongkir_row['tanggal'], ongkir_row['id_barang'])
-                            ongkir_map[key] = float(ongkir_row['subtotal'])
+                            ongkir_map[key] = ongkir_map.get(key, 0) + new_database.dari_sen(ongkir_row['subtotal'])
                         
                         # Format pembelian untuk display
                         pembelian_display = []
                         for _, row in pembelian_barang.iterrows():
                             key = (row['tanggal'], barang_id)
                             ongkir = ongkir_map.get(key, 0)
-                            hpp_unit = (row['subtotal'] + ongkir) / row['kuantitas']
+                            harga_barang = new_database.dari_sen(row['subtotal'])
+                            hpp_unit = (harga_barang + ongkir) / row['kuantitas']
                             
                             pembelian_display.append({
                                 'Tanggal': pd.to_datetime(row['tanggal']).strftime('%d %b %Y'),
                                 'No. Nota': row['no_nota'],
                                 'Qty': f"{row['kuantitas']:.0f} pcs",
-                                'Harga Barang': f"Rp {row['subtotal']:,.0f}".replace(",", "."),
+                                'Harga Barang': f"Rp {harga_barang:,.0f}".replace(",", "."),
                                 'Ongkir': f"Rp {ongkir:,.0f}".replace(",", "."),
                                 'HPP/pcs': f"Rp {hpp_unit:,.0f}".replace(",", "."),
-                                'Total HPP': f"Rp {(row['subtotal'] + ongkir):,.0f}".replace(",", ".")
+                                'Total HPP': f"Rp {(harga_barang + ongkir):,.0f}".replace(",", ".")
                             })
                         
                         st.dataframe(
@@ -286,6 +301,42 @@ try:
                         # === SECTION 2: KARTU STOK PENJUALAN (Stock Out) ===
                         st.markdown("### 📤 Riwayat Penjualan (Stock Out)")
                         
+                        # Kartu stok diambil per halaman (FIFO tetap dihitung dari awal)
+                        col_page1, col_page2, col_page3 = st.columns([1, 1, 2])
+                        
+                        with col_page1:
+                            page_size = st.selectbox(
+                                "Baris per halaman",
+                                [50, 100, 250, 500],
+                                key='kartu_stok_page_size'
+                            )
+                        
+                        total_halaman = (total_baris - 1) // page_size + 1
+                        
+                        with col_page2:
+                            halaman = st.number_input(
+                                "Halaman",
+                                min_value=1,
+                                max_value=total_halaman,
+                                value=1,
+                                step=1,
+                                key='kartu_stok_halaman'
+                            )
+                        
+                        with col_page3:
+                            st.caption(f"Total {total_baris} transaksi penjualan • {total_halaman} halaman")
+                        
+                        kartu_stok = new_database.get_kartu_stok_page(
+                            barang_id,
+                            pembelian_df,
+                            penjualan_df,
+                            offset=(halaman - 1) * page_size,
+                            limit=page_size,
+                            saldo_awal=saldo_awal,
+                            start_date=start_date,
+                            sen=True
+                        )
+                        
                         # Format untuk display
                         kartu_display = kartu_stok.copy()
                         kartu_display['Tanggal'] = pd.to_datetime(kartu_display['tanggal']).dt.strftime('%d %b %Y')
@@ -405,6 +456,95 @@ try:
                 )
                 st.plotly_chart(fig3, use_container_width=True)
 
+            # TAB 4: DRILL-DOWN CUSTOMER / BULAN (dari gp_cube)
+            with tab4:
+                st.subheader("👥 Gross Profit per Customer & Bulan")
+                st.caption("Dihitung dari ringkasan HPP FIFO per bulan, filter tanggal dibulatkan ke bulan penuh.")
+                
+                kelompok = st.radio(
+                    "Kelompokkan per",
+                    ["Customer", "Bulan", "Customer & Bulan"],
+                    horizontal=True,
+                    key='cube_kelompok'
+                )
+                group_by = {
+                    "Customer": ('customer',),
+                    "Bulan": ('bulan',),
+                    "Customer & Bulan": ('customer', 'bulan')
+                }[kelompok]
+                
+                if filter_barang:
+                    group_by = ('barang',) + group_by
+                
+                cube_df = new_database.get_gross_profit_cube(start_date, end_date, group_by)
+                if filter_barang:
+                    cube_df = cube_df[cube_df['nama_barang'].isin(filter_barang)]
+                
+                if cube_df.empty:
+                    st.info("Belum ada data ringkasan untuk periode ini.")
+                else:
+                    cube_display = cube_df.copy()
+                    if 'bulan' in cube_display.columns:
+                        cube_display['bulan'] = pd.to_datetime(cube_display['bulan']).dt.strftime('%b %Y')
+                    for col in ['total_penjualan', 'total_hpp', 'gross_profit']:
+                        cube_display[col] = cube_display[col].apply(lambda x: f"Rp {x:,.0f}".replace(",", "."))
+                    cube_display['margin_persen'] = cube_display['margin_persen'].apply(lambda x: f"{x:.2f}%")
+                    
+                    cube_display = cube_display.drop(columns=['id_barang', 'id_customer'], errors='ignore').rename(columns={
+                        'nama_barang': 'Nama Barang',
+                        'nama_customer': 'Customer',
+                        'bulan': 'Bulan',
+                        'total_penjualan': 'Total Penjualan',
+                        'total_hpp': 'Total HPP',
+                        'gross_profit': 'Gross Profit',
+                        'margin_persen': 'Margin (%)',
+                        'qty_terjual': 'Qty Terjual'
+                    })
+                    
+                    st.dataframe(cube_display, use_container_width=True, hide_index=True)
+                    
+                    # === DRILL-DOWN PER NOTA ===
+                    if 'customer' in group_by:
+                        customer_opsi = (
+                            cube_df.dropna(subset=['id_customer'])
+                            .drop_duplicates('id_customer')
+                            .set_index('nama_customer')['id_customer']
+                        )
+                        
+                        selected_customer = st.selectbox(
+                            "Lihat nota customer",
+                            options=[""] + customer_opsi.index.tolist(),
+                            key='cube_customer'
+                        )
+                        
+                        if selected_customer:
+                            nota_df = new_database.get_gross_profit_per_nota(
+                                start_date,
+                                end_date,
+                                id_customer=customer_opsi[selected_customer]
+                            )
+                            
+                            nota_display = nota_df.drop(columns=['id']).copy()
+                            nota_display['tanggal'] = pd.to_datetime(nota_display['tanggal']).dt.strftime('%d %b %Y')
+                            for col in ['total_penjualan', 'total_hpp', 'gross_profit']:
+                                nota_display[col] = nota_display[col].apply(lambda x: f"Rp {x:,.0f}".replace(",", "."))
+                            nota_display['margin_persen'] = nota_display['margin_persen'].apply(lambda x: f"{x:.2f}%")
+                            
+                            st.dataframe(
+                                nota_display.rename(columns={
+                                    'no_nota': 'No. Nota',
+                                    'tanggal': 'Tanggal',
+                                    'nama_customer': 'Customer',
+                                    'total_penjualan': 'Total Penjualan',
+                                    'total_hpp': 'Total HPP',
+                                    'gross_profit': 'Gross Profit',
+                                    'margin_persen': 'Margin (%)',
+                                    'qty_terjual': 'Qty Terjual'
+                                }),
+                                use_container_width=True,
+                                hide_index=True
+                            )
+
 except Exception as e:
     st.error(f"❌ Terjadi kesalahan: {str(e)}")
     # st.exception(e) # Uncomment ini jika ingin melihat detail error teknis untuk debugging
\ No newline at end of file
@@ -0,0 +1,540 @@
+"""
+Antrian job import Excel besar (penjualan / pembelian) yang dijalankan
+worker thread di proses Streamlit, sehingga tombol Simpan langsung kembali
+dan operator bisa tetap memakai halaman (atau refresh) selama import.
+
+- Halaman upload memvalidasi file (validasi_upload, dry-run streaming yang
+  hanya menyimpan hash, error & preview), lalu kirim_job() menyalin file ke
+  file sementara, menyimpan job di tabel import_job (migrasi 0004) dan
+  memasukkan path-nya ke antrian. Worker membaca ulang file per potongan
+  langsung ke insert_*, jadi isi file tidak ditahan di memory
+- IMPORT_JOB_WORKERS worker memproses job dari antrian. Tiap job = 1
+  panggilan insert_penjualan / insert_pembelian (tetap 1 transaksi, semua
+  atau tidak sama sekali)
+- Setelah setiap potongan ditulis, progres (baris & potongan) di-commit ke
+  import_job lewat koneksi terpisah; error per potongan disimpan di
+  import_job_error. Halaman upload mem-poll status lewat tampilkan_job_import()
+
+Konfigurasi dari environment:
+- IMPORT_JOB_WORKERS (1)    : jumlah worker thread
+- IMPORT_JOB_POLL (3)       : detik antar refresh panel status
+
+CATATAN:
+- Antrian ada di memory proses: tiap job mencatat host & pid pemiliknya
+  (migrasi 0008). Job ANTRI / JALAN yang proses pemiliknya sudah mati
+  (server restart) ditandai GAGAL saat worker pertama kali dijalankan;
+  job milik proses Streamlit lain yang masih hidup tidak disentuh
+- Default 1 worker: job dijalankan berurutan. Dengan IMPORT_JOB_WORKERS > 1
+  job tetap aman karena ledger turunan (hpp_allocation, qty_sisa, gp_cube,
+  stok_harian) dikunci per barang (ledger_barang_lock, migrasi 0009), tapi
+  job yang berbagi barang tetap saling menunggu di database; job yang
+  menunggu lebih lama dari innodb_lock_wait_timeout gagal (di-rollback),
+  jadi naikkan timeout tsb jika file besar diimport paralel
+"""
+
+import os
+import re
+import queue
+import shutil
+import socket
+import tempfile
+import threading
+
+import pandas as pd
+import streamlit as st
+
+import excel_reader
+import new_database
+
+IMPORT_JOB_WORKERS = int(os.environ.get('IMPORT_JOB_WORKERS', 1))
+IMPORT_JOB_POLL = int(os.environ.get('IMPORT_JOB_POLL', 3))
+
+STATUS_ANTRI = 'ANTRI'
+STATUS_JALAN = 'JALAN'
+STATUS_SELESAI = 'SELESAI'
+STATUS_GAGAL = 'GAGAL'
+
+# jenis -> fungsi import (df / iterable potongan, default_top) -> (success, failed, errors)
+JENIS_IMPORT = {
+    'penjualan': new_database.insert_penjualan,
+    'pembelian': new_database.insert_pembelian
+}
+
+_antrian = queue.Queue()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+# ================================================
+# TABEL import_job
+# ================================================
+
+def _eksekusi(query, params=()):
+    """Jalankan 1 statement tulis lalu commit; return lastrowid"""
+    conn = new_database.get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(query, params)
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        cursor.close()
+        conn.close()
+
+def _proses_hidup(pid):
+    """True jika proses `pid` di host ini masih berjalan"""
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Ada, tapi milik user lain
+        return True
+    except OSError:
+        return False
+    return True
+
+def _tandai_job_yatim():
+    """
+    Job ANTRI / JALAN yang proses pemiliknya sudah mati tidak akan pernah
+    selesai. Dipanggil sebelum worker proses ini jalan, jadi job dengan pid
+    proses ini sendiri (pid dipakai ulang setelah restart) juga yatim. Job
+    milik host lain tidak bisa dicek dan dibiarkan; job tanpa pemilik
+    (sebelum migrasi 0008) dianggap yatim.
+    """
+    conn = new_database.get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            "SELECT id, host, pid FROM import_job WHERE status IN (%s, %s)",
+            (STATUS_ANTRI, STATUS_JALAN)
+        )
+        host = socket.gethostname()
+        yatim = [
+            (STATUS_GAGAL, "Server restart sebelum job selesai, upload ulang file",
+             int(id_job), STATUS_ANTRI, STATUS_JALAN)
+            for id_job, host_job, pid in cursor.fetchall()
+            if host_job is None or pid is None
+            or (host_job == host and (int(pid) == os.getpid() or not _proses_hidup(pid)))
+        ]
+        if yatim:
+            cursor.executemany("""
+                UPDATE import_job
+                SET status = %s, pesan = %s, finished_at = NOW()
+                WHERE id = %s AND status IN (%s, %s)
+            """, yatim)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+def _update_progres(id_job, baris, potongan, pesan):
+    _eksekusi("""
+        UPDATE import_job
+        SET baris_diproses = %s, potongan_diproses = %s, pesan = %s
+        WHERE id = %s
+    """, (int(baris), int(potongan), pesan, int(id_job)))
+
+def _simpan_error(id_job, errors, rentang_index):
+    """
+    Simpan pesan error ke import_job_error. Nomor potongan dicari dari
+    'Baris N' (index = N - 2) dan rentang index tiap potongan; error tanpa
+    nomor baris (error database) disimpan dengan potongan NULL.
+    """
+    rows = []
+    for pesan in errors:
+        potongan = None
+        cocok = re.match(r"Baris (\d+)", str(pesan))
+        if cocok:
+            index = int(cocok.group(1)) - 2
+            potongan = next(
+                (k for k, (awal, akhir) in enumerate(rentang_index, 1) if awal <= index <= akhir),
+                None
+            )
+        rows.append((int(id_job), potongan, str(pesan)))
+
+    if not rows:
+        return
+
+    conn = new_database.get_connection()
+    cursor = conn.cursor()
+
+    try:
+        new_database._executemany_batch(cursor, """
+            INSERT INTO import_job_error (id_job, potongan, pesan)
+            VALUES (%s, %s, %s)
+        """, rows)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_job(id_job):
+    """Status 1 job (dict) atau None"""
+    conn = new_database.get_connection()
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        cursor.execute("SELECT * FROM import_job WHERE id = %s", (int(id_job),))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_daftar_job(jenis=None, limit=10):
+    """Job terbaru (DataFrame), opsional difilter jenis"""
+    conn = new_database.get_connection()
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        where, params = ("WHERE jenis = %s", (jenis,)) if jenis else ("", ())
+        cursor.execute(f"""
+            SELECT id, jenis, nama_file, status, total_baris, baris_diproses,
+                   total_potongan, potongan_diproses, sukses, gagal, pesan,
+                   created_at, started_at, finished_at
+            FROM import_job
+            {where}
+            ORDER BY id DESC
+            LIMIT {int(limit)}
+        """, params)
+        return pd.DataFrame(cursor.fetchall())
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_error_job(id_job, limit=500):
+    """Error job (DataFrame potongan, pesan) urut per potongan"""
+    conn = new_database.get_connection()
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        cursor.execute(f"""
+            SELECT potongan, pesan
+            FROM import_job_error
+            WHERE id_job = %s
+            ORDER BY potongan IS NULL, potongan, id
+            LIMIT {int(limit)}
+        """, (int(id_job),))
+        return pd.DataFrame(cursor.fetchall(), columns=['potongan', 'pesan'])
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# ================================================
+# BACA & VALIDASI FILE UPLOAD
+# ================================================
+# File dibaca streaming 2x: sekali di halaman upload (validasi_upload, yang
+# disimpan hanya hash, error, preview & jumlah baris) dan sekali oleh worker
+# dari salinan file sementara (_potongan_upload langsung ke insert_*), jadi
+# isi file tidak pernah ditahan di memory sebagai DataFrame.
+
+# jenis -> kolom wajib Excel upload
+KOLOM_UPLOAD = {
+    'penjualan': ["Tgl Faktur", "No. Faktur", "Nama Pelanggan", "Keterangan Barang", "Kuantitas", "Jumlah"],
+    'pembelian': ["Tgl Faktur", "No. Faktur", "Nama Supplier", "Keterangan Barang", "Kuantitas", "Jumlah"]
+}
+
+# jenis -> dry-run import (iterable potongan) -> (errors, peringatan)
+VALIDASI_UPLOAD = {
+    'penjualan': new_database.validasi_penjualan,
+    'pembelian': new_database.validasi_pembelian
+}
+
+# AUTO-DETECT TIPE PEMBELIAN (BARANG vs ONGKIR)
+def detect_tipe(nama_barang):
+    # Kata kunci untuk mendeteksi ongkir
+    keywords = ['ONGKIR', 'PENGIRIMAN', 'EKSPEDISI', 'DELIVERY', 'JASA ANGKUT', 'KURIR', 'FREIGHT']
+
+    if pd.isna(nama_barang):
+        return 'BARANG'
+
+    nama_upper = str(nama_barang).upper()
+    if any(k in nama_upper for k in keywords):
+        return 'ONGKIR'
+    return 'BARANG'
+
+def proses_potongan(jenis, df, header_row_index, cache):
+    """
+    Bersihkan 1 potongan upload (sudah dropna) seperti halaman upload:
+    pilih kolom, buang apostrof, cek satuan & harga satuan, hitung harga
+    satuan jika tidak ada (+ kolom tipe untuk pembelian).
+    cache: dict yang dipakai ulang antar potongan 1 file.
+    Return (df, mismatch_errors).
+    """
+    mismatch_errors = []
+    df = df[KOLOM_UPLOAD[jenis]]
+    df = excel_reader.clean_excel_apostrophe(df)
+
+    # 1. PENGECEKAN SATUAN BARANG
+    if "Satuan" in df.columns:
+        if 'satuan' not in cache:
+            df_barang_db = new_database.get_all_data_barang(["nama", "satuan"])
+            cache['satuan'] = dict(zip(df_barang_db['nama'].str.upper(), df_barang_db['satuan'].astype(str).str.lower()))
+        dict_satuan_db = cache['satuan']
+
+        for idx, row in df.iterrows():
+            excel_nama = str(row.get('Keterangan Barang')).strip().upper()
+            excel_satuan = str(row.get('Satuan')).strip().lower()
+
+            if not pd.isna(row.get('Satuan')) and excel_nama in dict_satuan_db:
+                db_satuan = dict_satuan_db[excel_nama]
+                if excel_satuan != db_satuan:
+                    mismatch_errors.append(f"Baris {idx + header_row_index + 2}: Barang '{row['Keterangan Barang']}' (Satuan Excel: {row['Satuan']} | Satuan DB: {db_satuan})")
+
+    # 2. PENGECEKAN HARGA SATUAN
+    if "Harga Satuan" in df.columns:
+        for idx, row in df.iterrows():
+            customer = str(row.get('Nama Pelanggan')).strip()
+            barang = str(row.get('Keterangan Barang')).strip()
+            excel_price = row.get('Harga Satuan')
+
+            if pd.notna(excel_price):
+                db_price = new_database.get_harga_customer(customer, barang)
+                if db_price is None:
+                    db_price = 0
+
+                # Toleransi perbedaan koma / desimal kecil (jika selisih >= 1 Rupiah, anggap beda)
+                if abs(float(excel_price) - float(db_price)) >= 1:
+                    mismatch_errors.append(f"Baris {idx + header_row_index + 2}: Harga Satuan '{barang}' untuk '{customer}' tidak sesuai! (Excel: Rp {float(excel_price):,.0f} | DB: Rp {float(db_price):,.0f})")
+    elif not df.empty:
+        # 3. JIKA TIDAK ADA KOLOM HARGA SATUAN, HITUNG OTOMATIS
+        # Mencegah error pembagian dengan 0 (ZeroDivisionError)
+        df["Harga Satuan"] = df.apply(
+            lambda row: float(row["Jumlah"]) / float(row["Kuantitas"]) if float(row["Kuantitas"]) > 0 else 0,
+            axis=1
+        )
+
+    if jenis == 'pembelian':
+        # Buat kolom tipe secara otomatis
+        df['tipe'] = df['Keterangan Barang'].apply(detect_tipe)
+
+    return df, mismatch_errors
+
+def _potongan_upload(jenis, file, lewati=()):
+    """Potongan bersih dari file upload; potongan dengan hash di `lewati` dilewati"""
+    lewati = set(lewati)
+    potongan_excel = excel_reader.baca_excel_bertahap(file, KOLOM_UPLOAD[jenis])
+    cache = {}
+
+    for df in potongan_excel:
+        df = df.dropna(how="all")
+        if lewati and excel_reader.hash_potongan(df) in lewati:
+            continue
+        yield proses_potongan(jenis, df, potongan_excel.header_row_index, cache)[0]
+
+def validasi_upload(jenis, file, paksa=False):
+    """
+    Validasi file upload dalam 1 pass streaming tanpa menyimpan isi file.
+    File yang byte-nya sudah terdaftar di registry import langsung ditolak
+    sebelum di-parse (hash_file). Selain itu potongan yang sudah terdaftar
+    dilewati, dan hash_isi (baris bersih kolom wajib sesuai urutan,
+    termasuk potongan yang dilewati) dicek setelah pass selesai untuk
+    file yang di-export / disimpan ulang. Keduanya diabaikan jika paksa.
+    Return dict:
+    - terdaftar       : registry file jika file sudah pernah diimport (dan
+                        tidak dipaksa); key lain tidak diisi
+    - hash_file, hash_isi, potongan (list (hash, jumlah_baris) yang akan
+      diimport), lewati (hash potongan yang dilewati), baris_dilewati
+    - total_baris, total_potongan, preview (10 baris pertama)
+    - mismatch_errors, errors, peringatan
+    """
+    # File yang sama persis: ditolak tanpa parse Excel & tanpa query lain
+    hash_file = excel_reader.hash_file(file)
+    terdaftar = new_database.get_import_terdaftar(jenis, hash_file=hash_file)
+    if terdaftar and not paksa:
+        return {'terdaftar': terdaftar}
+
+    hasil = {
+        'terdaftar': None, 'hash_file': hash_file, 'potongan': [], 'lewati': [],
+        'baris_dilewati': 0, 'total_baris': 0, 'total_potongan': 0,
+        'preview': pd.DataFrame(columns=KOLOM_UPLOAD[jenis]), 'mismatch_errors': []
+    }
+    potongan_excel = excel_reader.baca_excel_bertahap(file, KOLOM_UPLOAD[jenis])
+    cache = {}
+    isi_file = excel_reader.HashIsiFile(KOLOM_UPLOAD[jenis])
+
+    def potongan_bersih():
+        for df in potongan_excel:
+            df = df.dropna(how="all")
+            isi_file.update(excel_reader.clean_excel_apostrophe(df[KOLOM_UPLOAD[jenis]]))
+
+            # Potongan yang isinya sama dengan import sebelumnya dilewati
+            hash_bagian = excel_reader.hash_potongan(df)
+            if not paksa and new_database.cek_potongan_terdaftar(jenis, hash_bagian):
+                hasil['lewati'].append(hash_bagian)
+                hasil['baris_dilewati'] += len(df)
+                continue
+            hasil['potongan'].append((hash_bagian, len(df)))
+
+            df, mismatch = proses_potongan(jenis, df, potongan_excel.header_row_index, cache)
+            hasil['mismatch_errors'].extend(mismatch)
+            if hasil['total_potongan'] == 0:
+                hasil['preview'] = df.head(10)
+            hasil['total_baris'] += len(df)
+            hasil['total_potongan'] += 1
+            yield df
+
+    # Dry-run: semua baris dicek sekaligus sebelum menulis ke database
+    hasil['errors'], hasil['peringatan'] = VALIDASI_UPLOAD[jenis](potongan_bersih())
+
+    # File dengan isi yang sama (walaupun di-export / disimpan ulang) sudah pernah diimport
+    hasil['hash_isi'] = isi_file.hexdigest()
+    terdaftar = new_database.get_import_terdaftar(jenis, hash_isi=hasil['hash_isi'])
+    if terdaftar and not paksa:
+        return {'terdaftar': terdaftar}
+    return hasil
+
+
+# ================================================
+# WORKER
+# ================================================
+
+def _jalankan_job(id_job, jenis, path, total_baris, total_potongan, lewati=(), default_top=None, registry=None):
+    """Proses 1 job: file dibaca streaming langsung ke insert_*, progres di-commit per potongan"""
+    _eksekusi(
+        "UPDATE import_job SET status = %s, started_at = NOW(), pesan = %s WHERE id = %s",
+        (STATUS_JALAN, "Mulai import", int(id_job))
+    )
+
+    rentang_index = []
+
+    def dengan_progres():
+        # Generator diminta potongan berikutnya setelah potongan sebelumnya ditulis
+        baris = 0
+        for k, bagian in enumerate(_potongan_upload(jenis, path, lewati), 1):
+            _update_progres(id_job, baris, k - 1, f"Menulis potongan {k}/{total_potongan}")
+            rentang_index.append((bagian.index.min(), bagian.index.max()) if len(bagian) else (0, -1))
+            yield bagian
+            baris += len(bagian)
+        _update_progres(id_job, baris, total_potongan, "Update piutang/hutang, ledger HPP & stok")
+
+    try:
+        success, failed, errors = JENIS_IMPORT[jenis](dengan_progres(), default_top=default_top, registry=registry)
+    except Exception as e:
+        success, failed, errors = 0, total_baris, [str(e)]
+
+    _simpan_error(id_job, errors, rentang_index)
+    status = STATUS_GAGAL if errors else STATUS_SELESAI
+    pesan = f"{len(errors)} error" if errors else f"{success} baris berhasil diimport"
+    _eksekusi("""
+        UPDATE import_job
+        SET status = %s, sukses = %s, gagal = %s, pesan = %s, finished_at = NOW()
+        WHERE id = %s
+    """, (status, int(success), int(failed), pesan, int(id_job)))
+
+def _worker():
+    while True:
+        id_job, jenis, path, *args = _antrian.get()
+        try:
+            _jalankan_job(id_job, jenis, path, *args)
+        except Exception as e:
+            # Gagal mencatat progres (mis. database putus): tetap lanjut ke job berikutnya
+            try:
+                _eksekusi(
+                    "UPDATE import_job SET status = %s, pesan = %s, finished_at = NOW() WHERE id = %s",
+                    (STATUS_GAGAL, str(e)[:500], int(id_job))
+                )
+            except Exception:
+                pass
+        finally:
+            _hapus_file(path)
+            _antrian.task_done()
+
+def _hapus_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _pastikan_worker():
+    """Jalankan worker thread (sekali per proses)"""
+    with _workers_lock:
+        if _workers:
+            return
+        _tandai_job_yatim()
+        for i in range(IMPORT_JOB_WORKERS):
+            thread = threading.Thread(target=_worker, name=f"import-job-{i + 1}", daemon=True)
+            thread.start()
+            _workers.append(thread)
+
+def kirim_job(jenis, nama_file, file, total_baris, total_potongan, lewati=(), default_top=None, registry=None):
+    """
+    Masukkan import ke antrian. file: file upload yang sudah lolos
+    validasi_upload (total_baris, total_potongan & lewati dari hasilnya);
+    isinya disalin ke file sementara yang dibaca worker lalu dihapus.
+    registry: hash file & potongan yang dicatat bersama import
+    (new_database._catat_registry_import). Return id job.
+    """
+    if jenis not in JENIS_IMPORT:
+        raise Exception(f"Jenis import '{jenis}' tidak dikenal")
+
+    fd, path = tempfile.mkstemp(prefix=f"import_{jenis}_", suffix=".xlsx")
+    with os.fdopen(fd, 'wb') as f:
+        file.seek(0)
+        shutil.copyfileobj(file, f)
+
+    try:
+        _pastikan_worker()
+        id_job = _eksekusi("""
+            INSERT INTO import_job (jenis, nama_file, status, total_baris, total_potongan, pesan, host, pid)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (
+            jenis, nama_file, STATUS_ANTRI, int(total_baris), int(total_potongan),
+            f"Menunggu antrian ({_antrian.qsize()} job di depan)",
+            socket.gethostname(), os.getpid()
+        ))
+    except Exception:
+        _hapus_file(path)
+        raise
+
+    _antrian.put((id_job, jenis, path, int(total_baris), int(total_potongan), list(lewati), default_top, registry))
+    return id_job
+
+# ================================================
+# PANEL STATUS (HALAMAN UPLOAD)
+# ================================================
+
+def _refresh_berkala(func):
+    # st.fragment (Streamlit >= 1.37) me-refresh panel saja tanpa rerun halaman
+    fragment = getattr(st, 'fragment', None)
+    return fragment(run_every=IMPORT_JOB_POLL)(func) if fragment else func
+
+def tampilkan_job_import(jenis):
+    """Panel status job import terbaru untuk halaman upload `jenis`"""
+
+    @_refresh_berkala
+    def panel():
+        df_job = get_daftar_job(jenis)
+        if df_job.empty:
+            st.caption("Belum ada job import.")
+            return
+
+        for job in df_job.head(3).to_dict('records'):
+            label = f"Job #{job['id']} — {job['nama_file']} ({job['status']})"
+            if job['status'] == STATUS_SELESAI:
+                st.success(f"✅ {label}: {job['pesan']}")
+            elif job['status'] == STATUS_GAGAL:
+                st.error(f"❌ {label}: {job['pesan']}")
+                df_error = get_error_job(job['id'])
+                if not df_error.empty:
+                    with st.expander(f"Lihat detail error job #{job['id']}"):
+                        st.dataframe(df_error, use_container_width=True, hide_index=True)
+            else:
+                total = max(int(job['total_baris']), 1)
+                st.progress(
+                    min(int(job['baris_diproses']) / total, 1.0),
+                    text=f"⏳ {label}: {job['pesan']} ({job['baris_diproses']:,}/{job['total_baris']:,} baris)"
+                )
+
+        with st.expander("Riwayat job import"):
+            st.dataframe(df_job, use_container_width=True, hide_index=True)
+
+        if not getattr(st, 'fragment', None):
+            st.button("🔄 Refresh status", key=f"refresh_job_{jenis}")
+
+    _pastikan_worker()
+    st.subheader("🕒 Status Import")
+    panel()
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 import new_database
+import excel_reader
 import io
 
 st.set_page_config(
@@ -155,7 +156,7 @@ with tab2:
             # Hapus baris yang kosong total
             df = df.dropna(how="all")
 
-            df = new_database.clean_excel_apostrophe(df)
+            df = excel_reader.clean_excel_apostrophe(df)
 
             st.success("✅ Data berhasil dibersihkan!")
 
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 import new_database
+import excel_reader
 import io
 
 st.set_page_config(
@@ -307,23 +308,15 @@ with tab2:
 
     if uploaded_file is not None:
         try:
-            df_raw = pd.read_excel(uploaded_file, header=None)
-
-            # Deteksi header
+            # Deteksi header & baca data (file di-parse 1x)
             EXPECTED_COLS = ["nama"]
-            header_row_index = None
-
-            for i, row in df_raw.iterrows():
-                row_str = row.astype(str).str.upper()
-                if all(any(col.upper() in cell for cell in row_str) for col in EXPECTED_COLS):
-                    header_row_index = i
-                    break
 
-            if header_row_index is None:
+            try:
+                df, header_row_index = excel_reader.baca_excel(uploaded_file, EXPECTED_COLS)
+            except excel_reader.HeaderTidakDitemukan:
                 st.error("❌ Header kolom 'Nama' tidak ditemukan")
                 st.stop()
 
-            df = pd.read_excel(uploaded_file, header=header_row_index)
             df.columns = [str(col).strip().replace("'", "") for col in df.columns]
 
             target_cols = {
@@ -350,7 +343,7 @@ with tab2:
 
             df = df[available_cols].rename(columns=rename_map)
             df = df.dropna(how="all")
-            df = new_database.clean_excel_apostrophe(df)
+            df = excel_reader.clean_excel_apostrophe(df)
 
             # Normalize nama customer
             df["Nama"] = df["Nama"].apply(new_database.normalize_customer_name)
@@ -373,64 +366,8 @@ with tab2:
                 with st.spinner("Mengupload data ke database..."):
                     if has_pricelist:
                         # Mode: Customer + Pricelist
-                        for idx, row in df.iterrows():
-                            try:
-                                nama = row.get("Nama")
-                                barang = row.get("Barang")
-                                harga = row.get("Harga")
-                                
-                                if pd.isna(nama) or pd.isna(barang) or pd.isna(harga):
-                                    error_count += 1
-                                    errors.append(f"Baris {idx+1}: Data tidak lengkap")
-                                    continue
-
-                                # Ambil nilai TOP
-                                top_val = row.get("TOP", 0) if "TOP" in df.columns else 0
-                                
-                                # Insert/get customer
-                                if not new_database.check_customer_available(nama):
-                                    new_database.insert_customer(nama, top_val)
-                                else:
-                                    # Jika Customer sudah ada & nilai TOP diisi di Excel, update TOP-nya
-                                    if "TOP" in df.columns and pd.notna(row.get("TOP")):
-                                        id_cust = new_database.get_customer_id(nama)
-                                        new_database.update_customer(id_cust, nama, top_val)
-                                
-                                id_customer = new_database.get_customer_id(nama)
-                                id_barang = new_database.get_barang_id(barang)
-                                
-                                if id_barang is None:
-                                    error_count += 1
-                                    errors.append(f"Baris {idx+1}: Barang '{barang}' tidak ditemukan")
-                                    continue
-
-                                # Cek apakah data sama persis (Barang & Harga sudah ada)
-                                current_price = new_database.get_harga_customer(nama, barang)
-                                if current_price is not None and float(current_price) == float(harga):
-                                    error_count += 1
-                                    errors.append(f"Baris {idx+1}: Data sudah ada di database (Harga sama: {int(harga)})")
-                                    continue
-
-                                # Ambil nilai Update Terakhir (jika ada di file Excel)
-                                updated_at_val = None
-                                if "Update Terakhir" in df.columns:
-                                    raw_date = row.get("Update Terakhir")
-                                    if pd.notna(raw_date):
-                                        try:
-                                            # Format ke YYYY-MM-DD untuk disimpan di database
-                                            updated_at_val = pd.to_datetime(raw_date).strftime('%Y-%m-%d')
-                                        except:
-                                            updated_at_val = None
-                                
-                                if new_database.upsert_customer_pricelist(id_customer, id_barang, int(harga), updated_at=updated_at_val):
-                                    success_count += 1
-                                else:
-                                    error_count += 1
-                                    errors.append(f"Baris {idx+1}: Gagal menyimpan pricelist")
-                                    
-                            except Exception as e:
-                                error_count += 1
-                                errors.append(f"Baris {idx+1}: {str(e)}")
+                        # Partner baru, TOP & harga yang berubah ditulis sekaligus (1 transaksi)
+                        success_count, error_count, errors = new_database.bulk_upsert_pricelist(df, 'customer')
                     else:
                         # Mode: Customer saja
                         for idx, row in df.iterrows():
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 import new_database
+import import_job
 import io
 from fpdf import FPDF
 
@@ -205,6 +206,8 @@ with tab2:
         - Nama Barang dan Customer harus sudah ada di database
         """)
     
+    import_job.tampilkan_job_import('penjualan')
+
     uploaded_file = st.file_uploader(
         "Pilih file Excel",
         type=["xlsx"],
@@ -213,104 +216,77 @@ with tab2:
     
     if uploaded_file is not None:
         try:
-            df_raw = pd.read_excel(uploaded_file, header=None)
-
-            EXPECTED_COLS = ["Tgl Faktur", "No. Faktur", "Nama Pelanggan", "Keterangan Barang", "Kuantitas", "Jumlah"]
-
-            header_row_index = None
-
-            for i, row in df_raw.iterrows():
-                row_str = row.astype(str).str.upper()
-                if all(any(col.upper() in cell for cell in row_str) for col in EXPECTED_COLS):
-                    header_row_index = i
-                    break
-
-            df = pd.read_excel(uploaded_file, header=header_row_index)
-
-            # Identifikasi kolom yang akan dipakai
-            actual_cols = [col for col in EXPECTED_COLS if col in df.columns]
-
-            # Cek jika excel memiliki kolom opsional
-            if "Satuan" in df.columns:
-                actual_cols.append("Satuan")
-            if "Harga Satuan" in df.columns:
-                actual_cols.append("Harga Satuan")
-            if "TOP" in df.columns:
-                actual_cols.append("TOP")
+            paksa_import = st.checkbox(
+                "Import ulang walaupun file / potongan sudah pernah diimport",
+                key="paksa_import_penjualan"
+            )
 
-            df = df.dropna(how="all")
-            df = df[EXPECTED_COLS]
-            df = new_database.clean_excel_apostrophe(df)
+            # File dibaca & divalidasi 1x per upload (streaming, hanya hash,
+            # error & preview yang disimpan), tidak diulang di setiap rerun
+            kunci_validasi = (uploaded_file.file_id, paksa_import)
+            if st.session_state.get("validasi_penjualan", {}).get("kunci") != kunci_validasi:
+                st.session_state.validasi_penjualan = {
+                    "kunci": kunci_validasi,
+                    **import_job.validasi_upload('penjualan', uploaded_file, paksa_import)
+                }
+            hasil = st.session_state.validasi_penjualan
+
+            # File yang sama persis sudah pernah diimport
+            terdaftar = hasil['terdaftar']
+            if terdaftar:
+                st.warning(f"⚠️ File ini sudah pernah diimport ({terdaftar['jumlah_baris']} baris, "
+                           f"'{terdaftar['nama_file']}', {terdaftar['updated_at']}). "
+                           "Centang import ulang untuk tetap mengimport.")
+                st.stop()
 
-            mismatch_errors = []
+            if hasil['baris_dilewati']:
+                st.info(f"ℹ️ {hasil['baris_dilewati']} baris dilewati karena potongannya sudah pernah diimport.")
+            if not hasil['total_potongan']:
+                st.warning("⚠️ Semua baris di file ini sudah pernah diimport. Centang import ulang untuk tetap mengimport.")
+                st.stop()
 
-            # 1. PENGECEKAN SATUAN BARANG
-            if "Satuan" in df.columns:
-                df_barang_db = new_database.get_all_data_barang(["nama", "satuan"])
-                dict_satuan_db = dict(zip(df_barang_db['nama'].str.upper(), df_barang_db['satuan'].astype(str).str.lower()))
-                
-                for idx, row in df.iterrows():
-                    excel_nama = str(row.get('Keterangan Barang')).strip().upper()
-                    excel_satuan = str(row.get('Satuan')).strip().lower()
-                    
-                    if not pd.isna(row.get('Satuan')) and excel_nama in dict_satuan_db:
-                        db_satuan = dict_satuan_db[excel_nama]
-                        if excel_satuan != db_satuan:
-                            mismatch_errors.append(f"Baris {idx + header_row_index + 2}: Barang '{row['Keterangan Barang']}' (Satuan Excel: {row['Satuan']} | Satuan DB: {db_satuan})")
-            
-            # 2. PENGECEKAN HARGA SATUAN
-            if "Harga Satuan" in df.columns:
-                for idx, row in df.iterrows():
-                    customer = str(row.get('Nama Pelanggan')).strip()
-                    barang = str(row.get('Keterangan Barang')).strip()
-                    excel_price = row.get('Harga Satuan')
-                    
-                    if pd.notna(excel_price):
-                        db_price = new_database.get_harga_customer(customer, barang)
-                        if db_price is None:
-                            db_price = 0
-                        
-                        # Toleransi perbedaan koma / desimal kecil (jika selisih >= 1 Rupiah, anggap beda)
-                        if abs(float(excel_price) - float(db_price)) >= 1:
-                            mismatch_errors.append(f"Baris {idx + header_row_index + 2}: Harga Satuan '{barang}' untuk '{customer}' tidak sesuai! (Excel: Rp {float(excel_price):,.0f} | DB: Rp {float(db_price):,.0f})")
-            else:
-                # 3. JIKA TIDAK ADA KOLOM HARGA SATUAN, HITUNG OTOMATIS
-                # Mencegah error pembagian dengan 0 (ZeroDivisionError)
-                df["Harga Satuan"] = df.apply(
-                    lambda row: float(row["Jumlah"]) / float(row["Kuantitas"]) if float(row["Kuantitas"]) > 0 else 0, 
-                    axis=1
-                )
-            
             # Jika ada error dari satuan ATAU harga satuan, blokir proses
-            if mismatch_errors:
+            if hasil['mismatch_errors']:
                 st.error("❌ Terdapat ketidaksesuaian data (Satuan / Harga) dengan yang ada di database. Upload dibatalkan.")
                 with st.expander("Lihat detail error"):
-                    for err in mismatch_errors:
+                    for err in hasil['mismatch_errors']:
                         st.error(err)
                 st.stop()
 
+            if hasil['errors']:
+                st.error(f"❌ {len(hasil['errors'])} error di file. Perbaiki semua baris berikut lalu upload ulang.")
+                with st.expander("Lihat detail error", expanded=True):
+                    st.dataframe(pd.DataFrame({"Error": hasil['errors']}), use_container_width=True, hide_index=True)
+                st.stop()
+
+            if hasil['peringatan']:
+                with st.expander(f"⚠️ {len(hasil['peringatan'])} baris kembar (tetap diupload, kuantitas digabung)"):
+                    st.dataframe(pd.DataFrame({"Peringatan": hasil['peringatan']}), use_container_width=True, hide_index=True)
+
             st.success("✅ Data berhasil dibersihkan!")
-                    
+
             st.subheader("📋 Preview Data")
-            st.dataframe(df.head(10), use_container_width=True)
-            st.info(f"Total baris: {len(df)}")
+            st.dataframe(hasil['preview'], use_container_width=True)
+            st.info(f"Total baris: {hasil['total_baris']}")
 
             if st.button("💾 Simpan", type="primary", use_container_width=True):
-                with st.spinner("Mengupload data ke database..."):
-                    success_count, error_count, errors = new_database.insert_penjualan(df, default_top=None)
-                            
-                if success_count > 0:
-                    st.success(f"✅ Berhasil mengupload {success_count} baris data!")
-                            
-                if error_count > 0:
-                    st.warning(f"⚠️ {error_count} baris gagal diupload")
-                                
-                    with st.expander("Lihat detail error"):
-                        for error in errors[:20]:
-                            st.error(error)
-                                    
-                        if len(errors) > 20:
-                            st.info(f"... dan {len(errors) - 20} error lainnya")
+                # Import dijalankan worker di background dari salinan file,
+                # progres dipantau di panel status
+                registry = {
+                    'jenis': 'penjualan',
+                    'hash_file': hasil['hash_file'],
+                    'hash_isi': hasil['hash_isi'],
+                    'nama_file': uploaded_file.name,
+                    'potongan': hasil['potongan'],
+                    'paksa': paksa_import
+                }
+                id_job = import_job.kirim_job(
+                    'penjualan', uploaded_file.name, uploaded_file,
+                    hasil['total_baris'], hasil['total_potongan'],
+                    lewati=hasil['lewati'], default_top=None, registry=registry
+                )
+                del st.session_state.validasi_penjualan
+                st.success(f"✅ File masuk antrian import (job #{id_job}). Halaman tetap bisa dipakai selama import berjalan.")
         except Exception as e:
             st.error(f"❌ Error membaca file: {str(e)}")
 
@@ -373,23 +349,18 @@ with tab3:
     )
 
     if not df_penjualan.empty:
-        total_semua_penjualan = df_penjualan['subtotal'].sum()
+        # Uang dari get_data_penjualan dalam sen (int64)
+        total_semua_penjualan = new_database.dari_sen(df_penjualan['subtotal'].sum())
 
         df_penjualan['tanggal'] = pd.to_datetime(df_penjualan['tanggal']).dt.strftime('%d %b %Y')
 
         if 'harga_satuan' in df_penjualan.columns:
-            df_penjualan['harga_satuan'] = df_penjualan['harga_satuan'].apply(
-                lambda x: f"Rp {x:,.0f}".replace(",", ".") if pd.notna(x) else "Rp 0"
-            )
+            df_penjualan['harga_satuan'] = df_penjualan['harga_satuan'].apply(new_database.format_currency_sen)
 
-        df_penjualan['subtotal'] = df_penjualan['subtotal'].apply(
-            lambda x: f"Rp {x:,.0f}".replace(",", ".")
-        )
+        df_penjualan['subtotal'] = df_penjualan['subtotal'].apply(new_database.format_currency_sen)
 
         if 'total_nota' in df_penjualan.columns:
-            df_penjualan['total_nota'] = df_penjualan['total_nota'].apply(
-                lambda x: f"Rp {x:,.0f}".replace(",", ".")
-            )
+            df_penjualan['total_nota'] = df_penjualan['total_nota'].apply(new_database.format_currency_sen)
 
         # Hitung total transaksi yang tertampil
         total_transaksi = len(df_penjualan)
@@ -500,7 +471,7 @@ with tab4:
             selected_nota = df_cetak.iloc[0]['no_nota'] # Ambil no_nota bersih untuk nama file & text rendering
             tgl_nota = pd.to_datetime(df_cetak.iloc[0]['tanggal']).strftime('%d %b %Y')
             cust_nota = df_cetak.iloc[0]['nama_customer']
-            total_nota = df_cetak.iloc[0]['total_nota']
+            total_nota = new_database.dari_sen(df_cetak.iloc[0]['total_nota'])
 
             # ── HEADER NOTA (pakai komponen native Streamlit, bukan HTML mentah) ──
             with st.container(border=True):
@@ -520,6 +491,8 @@ with tab4:
 
                 # Persiapkan tabel untuk preview dan export
                 df_table = df_cetak[['kuantitas', 'satuan', 'nama_barang', 'harga_satuan', 'subtotal']].copy()
+                df_table['harga_satuan'] = new_database.dari_sen(df_table['harga_satuan'])
+                df_table['subtotal'] = new_database.dari_sen(df_table['subtotal'])
                 df_table['Kuantitas'] = df_table['kuantitas'].astype(str) + " " + df_table['satuan'].fillna("").astype(str)
 
                 # Format harga untuk preview
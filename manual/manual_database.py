@@ -1,15 +1,19 @@
-import mysql.connector
+import os
+import sys
 import pandas as pd
 from datetime import datetime, timedelta
 import streamlit as st
 
+# db_pool ada di root project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool
+
+DB_NAME = os.environ.get('DB_NAME_PREDIKSI', 'fix_manajemen_stok')
+
 def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="fix_manajemen_stok"
-    )
+    """Koneksi dari pool bersama (db_pool); conn.close() mengembalikan ke pool"""
+    return db_pool.get_connection(DB_NAME)
 
 def run_query(query):
     conn = get_connection()
@@ -0,0 +1,68 @@
+-- Tabel turunan untuk ledger HPP FIFO, checkpoint bulanan, cube gross profit
+-- & stok harian. Setelah migrasi ini jalankan:
+--   python tools/rebuild_hpp_allocation.py
+--   python tools/rebuild_stok_harian.py
+
+ALTER TABLE `pembelian_detail`
+  ADD COLUMN `qty_sisa` bigint NOT NULL DEFAULT '0';
+
+CREATE TABLE IF NOT EXISTS `hpp_allocation` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `id_penjualan_detail` bigint unsigned NOT NULL,
+  `id_pembelian_detail` bigint unsigned DEFAULT NULL,
+  `id_barang` bigint unsigned NOT NULL,
+  `tanggal` date NOT NULL,
+  `qty` bigint NOT NULL,
+  `unit_cost` decimal(20,6) NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `id_penjualan_detail` (`id_penjualan_detail`),
+  KEY `id_pembelian_detail` (`id_pembelian_detail`),
+  KEY `idx_barang_tanggal` (`id_barang`,`tanggal`),
+  KEY `idx_tanggal_barang` (`tanggal`,`id_barang`),
+  CONSTRAINT `FK_hpp_allocation_id_penjualan_detail` FOREIGN KEY (`id_penjualan_detail`) REFERENCES `penjualan_detail` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `FK_hpp_allocation_id_pembelian_detail` FOREIGN KEY (`id_pembelian_detail`) REFERENCES `pembelian_detail` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE IF NOT EXISTS `fifo_checkpoint` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `bulan` date NOT NULL,
+  `id_barang` bigint unsigned NOT NULL,
+  `urutan` int NOT NULL,
+  `id_pembelian_detail` bigint unsigned DEFAULT NULL,
+  `no_nota` varchar(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `qty_sisa` bigint NOT NULL,
+  `unit_cost` decimal(20,6) NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_bulan_barang_urutan` (`bulan`,`id_barang`,`urutan`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE IF NOT EXISTS `fifo_checkpoint_status` (
+  `bulan` date NOT NULL,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`bulan`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE IF NOT EXISTS `gp_cube` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `id_barang` bigint unsigned NOT NULL,
+  `id_customer` bigint unsigned DEFAULT NULL,
+  `bulan` date NOT NULL,
+  `total_penjualan` decimal(20,2) NOT NULL,
+  `total_hpp` decimal(20,6) NOT NULL,
+  `qty` bigint NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_barang_bulan` (`id_barang`,`bulan`),
+  KEY `idx_customer_bulan` (`id_customer`,`bulan`),
+  KEY `idx_bulan` (`bulan`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE IF NOT EXISTS `stok_harian` (
+  `id_barang` bigint unsigned NOT NULL,
+  `tanggal` date NOT NULL,
+  `masuk` bigint NOT NULL DEFAULT '0',
+  `keluar` bigint NOT NULL DEFAULT '0',
+  `total_masuk` bigint NOT NULL DEFAULT '0',
+  `total_keluar` bigint NOT NULL DEFAULT '0',
+  `saldo` bigint NOT NULL DEFAULT '0',
+  PRIMARY KEY (`id_barang`,`tanggal`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -0,0 +1,21 @@
+-- Index untuk filter yang dipakai hampir semua query transaksi:
+-- rentang tanggal, tipe pembelian, cek nota existing, invoice jatuh tempo
+-- & lookup nama master data saat upload.
+-- 1 index per statement agar index yang sudah ada dilewati satu per satu.
+
+ALTER TABLE `penjualan` ADD INDEX `idx_tanggal` (`tanggal`);
+ALTER TABLE `penjualan` ADD INDEX `idx_nota_tanggal_customer` (`no_nota`, `tanggal`, `id_customer`);
+
+ALTER TABLE `pembelian` ADD INDEX `idx_tanggal` (`tanggal`);
+ALTER TABLE `pembelian` ADD INDEX `idx_tipe_tanggal` (`tipe`, `tanggal`);
+ALTER TABLE `pembelian` ADD INDEX `idx_nota_tanggal_supplier` (`no_nota`, `tanggal`, `id_supplier`);
+
+ALTER TABLE `piutang` ADD INDEX `idx_due_date` (`due_date`);
+ALTER TABLE `piutang` ADD INDEX `idx_sisa_due_date` (`sisa`, `due_date`);
+
+ALTER TABLE `hutang` ADD INDEX `idx_due_date` (`due_date`);
+ALTER TABLE `hutang` ADD INDEX `idx_sisa_due_date` (`sisa`, `due_date`);
+
+ALTER TABLE `barang` ADD INDEX `idx_nama` (`nama`);
+ALTER TABLE `customer` ADD INDEX `idx_nama` (`nama`);
+ALTER TABLE `supplier` ADD INDEX `idx_nama` (`nama`);
@@ -0,0 +1,21 @@
+-- Unique key pada natural key supaya tulis data cukup 1 statement
+-- INSERT ... ON DUPLICATE KEY UPDATE (tanpa SELECT dulu) dan upload/edit
+-- paralel tidak bisa membuat baris kembar.
+-- Index lama (no_nota, tanggal, partner) digantikan unique key-nya.
+--
+-- Migrasi gagal (errno 1062) jika data lama sudah ada yang kembar. Cek dulu:
+--   SELECT no_nota, tanggal, id_customer, COUNT(*) FROM penjualan
+--   GROUP BY no_nota, tanggal, id_customer HAVING COUNT(*) > 1;
+--   SELECT id_customer, id_barang, COUNT(*) FROM customer_pricelist
+--   GROUP BY id_customer, id_barang HAVING COUNT(*) > 1;
+-- (sama untuk pembelian/id_supplier & supplier_pricelist), gabungkan
+-- barisnya lalu jalankan ulang python tools/migrate.py
+
+ALTER TABLE `penjualan` ADD UNIQUE KEY `uq_nota_tanggal_customer` (`no_nota`, `tanggal`, `id_customer`);
+ALTER TABLE `penjualan` DROP INDEX `idx_nota_tanggal_customer`;
+
+ALTER TABLE `pembelian` ADD UNIQUE KEY `uq_nota_tanggal_supplier` (`no_nota`, `tanggal`, `id_supplier`);
+ALTER TABLE `pembelian` DROP INDEX `idx_nota_tanggal_supplier`;
+
+ALTER TABLE `customer_pricelist` ADD UNIQUE KEY `uq_customer_barang` (`id_customer`, `id_barang`);
+ALTER TABLE `supplier_pricelist` ADD UNIQUE KEY `uq_supplier_barang` (`id_supplier`, `id_barang`);
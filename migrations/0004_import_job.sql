@@ -0,0 +1,33 @@
+-- Antrian job import Excel (import_job.py): status & progres per job,
+-- error per potongan di import_job_error. Dipoll halaman upload sehingga
+-- import besar berjalan di worker tanpa memblokir sesi Streamlit.
+
+CREATE TABLE IF NOT EXISTS `import_job` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `jenis` varchar(20) NOT NULL,
+  `nama_file` varchar(255) DEFAULT NULL,
+  `status` varchar(20) NOT NULL DEFAULT 'ANTRI',
+  `total_baris` int NOT NULL DEFAULT '0',
+  `total_potongan` int NOT NULL DEFAULT '0',
+  `baris_diproses` int NOT NULL DEFAULT '0',
+  `potongan_diproses` int NOT NULL DEFAULT '0',
+  `sukses` int NOT NULL DEFAULT '0',
+  `gagal` int NOT NULL DEFAULT '0',
+  `pesan` varchar(500) DEFAULT NULL,
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `started_at` datetime DEFAULT NULL,
+  `finished_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_jenis_created` (`jenis`,`created_at`),
+  KEY `idx_status` (`status`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE IF NOT EXISTS `import_job_error` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `id_job` bigint unsigned NOT NULL,
+  `potongan` int DEFAULT NULL,
+  `pesan` text NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_job_potongan` (`id_job`,`potongan`),
+  CONSTRAINT `FK_import_job_error_id_job` FOREIGN KEY (`id_job`) REFERENCES `import_job` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -0,0 +1,14 @@
+-- 1 piutang per penjualan & 1 hutang per pembelian dijaga unique key,
+-- sehingga tagihan hasil import cukup ditulis dengan 1 statement
+-- INSERT ... ON DUPLICATE KEY UPDATE (tanpa SELECT cek tagihan dulu).
+--
+-- Migrasi gagal (errno 1062) jika data lama sudah ada yang kembar. Cek dulu:
+--   SELECT id_penjualan, COUNT(*) FROM piutang
+--   GROUP BY id_penjualan HAVING COUNT(*) > 1;
+--   SELECT id_pembelian, COUNT(*) FROM hutang
+--   GROUP BY id_pembelian HAVING COUNT(*) > 1;
+-- gabungkan barisnya (beserta pembayarannya) lalu jalankan ulang
+-- python tools/migrate.py
+
+ALTER TABLE `piutang` ADD UNIQUE KEY `uq_id_penjualan` (`id_penjualan`);
+ALTER TABLE `hutang` ADD UNIQUE KEY `uq_id_pembelian` (`id_pembelian`);
@@ -0,0 +1,29 @@
+-- Registry file & potongan Excel yang sudah diimport (hash sha256 isi),
+-- supaya upload ulang file / potongan yang sama dilewati sebelum dibaca
+-- & ditulis ulang (detail lama tidak ditambah kuantitasnya lagi).
+-- Ditulis di transaksi import yang sama dengan data transaksinya.
+
+CREATE TABLE IF NOT EXISTS `import_registry` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `jenis` varchar(20) NOT NULL,
+  `hash_file` char(64) NOT NULL,
+  `nama_file` varchar(255) DEFAULT NULL,
+  `jumlah_baris` int NOT NULL DEFAULT '0',
+  `jumlah_import` int NOT NULL DEFAULT '1',
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_jenis_hash_file` (`jenis`,`hash_file`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE IF NOT EXISTS `import_registry_potongan` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `id_registry` bigint unsigned NOT NULL,
+  `jenis` varchar(20) NOT NULL,
+  `hash_potongan` char(64) NOT NULL,
+  `jumlah_baris` int NOT NULL DEFAULT '0',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_jenis_hash_potongan` (`jenis`,`hash_potongan`),
+  KEY `id_registry` (`id_registry`),
+  CONSTRAINT `FK_import_registry_potongan_id_registry` FOREIGN KEY (`id_registry`) REFERENCES `import_registry` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -0,0 +1,12 @@
+-- Sentinel lock checkpoint FIFO: build_fifo_checkpoint dan semua
+-- invalidasi (_invalidasi_fifo_checkpoint, dipanggil import / hapus
+-- penjualan & pembelian / backfill) mengunci baris ini dengan
+-- SELECT ... FOR UPDATE sampai commit, sehingga checkpoint tidak dibangun
+-- dari snapshot yang mendahului transaksi bertanggal mundur.
+
+CREATE TABLE IF NOT EXISTS `fifo_checkpoint_lock` (
+  `id` tinyint unsigned NOT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+INSERT IGNORE INTO `fifo_checkpoint_lock` (`id`) VALUES (1);
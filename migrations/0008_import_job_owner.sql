@@ -0,0 +1,7 @@
+-- Pemilik job import (host & pid proses Streamlit yang mengantrikannya).
+-- Saat worker dijalankan, hanya job ANTRI / JALAN yang proses pemiliknya
+-- sudah tidak ada yang ditandai GAGAL; job milik proses lain yang masih
+-- hidup tidak disentuh.
+
+ALTER TABLE `import_job` ADD COLUMN `host` varchar(255) DEFAULT NULL AFTER `pesan`;
+ALTER TABLE `import_job` ADD COLUMN `pid` int DEFAULT NULL AFTER `host`;
@@ -0,0 +1,19 @@
+-- Kunci ledger per barang: import / hapus penjualan & pembelian dan
+-- rebuild meng-upsert baris barangnya (urut id_barang) sebelum membaca
+-- hpp_allocation / qty_sisa / gp_cube / stok_harian, sampai commit.
+-- Tabel terpisah dari barang karena FK detail transaksi sudah memasang
+-- shared lock di baris barang (upgrade ke FOR UPDATE bisa deadlock).
+--
+-- qty_sisa tidak boleh negatif (alokasi ganda dari 2 import bersamaan).
+-- Jika ALTER gagal karena data lama sudah negatif, jalankan
+-- tools/rebuild_hpp_allocation.py lalu ulangi migrasi.
+
+CREATE TABLE IF NOT EXISTS `ledger_barang_lock` (
+  `id_barang` bigint unsigned NOT NULL,
+  PRIMARY KEY (`id_barang`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+INSERT IGNORE INTO `ledger_barang_lock` (`id_barang`) SELECT `id` FROM `barang`;
+
+ALTER TABLE `pembelian_detail`
+  ADD CONSTRAINT `chk_pembelian_detail_qty_sisa` CHECK (`qty_sisa` >= 0);
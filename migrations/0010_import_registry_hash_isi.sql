@@ -0,0 +1,8 @@
+-- Kunci kedua registry import: hash_file = sha256 byte file (cek O(1)
+-- sebelum file di-parse), hash_isi = sha256 baris bersih sesuai urutan
+-- (excel_reader.HashIsiFile) untuk file sama yang di-export / disimpan
+-- ulang sehingga byte-nya berbeda. Tidak unique: import ulang yang
+-- dipaksa boleh mencatat isi yang sama dari file berbeda.
+
+ALTER TABLE `import_registry` ADD COLUMN `hash_isi` char(64) DEFAULT NULL AFTER `hash_file`;
+ALTER TABLE `import_registry` ADD KEY `idx_jenis_hash_isi` (`jenis`,`hash_isi`);
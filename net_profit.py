@@ -24,12 +24,8 @@ st.markdown("---")
 
 with st.spinner("Menghitung Net Profit..."):
     # ==================== 1. AMBIL DATA ====================
-    # Ambil data pembelian & penjualan untuk perhitungan Gross Profit
-    pembelian_df = new_database.get_pembelian_data(start_date, end_date)
-    penjualan_df = new_database.get_penjualan_data(start_date, end_date)
-    
-    # Hitung Gross Profit (menggunakan fungsi FIFO yang sudah ada)
-    gp_df = new_database.calculate_gross_profit_fifo(pembelian_df, penjualan_df)
+    # Ambil Gross Profit FIFO (periode: dari checkpoint bulanan, tanpa periode: ledger HPP)
+    gp_df = new_database.get_gross_profit_metode('FIFO', start_date, end_date)
     
     total_penjualan = gp_df['total_penjualan'].sum() if not gp_df.empty else 0
     total_hpp = gp_df['total_hpp'].sum() if not gp_df.empty else 0
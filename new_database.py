@@ -1,49 +1,58 @@
+import os
+import threading
+import time
 import mysql.connector
+import numpy as np
 import pandas as pd
+from collections import deque
+from itertools import islice
 from datetime import datetime, timedelta
 import streamlit as st
 
+import db_pool
+from excel_reader import parse_tanggal_kolom
+
+DB_NAME = os.environ.get('DB_NAME', 'trading_db')
+
 def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="trading_db"
-    )
+    """Koneksi dari pool bersama (db_pool); conn.close() mengembalikan ke pool"""
+    return db_pool.get_connection(DB_NAME)
 
-def clean_excel_apostrophe(df):   
-    def clean_value(value):
-        # Handle NaN/None
-        if pd.isna(value):
-            return None
-        
-        # Convert ke string dan strip
-        str_value = str(value).strip()
-        
-        # Remove leading apostrophe
-        if str_value.startswith("'"):
-            str_value = str_value[1:]
-        
-        return str_value if str_value else None
+def format_currency(amount):
+    if amount is None: return "Rp 0"
+    return f"Rp {amount:,.0f}".replace(",", ".")
 
-    # Copy df agar tidak ubah yang asli
-    df = df.copy()
+# Uang dalam sen (int64): loader transaksi (get_pembelian_data,
+# get_penjualan_data, get_data_penjualan) mengembalikan kolom uang
+# (harga_satuan, subtotal, total_nota) sebagai int64 sen, dibulatkan di SQL.
+# Tidak ada objek Decimal di DataFrame dan penjumlahan selalu eksak.
+# Konversi ke rupiah hanya saat ditampilkan.
+
+def ke_sen(nilai):
+    """Rupiah (angka / Decimal / Series / array) → sen int64"""
+    if isinstance(nilai, pd.Series):
+        return pd.Series(
+            np.rint(nilai.astype(float).to_numpy() * 100).astype(np.int64),
+            index=nilai.index, name=nilai.name
+        )
+    if np.ndim(nilai):
+        return np.rint(np.asarray(nilai, dtype=float) * 100).astype(np.int64)
+    return int(round(float(nilai) * 100))
 
-    # --- Bersihkan Nama Kolom ---
-    df.columns = [
-        col[1:] if isinstance(col, str) and col.startswith("'") else col
-        for col in df.columns
-    ]
+def dari_sen(sen):
+    """Sen (angka / Series / array) → rupiah float"""
+    if isinstance(sen, pd.Series):
+        return sen.astype(float) / 100
+    if np.ndim(sen):
+        return np.asarray(sen, dtype=float) / 100
+    return float(sen) / 100
 
-    # --- Bersihkan Isi Cell ---
-    for col in df.columns:
-        df[col] = df[col].apply(clean_value)
+def format_currency_sen(sen):
+    """format_currency untuk nilai dalam sen"""
+    if sen is None or pd.isna(sen): return "Rp 0"
+    return format_currency(dari_sen(sen))
 
-    return df
 
-def format_currency(amount):
-    if amount is None: return "Rp 0"
-    return f"Rp {amount:,.0f}".replace(",", ".")
 
 
 
@@ -51,6 +60,105 @@ def format_currency(amount):
 
 
 
+# ================================================
+# CACHE MASTER DATA (barang, customer, supplier)
+# ================================================
+# Snapshot nama -> id/satuan/top & harga pricelist customer, dimuat sekali
+# (1 query per tabel) lalu dipakai untuk lookup O(1) saat import.
+# Setiap insert/update/delete master data & pricelist customer menaikkan
+# versi cache sehingga snapshot dimuat ulang di lookup berikutnya.
+# MASTER_CACHE_TTL (detik) menjaga data tetap segar jika database diubah
+# dari luar aplikasi.
+
+MASTER_CACHE_TTL = int(os.environ.get('MASTER_CACHE_TTL', 300))
+
+_master_cache = {'versi': 0, 'data': None, 'dimuat': 0.0}
+_master_cache_stats = {'hit': 0, 'miss': 0}
+_master_cache_lock = threading.Lock()
+
+def _kunci_nama(nama):
+    """Kunci lookup nama, mengikuti collation MySQL (case-insensitive, spasi akhir diabaikan)"""
+    if nama is None or pd.isna(nama):
+        return None
+    return str(nama).rstrip().casefold()
+
+def _muat_master_data():
+    """Ambil semua master data yang di-cache (1 koneksi, 1 query per tabel)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        data = {'barang': {}, 'customer': {}, 'supplier': {}, 'harga_customer': {}}
+
+        # Nama kembar (beda huruf besar/kecil): ambil id terkecil, seperti query lama
+        cursor.execute("SELECT id, nama, satuan FROM barang ORDER BY id")
+        for id_barang, nama, satuan in cursor.fetchall():
+            data['barang'].setdefault(_kunci_nama(nama), (id_barang, satuan))
+
+        for tabel in ['customer', 'supplier']:
+            cursor.execute(f"SELECT id, nama, top FROM {tabel} ORDER BY id")
+            for id_partner, nama, top in cursor.fetchall():
+                data[tabel].setdefault(_kunci_nama(nama), (id_partner, top))
+
+        cursor.execute("""
+            SELECT c.nama, b.nama, cp.harga
+            FROM customer_pricelist cp
+            JOIN customer c ON cp.id_customer = c.id
+            JOIN barang b ON cp.id_barang = b.id
+            ORDER BY cp.id
+        """)
+        for nama_cust, nama_barang, harga in cursor.fetchall():
+            data['harga_customer'].setdefault((_kunci_nama(nama_cust), _kunci_nama(nama_barang)), harga)
+
+        return data
+
+    finally:
+        cursor.close()
+        conn.close()
+
+def _get_master_data():
+    """Snapshot master data; dimuat ulang jika versi berubah atau lewat TTL"""
+    with _master_cache_lock:
+        cache = _master_cache
+        if cache['data'] is not None and time.monotonic() - cache['dimuat'] < MASTER_CACHE_TTL:
+            _master_cache_stats['hit'] += 1
+            return cache['data']
+        _master_cache_stats['miss'] += 1
+        versi = cache['versi']
+
+    data = _muat_master_data()
+
+    with _master_cache_lock:
+        # Jangan simpan snapshot yang sudah basi karena invalidasi saat memuat
+        if _master_cache['versi'] == versi:
+            _master_cache['data'] = data
+            _master_cache['dimuat'] = time.monotonic()
+
+    return data
+
+def invalidasi_master_cache():
+    """Tandai cache master data basi (panggil setelah master data berubah)"""
+    with _master_cache_lock:
+        _master_cache['versi'] += 1
+        _master_cache['data'] = None
+
+def get_master_cache_stats():
+    """Versi cache & counter hit/miss lookup master data"""
+    with _master_cache_lock:
+        data = _master_cache['data']
+        return {
+            'versi': _master_cache['versi'],
+            'hit': _master_cache_stats['hit'],
+            'miss': _master_cache_stats['miss'],
+            'dimuat': data is not None,
+            'jumlah_barang': len(data['barang']) if data else 0,
+            'jumlah_customer': len(data['customer']) if data else 0,
+            'jumlah_supplier': len(data['supplier']) if data else 0
+        }
+
+
+
+
 
 
 # ================================================
@@ -72,30 +180,11 @@ def get_all_data_barang(columns="*"):
 
 # Cek apakah barang sudah ada di database
 def check_barang_available(nama_barang):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    query = "SELECT id FROM barang WHERE nama = %s"
-    cursor.execute(query, (nama_barang,))
-    result = cursor.fetchone()
-
-    cursor.close()
-    conn.close()
-
-    return result is not None
+    return get_barang_id(nama_barang) is not None
 
-# Ambil id barang berdasarkan nama
+# Ambil id barang berdasarkan nama (dari cache master data)
 def get_barang_id(nama_barang):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    query = "SELECT id FROM barang WHERE nama = %s"
-    cursor.execute(query, (nama_barang,))
-    result = cursor.fetchone()
-
-    cursor.close()
-    conn.close()
-
+    result = _get_master_data()['barang'].get(_kunci_nama(nama_barang))
     return result[0] if result else None
 
 # Input data barang ke database
@@ -124,6 +213,7 @@ def insert_barang(nama, satuan=None):
 
         cursor.execute(query, (nama, satuan))
         conn.commit()
+        invalidasi_master_cache()
         
         return True, f"Barang '{nama}' berhasil disimpan"
         
@@ -148,6 +238,7 @@ def update_barang(id_barang, nama, satuan):
     cursor.execute(query, (nama, satuan, int(id_barang)))
 
     conn.commit()
+    invalidasi_master_cache()
     cursor.close()
     conn.close()
 
@@ -162,6 +253,7 @@ def delete_barang(id_barang):
     )
 
     conn.commit()
+    invalidasi_master_cache()
     cursor.close()
     conn.close()
 
@@ -189,19 +281,13 @@ def check_related_data(id_barang):
     return related
 
 def get_satuan_barang(nama_barang):
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute("SELECT satuan FROM barang WHERE nama = %s", (nama_barang,))
-        result = cursor.fetchone()
-        if result and result[0]:
-            return result[0]
+        result = _get_master_data()['barang'].get(_kunci_nama(nama_barang))
+        if result and result[1]:
+            return result[1]
         return "-"
     except Exception as e:
         return "-"
-    finally:
-        cursor.close()
-        conn.close()
 
 
 
@@ -241,34 +327,12 @@ def get_all_data_customer(columns="*"):
 
 # Cek apakah customer sudah ada di database
 def check_customer_available(nama_cust):
-    conn = get_connection()
-    cursor = conn.cursor()
+    return get_customer_id(nama_cust) is not None
 
-    nama_cust = normalize_customer_name(nama_cust)
-
-    query = "SELECT id FROM customer WHERE nama = %s"
-    cursor.execute(query, (nama_cust,))
-    result = cursor.fetchone()
-
-    cursor.close()
-    conn.close()
-
-    return result is not None
-
-# Ambil id customer berdasarkan nama
+# Ambil id customer berdasarkan nama (dari cache master data)
 def get_customer_id(nama_cust):
-    conn = get_connection()
-    cursor = conn.cursor()
-
     nama_cust = normalize_customer_name(nama_cust)
-
-    query = "SELECT id FROM customer WHERE nama = %s"
-    cursor.execute(query, (nama_cust,))
-    result = cursor.fetchone()
-
-    cursor.close()
-    conn.close()
-
+    result = _get_master_data()['customer'].get(_kunci_nama(nama_cust))
     return result[0] if result else None
 
 # Input data customer ke database
@@ -297,6 +361,7 @@ def insert_customer(nama, top=0):
 
         cursor.execute(query, (nama, top))
         conn.commit()
+        invalidasi_master_cache()
         
         return True, f"Customer '{nama}' berhasil disimpan"
         
@@ -322,6 +387,7 @@ def update_customer(id_cust, nama, top):
     cursor.execute(query, (nama, top, int(id_cust)))
 
     conn.commit()
+    invalidasi_master_cache()
     cursor.close()
     conn.close()
 
@@ -338,21 +404,16 @@ def delete_customer(id_cust):
         cursor.execute("DELETE FROM customer WHERE id = %s", (int(id_cust),))
         
         conn.commit()
+        invalidasi_master_cache()
         
     finally:
         cursor.close()
         conn.close()
 
 def get_top_customer(nama_cust):
-    conn = get_connection()
-    cursor = conn.cursor()
     nama_cust = normalize_customer_name(nama_cust)
-    query = "SELECT top FROM customer WHERE nama = %s LIMIT 1"
-    cursor.execute(query, (nama_cust,))
-    result = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    return result[0] if result and result[0] is not None else 0
+    result = _get_master_data()['customer'].get(_kunci_nama(nama_cust))
+    return result[1] if result and result[1] is not None else 0
 
 
 
@@ -406,32 +467,16 @@ def upsert_customer_pricelist(id_customer, id_barang, harga, updated_at=None):
     cursor = conn.cursor()
     
     try:
-        # Check if exists
-        check_query = """
-            SELECT id FROM customer_pricelist 
-            WHERE id_customer = %s AND id_barang = %s
+        # 1 statement: unique key (id_customer, id_barang) menentukan insert / update
+        query = """
+            INSERT INTO customer_pricelist (id_customer, id_barang, harga, updated_at)
+            VALUES (%s, %s, %s, COALESCE(%s, NOW()))
+            ON DUPLICATE KEY UPDATE harga = VALUES(harga), updated_at = VALUES(updated_at)
         """
-        cursor.execute(check_query, (int(id_customer), int(id_barang)))
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Update existing
-            if updated_at:
-                update_query = "UPDATE customer_pricelist SET harga = %s, updated_at = %s WHERE id = %s"
-                cursor.execute(update_query, (int(harga), updated_at, existing[0]))
-            else:
-                update_query = "UPDATE customer_pricelist SET harga = %s, updated_at = NOW() WHERE id = %s"
-                cursor.execute(update_query, (int(harga), existing[0]))
-        else:
-            # Insert new
-            if updated_at:
-                insert_query = "INSERT INTO customer_pricelist (id_customer, id_barang, harga, updated_at) VALUES (%s, %s, %s, %s)"
-                cursor.execute(insert_query, (int(id_customer), int(id_barang), int(harga), updated_at))
-            else:
-                insert_query = "INSERT INTO customer_pricelist (id_customer, id_barang, harga, updated_at) VALUES (%s, %s, %s, NOW())"
-                cursor.execute(insert_query, (int(id_customer), int(id_barang), int(harga)))
+        cursor.execute(query, (int(id_customer), int(id_barang), int(harga), updated_at or None))
         
         conn.commit()
+        invalidasi_master_cache()
         return True
         
     except Exception as e:
@@ -455,6 +500,7 @@ def update_customer_pricelist(id_pricelist, harga):
     cursor.execute(query, (int(harga), int(id_pricelist)))
 
     conn.commit()
+    invalidasi_master_cache()
     cursor.close()
     conn.close()
 
@@ -493,29 +539,14 @@ def delete_customer_pricelist(id_pricelist):
     )
 
     conn.commit()
+    invalidasi_master_cache()
     cursor.close()
     conn.close()
 
 def get_harga_customer(nama_cust, jenis_barang):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    query = """
-        SELECT cp.harga
-        FROM customer c
-        JOIN customer_pricelist cp ON c.id = cp.id_customer
-        JOIN barang b ON cp.id_barang = b.id
-        WHERE c.nama = %s AND b.nama = %s
-        LIMIT 1
-    """
-
-    cursor.execute(query, (nama_cust, jenis_barang))
-    result = cursor.fetchone()
-    
-    cursor.close()
-    conn.close()
-    
-    return result[0] if result else None
+    return _get_master_data()['harga_customer'].get(
+        (_kunci_nama(nama_cust), _kunci_nama(jenis_barang))
+    )
 
 
 
@@ -552,34 +583,12 @@ def get_all_data_supplier(columns="*"):
 
 # Cek apakah supplier sudah ada di database
 def check_supplier_available(nama_supp):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    nama_supp = normalize_supplier_name(nama_supp)
+    return get_supplier_id(nama_supp) is not None
 
-    query = "SELECT id FROM supplier WHERE nama = %s"
-    cursor.execute(query, (nama_supp,))
-    result = cursor.fetchone()
-
-    cursor.close()
-    conn.close()
-
-    return result is not None
-
-# Ambil id supplier berdasarkan nama
+# Ambil id supplier berdasarkan nama (dari cache master data)
 def get_supplier_id(nama_supp):
-    conn = get_connection()
-    cursor = conn.cursor()
-
     nama_supp = normalize_supplier_name(nama_supp)
-
-    query = "SELECT id FROM supplier WHERE nama = %s"
-    cursor.execute(query, (nama_supp,))
-    result = cursor.fetchone()
-
-    cursor.close()
-    conn.close()
-
+    result = _get_master_data()['supplier'].get(_kunci_nama(nama_supp))
     return result[0] if result else None
 
 # Input data supplier ke database
@@ -608,6 +617,7 @@ def insert_supplier(nama, top=0):
 
         cursor.execute(query, (nama, top))
         conn.commit()
+        invalidasi_master_cache()
        
         return True, f"Supplier '{nama}' berhasil disimpan"
        
@@ -633,6 +643,7 @@ def update_supplier(id_supp, nama, top):
     cursor.execute(query, (nama, top, int(id_supp)))
 
     conn.commit()
+    invalidasi_master_cache()
     cursor.close()
     conn.close()
 
@@ -649,6 +660,7 @@ def delete_supplier(id_supp):
         cursor.execute("DELETE FROM supplier WHERE id = %s", (int(id_supp),))
        
         conn.commit()
+        invalidasi_master_cache()
        
     finally:
         cursor.close()
@@ -715,30 +727,13 @@ def upsert_supplier_pricelist(id_supplier, id_barang, harga, updated_at=None):
     cursor = conn.cursor()
    
     try:
-        # Check if exists
-        check_query = """
-            SELECT id FROM supplier_pricelist
-            WHERE id_supplier = %s AND id_barang = %s
+        # 1 statement: unique key (id_supplier, id_barang) menentukan insert / update
+        query = """
+            INSERT INTO supplier_pricelist (id_supplier, id_barang, harga, updated_at)
+            VALUES (%s, %s, %s, COALESCE(%s, NOW()))
+            ON DUPLICATE KEY UPDATE harga = VALUES(harga), updated_at = VALUES(updated_at)
         """
-        cursor.execute(check_query, (int(id_supplier), int(id_barang)))
-        existing = cursor.fetchone()
-       
-        if existing:
-            # Update existing
-            if updated_at:
-                update_query = "UPDATE supplier_pricelist SET harga = %s, updated_at = %s WHERE id = %s"
-                cursor.execute(update_query, (int(harga), updated_at, existing[0]))
-            else:
-                update_query = "UPDATE supplier_pricelist SET harga = %s, updated_at = NOW() WHERE id = %s"
-                cursor.execute(update_query, (int(harga), existing[0]))
-        else:
-            # Insert new
-            if updated_at:
-                insert_query = "INSERT INTO supplier_pricelist (id_supplier, id_barang, harga, updated_at) VALUES (%s, %s, %s, %s)"
-                cursor.execute(insert_query, (int(id_supplier), int(id_barang), int(harga), updated_at))
-            else:
-                insert_query = "INSERT INTO supplier_pricelist (id_supplier, id_barang, harga, updated_at) VALUES (%s, %s, %s, NOW())"
-                cursor.execute(insert_query, (int(id_supplier), int(id_barang), int(harga)))
+        cursor.execute(query, (int(id_supplier), int(id_barang), int(harga), updated_at or None))
        
         conn.commit()
         return True
@@ -836,83 +831,860 @@ def get_harga_supplier(nama_supp, jenis_barang):
 
 
 # ================================================
-# DATA PENJUALAN
+# IMPORT TRANSAKSI (BULK)
 # ================================================
+# Dipakai insert_penjualan & insert_pembelian: semua nama di-resolve sekali
+# lewat cache master data, baris dikelompokkan per nota & per barang di
+# pandas, lalu header, detail & piutang/hutang ditulis dengan executemany
+# (BULK_BATCH_SIZE baris per statement) di dalam 1 transaksi. Jumlah query tidak lagi sebanding dengan
+# jumlah baris Excel.
+
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', 1000))
+
+# partner -> (kolom Excel, label pesan error, fungsi normalisasi nama)
+KOLOM_PARTNER = {
+    'customer': ('Nama Pelanggan', 'Customer', normalize_customer_name),
+    'supplier': ('Nama Supplier', 'Supplier', normalize_supplier_name)
+}
+
+class ValidasiUploadGagal(Exception):
+    """Ada baris upload yang tidak valid; errors = semua pesan 'Baris N: ...'"""
+
+    def __init__(self, errors):
+        super().__init__(errors[0])
+        self.errors = errors
+
+def _potong(data, ukuran=None):
+    """Pecah list menjadi potongan BULK_BATCH_SIZE (untuk executemany / IN)"""
+    ukuran = ukuran or BULK_BATCH_SIZE
+    for i in range(0, len(data), ukuran):
+        yield data[i:i + ukuran]
+
+def _executemany_batch(cursor, query, rows):
+    for batch in _potong(rows):
+        cursor.executemany(query, batch)
+
+def _select_in(cursor, query, nilai, params_awal=()):
+    """
+    Jalankan query dengan placeholder {} untuk isi IN (...), dipotong per
+    BULK_BATCH_SIZE nilai. Return gabungan fetchall().
+    """
+    hasil = []
+    for batch in _potong(list(nilai)):
+        cursor.execute(
+            query.format(", ".join(["%s"] * len(batch))),
+            (*params_awal, *batch)
+        )
+        hasil.extend(cursor.fetchall())
+    return hasil
 
-# Cek apakah sudah ada penjualan dengan no_nota, tanggal, dan customer yang sama
-def get_existing_penjualan(no_nota, tanggal, id_customer):
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    query = """
-        SELECT id, total 
-        FROM penjualan 
-        WHERE no_nota = %s AND tanggal = %s AND id_customer = %s
-        LIMIT 1
+def _kolom_excel(df, nama):
+    """Kolom Excel, atau Series kosong jika kolomnya tidak ada (seperti row.get)"""
+    if nama in df.columns:
+        return df[nama]
+    return pd.Series(None, index=df.index, dtype=object)
+
+def _siapkan_baris_transaksi(df, default_top, partner):
     """
-    cursor.execute(query, (str(no_nota), tanggal, int(id_customer)))
-    result = cursor.fetchone()
-    
-    cursor.close()
-    conn.close()
-    
-    if result:
-        return {"id": result[0], "total": float(result[1])}
-    return None
+    Validasi & resolve semua baris upload transaksi sekaligus.
+
+    Urutan cek per baris sama dengan import lama (barang, nota/tanggal,
+    partner, kuantitas, harga). Semua baris dicek sekaligus; jika ada yang
+    gagal raise ValidasiUploadGagal berisi pesan untuk setiap baris & cek.
+    Return DataFrame per baris Excel: no_nota, tanggal (date), id_partner,
+    top, id_barang, kuantitas (int64), harga_satuan & subtotal (float).
+    """
+    kolom_nama, label, normalisasi = KOLOM_PARTNER[partner]
+    master = _get_master_data()
+    baris = pd.Series(df.index, index=df.index) + 2
+
+    # ======================
+    # BARANG
+    # ======================
+    nama_barang = _kolom_excel(df, 'Keterangan Barang')
+    barang_kosong = nama_barang.isna()
+    id_barang = nama_barang.map({
+        nama: (master['barang'].get(_kunci_nama(nama)) or (None,))[0]
+        for nama in nama_barang.dropna().unique()
+    })
+    barang_salah = ~barang_kosong & id_barang.isna()
+
+    # ======================
+    # HEADER (nota, tanggal, partner)
+    # ======================
+    no_nota = _kolom_excel(df, 'No. Faktur')
+    tanggal_raw = _kolom_excel(df, 'Tgl Faktur')
+    nota_kosong = no_nota.isna() | tanggal_raw.isna()
+
+    # Serial Excel, ISO & nama bulan Indonesia di-parse sekaligus per kolom
+    tanggal, tanggal_gagal = parse_tanggal_kolom(tanggal_raw)
+    tanggal = tanggal.dt.date
+    tanggal_salah = ~nota_kosong & pd.Series(df.index.isin(tanggal_gagal), index=df.index)
+
+    nama_partner = _kolom_excel(df, kolom_nama)
+    info_partner = {
+        nama: master[partner].get(_kunci_nama(normalisasi(nama)))
+        for nama in nama_partner.dropna().unique()
+    }
+    id_partner = nama_partner.map({nama: (info or (None,))[0] for nama, info in info_partner.items()})
+    partner_salah = nama_partner.notna() & id_partner.isna()
+
+    # TOP → prioritas DataFrame → default → top master partner
+    top = _kolom_excel(df, 'TOP').astype(object)
+    if default_top is not None and not pd.isna(default_top):
+        top = top.where(top.notna(), default_top)
+    top_partner = nama_partner.map({nama: (info or (None, 0))[1] for nama, info in info_partner.items()})
+    top = top.where(top.notna(), top_partner.where(nama_partner.notna(), 0))
+    top = pd.to_numeric(top, errors='coerce')
+
+    # ======================
+    # DETAIL (kuantitas & harga)
+    # ======================
+    kuantitas_raw = _kolom_excel(df, 'Kuantitas')
+    kuantitas = pd.to_numeric(kuantitas_raw, errors='coerce')
+    harga_raw = _kolom_excel(df, 'Harga Satuan')
+    harga = pd.to_numeric(harga_raw, errors='coerce')
+    jumlah_raw = _kolom_excel(df, 'Jumlah')
+    jumlah = pd.to_numeric(jumlah_raw, errors='coerce')
+
+    pakai_harga = harga_raw.notna()
+    kuantitas_int = np.trunc(kuantitas.fillna(0).to_numpy()).astype(np.int64)
+    kuantitas_salah = kuantitas.isna() | (~pakai_harga & (kuantitas_int == 0))
+    harga_salah = pakai_harga & harga.isna()
+    jumlah_salah = ~pakai_harga & jumlah.isna()
+
+    # ======================
+    # LAPORAN ERROR
+    # ======================
+    cek = [
+        (barang_kosong, lambda i: "Nama barang kosong"),
+        (barang_salah, lambda i: f"Barang '{nama_barang[i]}' tidak ditemukan"),
+        (nota_kosong, lambda i: "No nota atau tanggal kosong"),
+        (tanggal_salah, lambda i: f"Tanggal '{tanggal_raw[i]}' tidak valid"),
+        (partner_salah, lambda i: f"{label} '{nama_partner[i]}' tidak ditemukan"),
+        (kuantitas_salah, lambda i: "Kuantitas tidak valid"),
+        (harga_salah, lambda i: f"Harga Satuan '{harga_raw[i]}' tidak valid"),
+        (jumlah_salah, lambda i: "Jumlah kosong")
+    ]
+    errors = []
+    for urutan, (mask, pesan) in enumerate(cek):
+        errors.extend((baris[i], urutan, f"Baris {baris[i]}: {pesan(i)}") for i in df.index[mask.to_numpy()])
+    if errors:
+        raise ValidasiUploadGagal([teks for _, _, teks in sorted(errors)])
+
+    kuantitas_float = kuantitas_int.astype(float)
+    subtotal = np.where(pakai_harga, kuantitas_float * harga.to_numpy(dtype=float), jumlah.to_numpy(dtype=float))
+    harga_satuan = np.where(pakai_harga, harga.to_numpy(dtype=float), subtotal / np.where(kuantitas_int == 0, 1, kuantitas_float))
+
+    return pd.DataFrame({
+        'no_nota': no_nota.astype(str).to_numpy(),
+        'tanggal': tanggal.to_numpy(),
+        'id_partner': id_partner.to_numpy(),
+        'top': top.to_numpy(),
+        'id_barang': id_barang.astype(np.int64).to_numpy(),
+        'kuantitas': kuantitas_int,
+        'harga_satuan': harga_satuan,
+        'subtotal': subtotal
+    })
+
+def _ambil_header_existing(cursor, tabel, kolom_partner, nota, kolom_lain=()):
+    """
+    Header transaksi yang sudah ada untuk nota upload.
+    nota: DataFrame no_nota, tanggal, id_partner (1 baris per nota).
+    Return dict no_nota -> (id, total, tanggal, id_partner, top, *kolom_lain);
+    dicocokkan pada (no_nota, tanggal, partner) seperti cek per nota versi lama.
+    """
+    rows = _select_in(cursor, f"""
+        SELECT id, no_nota, tanggal, {kolom_partner}, total, top{''.join(', ' + k for k in kolom_lain)}
+        FROM {tabel}
+        WHERE no_nota IN ({{}})
+        ORDER BY id
+    """, nota['no_nota'].tolist())
+
+    di_db = {}
+    for id_header, no_nota, tanggal, id_partner, total, top, *lain in rows:
+        kunci = (_kunci_nama(no_nota), pd.to_datetime(tanggal).date(), id_partner)
+        di_db.setdefault(kunci, (id_header, float(total), pd.to_datetime(tanggal).date(), id_partner, top, *lain))
+
+    existing = {}
+    for no_nota, tanggal, id_partner in nota[['no_nota', 'tanggal', 'id_partner']].itertuples(index=False):
+        if id_partner is None or pd.isna(id_partner):
+            continue
+        kunci = (_kunci_nama(no_nota), tanggal, int(id_partner))
+        if kunci in di_db:
+            existing[no_nota] = di_db[kunci]
+    return existing
+
+def _ambil_detail_existing(cursor, tabel_detail, kolom_header, id_headers):
+    """dict (id_header, id_barang) -> id detail pertama untuk header-header tsb"""
+    rows = _select_in(cursor, f"""
+        SELECT id, {kolom_header}, id_barang
+        FROM {tabel_detail}
+        WHERE {kolom_header} IN ({{}})
+        ORDER BY id
+    """, [int(i) for i in id_headers])
+
+    detail = {}
+    for id_detail, id_header, id_barang in rows:
+        detail.setdefault((id_header, id_barang), id_detail)
+    return detail
+
+def _tulis_transaksi_bulk(cursor, data, tabel, kolom_partner, kolom_tambahan=None):
+    """
+    Tulis header & detail hasil _siapkan_baris_transaksi.
+
+    Header baru di-insert sekali per nota (tanggal/partner/top dari baris
+    pertama nota), header lama total-nya ditambah. Baris dengan barang yang
+    sudah ada di nota digabung ke detail tsb (kuantitas & subtotal ditambah,
+    harga_satuan tetap), barang baru jadi 1 detail per nota.
+    kolom_tambahan: dict kolom header tambahan -> Series nilai per baris.
+
+    Return (nota, detail):
+    - nota: DataFrame per nota (id, no_nota, tanggal, id_partner, top, total)
+    - detail: DataFrame per (nota, barang) (id_detail, id_barang, tanggal,
+      kuantitas, baru)
+    """
+    tabel_detail = f"{tabel}_detail"
+    kolom_header = f"id_{tabel}"
+    kolom_tambahan = kolom_tambahan or {}
+    for kolom, nilai in kolom_tambahan.items():
+        data[kolom] = nilai.to_numpy()
+
+    nota = data.groupby('no_nota', sort=False).agg(
+        tanggal=('tanggal', 'first'),
+        id_partner=('id_partner', 'first'),
+        top=('top', 'first'),
+        tambahan=('subtotal', 'sum'),
+        **{kolom: (kolom, 'first') for kolom in kolom_tambahan}
+    ).reset_index()
+
+    # ======================
+    # HEADER
+    # ======================
+    existing = _ambil_header_existing(cursor, tabel, kolom_partner, nota, list(kolom_tambahan))
+    ada = nota['no_nota'].isin(list(existing))
+
+    # 1 upsert untuk header baru & lama: unique key (no_nota, tanggal, partner)
+    # membuat header lama cukup ditambah total-nya, juga saat upload paralel
+    kolom_insert = ['no_nota', 'tanggal', kolom_partner, 'total', 'top', *kolom_tambahan]
+    _executemany_batch(cursor, f"""
+        INSERT INTO {tabel} ({', '.join(kolom_insert)})
+        VALUES ({', '.join(['%s'] * len(kolom_insert))})
+        ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+    """, [
+        (
+            str(row.no_nota),
+            row.tanggal,
+            None if pd.isna(row.id_partner) else int(row.id_partner),
+            float(row.tambahan),
+            None if pd.isna(row.top) else int(row.top),
+            *[getattr(row, kolom) for kolom in kolom_tambahan]
+        )
+        for row in nota.itertuples(index=False)
+    ])
+
+    baru = nota[~ada]
+    if not baru.empty:
+        # lastrowid executemany tidak bisa diandalkan per baris, ambil ulang id-nya
+        existing.update(_ambil_header_existing(cursor, tabel, kolom_partner, baru, list(kolom_tambahan)))
+
+    if not nota['no_nota'].isin(list(existing)).all():
+        raise Exception(f"Gagal membaca ulang id {tabel} yang baru di-insert")
+
+    header = [existing[no_nota] for no_nota in nota['no_nota']]
+    nota['id'] = [h[0] for h in header]
+    nota['total'] = [h[1] for h in header] + nota['tambahan'].where(ada, 0)
+    # Header lama: tanggal, top & kolom tambahan mengikuti database
+    dari_db = ada.tolist()
+    for posisi, kolom in [(2, 'tanggal'), (4, 'top')] + [(5 + i, k) for i, k in enumerate(kolom_tambahan)]:
+        nota[kolom] = [h[posisi] if lama else nilai for h, lama, nilai in zip(header, dari_db, nota[kolom])]
+
+    # ======================
+    # DETAIL
+    # ======================
+    data['id_header'] = data['no_nota'].map(dict(zip(nota['no_nota'], nota['id'])))
+    detail = data.groupby(['id_header', 'id_barang'], sort=False).agg(
+        kuantitas=('kuantitas', 'sum'),
+        harga_satuan=('harga_satuan', 'first'),
+        subtotal=('subtotal', 'sum')
+    ).reset_index()
+    detail['tanggal'] = detail['id_header'].map(dict(zip(nota['id'], nota['tanggal'])))
+
+    detail_lama = _ambil_detail_existing(cursor, tabel_detail, kolom_header, nota.loc[ada, 'id'].tolist())
+    kunci = list(zip(detail['id_header'].tolist(), detail['id_barang'].tolist()))
+    detail['id_detail'] = [detail_lama.get(k) for k in kunci]
+    detail['baru'] = detail['id_detail'].isna()
+
+    gabung = detail[~detail['baru']]
+    if not gabung.empty:
+        _executemany_batch(cursor, f"""
+            UPDATE {tabel_detail}
+            SET kuantitas = kuantitas + %s, subtotal = subtotal + %s
+            WHERE id = %s
+        """, [
+            (int(qty), float(subtotal), int(id_detail))
+            for qty, subtotal, id_detail in gabung[['kuantitas', 'subtotal', 'id_detail']].itertuples(index=False)
+        ])
+
+    insert = detail[detail['baru']]
+    if not insert.empty:
+        _executemany_batch(cursor, f"""
+            INSERT INTO {tabel_detail}
+            ({kolom_header}, id_barang, kuantitas, harga_satuan, subtotal)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [
+            (int(id_header), int(id_barang), int(qty), float(harga), float(subtotal))
+            for id_header, id_barang, qty, harga, subtotal
+            in insert[['id_header', 'id_barang', 'kuantitas', 'harga_satuan', 'subtotal']].itertuples(index=False)
+        ])
+        id_baru = _ambil_detail_existing(cursor, tabel_detail, kolom_header, insert['id_header'].unique().tolist())
+        detail.loc[detail['baru'], 'id_detail'] = [
+            id_baru[(h, b)] for h, b in insert[['id_header', 'id_barang']].itertuples(index=False)
+        ]
+
+    detail['id_detail'] = detail['id_detail'].astype(np.int64)
+    return nota, detail
+
+def _tulis_potongan_transaksi(cursor, df, default_top, partner, tabel, progres, kolom_tambahan=None):
+    """
+    _siapkan_baris_transaksi + _tulis_transaksi_bulk untuk DataFrame utuh
+    atau iterable potongan DataFrame (excel_reader.baca_excel_bertahap),
+    semuanya di transaksi yang sama. Nota yang terpecah di beberapa potongan
+    digabung ke header yang ditulis potongan sebelumnya.
+
+    progres: dict, progres['baris'] = jumlah baris yang sudah dibaca
+    kolom_tambahan: fungsi potongan -> dict kolom header tambahan
+    Error validasi semua potongan dikumpulkan dulu (ValidasiUploadGagal).
+    Return (nota, detail): nota 1 baris per header (total terakhir), detail
+    gabungan semua potongan.
+    """
+    potongan = [df] if isinstance(df, pd.DataFrame) else df
+    semua_nota, semua_detail = [], []
+    errors = []
+
+    for bagian in potongan:
+        progres['baris'] += len(bagian)
+        try:
+            data = _siapkan_baris_transaksi(bagian, default_top, partner)
+        except ValidasiUploadGagal as e:
+            errors.extend(e.errors)
+            continue
+        if errors:
+            # Sudah ada baris gagal: sisa potongan hanya divalidasi
+            continue
+        tambahan = kolom_tambahan(bagian) if kolom_tambahan else None
+        nota, detail = _tulis_transaksi_bulk(cursor, data, tabel, f"id_{partner}", tambahan)
+        semua_nota.append(nota)
+        semua_detail.append(detail)
+
+    if errors:
+        raise ValidasiUploadGagal(errors)
+
+    if not semua_nota:
+        # File tanpa baris data
+        return _tulis_potongan_transaksi(cursor, pd.DataFrame(), default_top, partner, tabel, progres, kolom_tambahan)
+
+    nota = pd.concat(semua_nota, ignore_index=True)
+    detail = pd.concat(semua_detail, ignore_index=True)
+    if len(semua_nota) > 1:
+        # Total terbaru ada di potongan terakhir yang menyentuh nota tsb
+        total = nota.groupby('id')['total'].last()
+        nota = nota.drop_duplicates('id').reset_index(drop=True)
+        nota['total'] = nota['id'].map(total)
+    return nota, detail
+
+def _buat_tagihan_bulk(cursor, nota, tabel_tagihan, kolom_header, kolom_partner):
+    """
+    Insert piutang/hutang untuk nota dengan TOP > 0 yang belum punya tagihan.
+    nota: hasil _tulis_transaksi_bulk. total & sisa = total nota terbaru.
+
+    due_date dihitung di pandas; semua tagihan ditulis dengan 1 upsert
+    (executemany per batch). Unique key id header (migrasi 0005) membuat
+    nota yang sudah punya tagihan dilewati tanpa SELECT cek dulu.
+    """
+    top = pd.to_numeric(nota['top'], errors='coerce').fillna(0)
+    nota = nota[top > 0]
+    if nota.empty:
+        return 0
+
+    tanggal = pd.to_datetime(nota['tanggal'])
+    due_date = (tanggal + pd.to_timedelta(top[nota.index].astype(np.int64), unit='D')).dt.date
+
+    _executemany_batch(cursor, f"""
+        INSERT INTO {tabel_tagihan}
+        ({kolom_header}, no_nota, tanggal, due_date, {kolom_partner},
+         total, terbayar, sisa, status, created_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, 0, %s, 'BELUM_LUNAS', CURDATE(), CURDATE())
+        ON DUPLICATE KEY UPDATE {kolom_header} = {kolom_header}
+    """, [
+        (int(id_header), str(no_nota), tgl, due, int(id_partner), float(total), float(total))  # sisa = total
+        for id_header, no_nota, tgl, due, id_partner, total in zip(
+            nota['id'], nota['no_nota'], tanggal.dt.date, due_date, nota['id_partner'], nota['total']
+        )
+    ])
+    return len(nota)
+
+# Kolom yang dibandingkan untuk peringatan baris kembar (+ kolom partner)
+KOLOM_BARIS_KEMBAR = ['No. Faktur', 'Tgl Faktur', 'Keterangan Barang', 'Kuantitas', 'Harga Satuan', 'Jumlah']
+
+def validasi_upload_transaksi(df, partner, default_top=None, kolom_lain=()):
+    """
+    Dry-run upload transaksi (partner 'customer' / 'supplier'): semua baris
+    DataFrame / potongan excel_reader dicek sekaligus TANPA menulis ke
+    database, supaya semua baris salah bisa diperbaiki dalam 1x upload.
+    Potongan boleh generator: yang disimpan hanya error & hash kunci baris.
+
+    Return (errors, peringatan):
+    - errors: semua pesan 'Baris N: ...' yang akan menggagalkan import
+    - peringatan: baris yang sama persis dengan baris sebelumnya; tetap
+      di-import (kuantitasnya digabung ke detail yang sama)
+    """
+    potongan = [df] if isinstance(df, pd.DataFrame) else df
+    kolom_kunci = KOLOM_BARIS_KEMBAR + [KOLOM_PARTNER[partner][0], *kolom_lain]
+    errors, semua_kunci = [], []
+
+    for bagian in potongan:
+        try:
+            _siapkan_baris_transaksi(bagian, default_top, partner)
+        except ValidasiUploadGagal as e:
+            errors.extend(e.errors)
+        # Per baris hanya hash kolom kunci yang disimpan (bukan isi potongan)
+        nilai_kunci = pd.DataFrame({
+            kolom: _kolom_excel(bagian, kolom).astype(object) for kolom in kolom_kunci
+        })
+        nilai_kunci = nilai_kunci.where(nilai_kunci.notna(), None).astype(str)
+        semua_kunci.append(pd.Series(
+            pd.util.hash_pandas_object(nilai_kunci, index=False).to_numpy(),
+            index=bagian.index
+        ))
+
+    if not semua_kunci:
+        return errors, []
+
+    # Baris kembar dicek lintas potongan
+    kunci = pd.concat(semua_kunci)
+    pertama = pd.Series(kunci.index).groupby(kunci.to_numpy()).transform('first').to_numpy()
+    kembar = kunci.duplicated(keep='first').to_numpy()
+    peringatan = [
+        f"Baris {i + 2}: sama persis dengan baris {p + 2}"
+        for i, p in zip(kunci.index[kembar], pertama[kembar])
+    ]
+    return errors, peringatan
+
+def validasi_penjualan(df, default_top=None):
+    """Dry-run insert_penjualan, return (errors, peringatan)"""
+    return validasi_upload_transaksi(df, 'customer', default_top)
+
+def validasi_pembelian(df, default_top=None):
+    """Dry-run insert_pembelian, return (errors, peringatan)"""
+    return validasi_upload_transaksi(df, 'supplier', default_top, kolom_lain=['Tipe'])
+
+
+
+
+# ================================================
+# IMPORT PRICELIST (BULK)
+# ================================================
+# Upload Excel customer / supplier + pricelist: partner baru dibuat dalam
+# 1 batch, pricelist lama dimuat dengan 1 query lalu dibandingkan di pandas,
+# dan hanya harga yang berubah yang ditulis (1 upsert executemany per
+# BULK_BATCH_SIZE baris), semua dalam 1 transaksi.
+
+def _tanggal_update(nilai):
+    """Nilai kolom 'Update Terakhir' -> 'YYYY-MM-DD' (None jika kosong / tidak valid)"""
+    if pd.isna(nilai):
+        return None
+    try:
+        return pd.to_datetime(nilai).strftime('%Y-%m-%d')
+    except Exception:
+        return None
+
+def bulk_upsert_pricelist(df, kind):
+    """
+    Import pricelist customer / supplier dari DataFrame Excel (kolom Nama,
+    Barang, Harga, opsional TOP & Update Terakhir). kind: 'customer' atau
+    'supplier'.
+
+    Pesan & hitungan sama dengan upload per baris sebelumnya: baris tidak
+    lengkap, barang tidak ditemukan, dan harga yang sama dengan harga
+    sebelumnya (di database atau baris sebelumnya di file) masuk errors.
+    Partner yang belum ada dibuat (dengan TOP dari Excel), TOP partner lama
+    di-update jika kolom TOP diisi.
+    Return (success, failed, errors).
+    """
+    if kind not in KOLOM_PARTNER:
+        raise Exception(f"Jenis pricelist '{kind}' tidak dikenal")
+
+    normalisasi = KOLOM_PARTNER[kind][2]
+    tabel_pricelist = f"{kind}_pricelist"
+    kolom_partner = f"id_{kind}"
+    errors = []
+
+    data = pd.DataFrame({
+        'baris': df.index + 1,
+        'nama': df['Nama'].map(normalisasi, na_action='ignore'),
+        'barang': df['Barang'],
+        'harga': pd.to_numeric(df['Harga'], errors='coerce'),
+        'top': pd.to_numeric(_kolom_excel(df, 'TOP'), errors='coerce'),
+        'updated_at': _kolom_excel(df, 'Update Terakhir').map(_tanggal_update)
+    })
+
+    # Baris tidak lengkap (harga bukan angka juga dianggap tidak lengkap)
+    lengkap = (data['nama'].fillna("") != "") & data['barang'].notna() & data['harga'].notna()
+    errors.extend(f"Baris {baris}: Data tidak lengkap" for baris in data.loc[~lengkap, 'baris'])
+    data = data[lengkap].copy()
+    data['harga'] = np.trunc(data['harga']).astype('int64')
+    data['kunci_nama'] = data['nama'].map(_kunci_nama)
+
+    if data.empty:
+        return 0, len(errors), errors
 
-# Insert data penjualan
-def insert_penjualan(df, default_top=None):
     conn = get_connection()
     cursor = conn.cursor()
-    success_count = 0
-    errors = []
 
     try:
         conn.start_transaction()
 
-        penjualan_cache = {}
-        
-        for index, row in df.iterrows():
-            # ======================
-            # VALIDASI BARANG
-            # ======================
-            nama_barang = row.get('Keterangan Barang')
-            if pd.isna(nama_barang):
-                raise Exception(f"Baris {index + 2}: Nama barang kosong")
+        # Partner: 1 query semua partner, partner baru di-insert 1 batch
+        cursor.execute(f"SELECT id, nama, top FROM {kind} ORDER BY id")
+        partner = {}
+        for id_partner, nama, top in cursor.fetchall():
+            partner.setdefault(_kunci_nama(nama), (id_partner, top))
 
-            id_barang = get_barang_id(nama_barang)
-            if not id_barang:
-                raise Exception(f"Baris {index + 2}: Barang '{nama_barang}' tidak ditemukan")
+        # TOP per partner: nilai terakhir di file (seperti update per baris)
+        top_excel = data.dropna(subset=['top']).groupby('kunci_nama', sort=False)['top'].last()
+        partner_baru = data.drop_duplicates('kunci_nama')
+        partner_baru = partner_baru[~partner_baru['kunci_nama'].isin(partner.keys())]
 
-            # ======================
-            # DATA HEADER
-            # ======================
-            no_nota = row.get('No. Faktur')
-            tanggal = row.get('Tgl Faktur')
-            nama_pelanggan = row.get('Nama Pelanggan')
+        _executemany_batch(cursor, f"INSERT INTO {kind} (nama, top) VALUES (%s, %s)", [
+            (nama, int(top_excel.get(kunci, 0)))
+            for nama, kunci in partner_baru[['nama', 'kunci_nama']].itertuples(index=False)
+        ])
+        if not partner_baru.empty:
+            for id_partner, nama, top in _select_in(
+                cursor, f"SELECT id, nama, top FROM {kind} WHERE nama IN ({{}}) ORDER BY id",
+                partner_baru['nama'].tolist()
+            ):
+                partner.setdefault(_kunci_nama(nama), (id_partner, top))
+
+        partner_dibuat = set(partner_baru['kunci_nama'])
+        update_top = [
+            (int(top), int(partner[kunci][0]))
+            for kunci, top in top_excel.items()
+            if kunci not in partner_dibuat and partner[kunci][1] != int(top)
+        ]
+        _executemany_batch(cursor, f"UPDATE {kind} SET top = %s WHERE id = %s", update_top)
+
+        data['id_partner'] = data['kunci_nama'].map(lambda kunci: partner[kunci][0])
+
+        # Barang dari cache master data
+        master_barang = _get_master_data()['barang']
+        data['id_barang'] = data['barang'].map(
+            lambda nama: (master_barang.get(_kunci_nama(nama)) or (None,))[0]
+        )
+        tidak_ada = data['id_barang'].isna()
+        errors.extend(
+            f"Baris {baris}: Barang '{barang}' tidak ditemukan"
+            for baris, barang in data.loc[tidak_ada, ['baris', 'barang']].itertuples(index=False)
+        )
+        data = data[~tidak_ada].copy()
+        data['id_barang'] = data['id_barang'].astype('int64')
+
+        # Pricelist lama (1 query), dibandingkan dengan harga sebelumnya per
+        # (partner, barang): baris sebelumnya di file, atau harga di database
+        cursor.execute(f"SELECT {kolom_partner}, id_barang, harga FROM {tabel_pricelist}")
+        harga_db = {(int(id_partner), int(id_barang)): float(harga) for id_partner, id_barang, harga in cursor.fetchall()}
+
+        kolom_kunci = ['id_partner', 'id_barang']
+        harga_sebelum = data.groupby(kolom_kunci, sort=False)['harga'].shift()
+        pertama = harga_sebelum.isna()
+        harga_sebelum[pertama] = [
+            harga_db.get((int(id_partner), int(id_barang)), np.nan)
+            for id_partner, id_barang in data.loc[pertama, kolom_kunci].itertuples(index=False)
+        ]
+        sama = harga_sebelum == data['harga']
+        errors.extend(
+            f"Baris {baris}: Data sudah ada di database (Harga sama: {harga})"
+            for baris, harga in data.loc[sama, ['baris', 'harga']].itertuples(index=False)
+        )
 
-            if pd.isna(no_nota) or pd.isna(tanggal):
-                raise Exception(f"Baris {index + 2}: No nota atau tanggal kosong")
+        berubah = data[~sama]
+        tulis = berubah.drop_duplicates(kolom_kunci, keep='last')
+        _executemany_batch(cursor, f"""
+            INSERT INTO {tabel_pricelist} ({kolom_partner}, id_barang, harga, updated_at)
+            VALUES (%s, %s, %s, COALESCE(%s, NOW()))
+            ON DUPLICATE KEY UPDATE harga = VALUES(harga), updated_at = VALUES(updated_at)
+        """, [
+            (int(id_partner), int(id_barang), int(harga), updated_at)
+            for id_partner, id_barang, harga, updated_at
+            in tulis[['id_partner', 'id_barang', 'harga', 'updated_at']].itertuples(index=False)
+        ])
 
-            id_customer = None
-            if not pd.isna(nama_pelanggan):
-                id_customer = get_customer_id(nama_pelanggan)
-                if not id_customer:
-                    raise Exception(f"Baris {index + 2}: Customer '{nama_pelanggan}' tidak ditemukan")
-                
-            # TOP → prioritas DataFrame → fallback ke default
-            top = row.get("TOP") if "TOP" in df.columns and pd.notna(row.get("TOP")) else default_top
-            if pd.isna(top) or top is None:
-                # Ambil default dari customer
-                cursor.execute("SELECT top FROM customer WHERE id = %s", (id_customer,))
-                cust_top = cursor.fetchone()
-                top = cust_top[0] if cust_top else 0
+        conn.commit()
+        invalidasi_master_cache()
+        errors.sort(key=lambda pesan: int(pesan.split(':')[0].split()[1]))
+        return len(berubah), len(errors), errors
 
-            # ======================
-            # CEK DATABASE DULU (UNTUK INPUT MANUAL)
-            # ======================
-            if no_nota not in penjualan_cache:
-                # Cek apakah transaksi sudah ada di database
+    except Exception as e:
+        conn.rollback()
+        return 0, len(df), [str(e)]
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+
+
+
+# ================================================
+# REGISTRY IMPORT (HASH FILE & POTONGAN)
+# ================================================
+# File upload yang sama dan potongan yang sama (hash isi EXCEL_CHUNK_SIZE
+# baris, excel_reader.hash_potongan) dicatat per jenis import. File dikenali
+# dari 2 kunci: hash_file (byte file, dicek sebelum file di-parse) dan
+# hash_isi (baris bersih sesuai urutan, excel_reader.HashIsiFile, dicek
+# setelah file dibaca) untuk file yang di-export / disimpan ulang. Hash
+# tiap potongan dicek sebelum dibersihkan & divalidasi; yang sudah
+# terdaftar dilewati kecuali dipaksa. Registry ditulis di transaksi import yang sama
+# (parameter registry insert_penjualan / insert_pembelian), jadi import
+# yang gagal tidak tercatat.
+
+def get_import_terdaftar(jenis, hash_file=None, hash_isi=None):
+    """
+    Registry file (dict) jika file dengan hash byte `hash_file` atau hash
+    isi `hash_isi` sudah pernah diimport
+    """
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        cursor.execute("""
+            SELECT id, nama_file, jumlah_baris, jumlah_import, created_at, updated_at
+            FROM import_registry
+            WHERE jenis = %s AND (hash_file = %s OR hash_isi = %s)
+            ORDER BY id
+            LIMIT 1
+        """, (jenis, hash_file, hash_isi))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+def cek_potongan_terdaftar(jenis, hash_potongan):
+    """True jika potongan dengan hash ini sudah pernah diimport"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("""
+            SELECT 1 FROM import_registry_potongan
+            WHERE jenis = %s AND hash_potongan = %s
+        """, (jenis, hash_potongan))
+        return cursor.fetchone() is not None
+    finally:
+        cursor.close()
+        conn.close()
+
+def _catat_registry_import(cursor, registry):
+    """
+    Catat file & potongan yang diimport (dipanggil sebelum commit import).
+    registry: dict jenis, hash_file, hash_isi, nama_file, potongan = list
+    (hash_potongan, jumlah_baris), paksa = True jika import ulang dipaksa.
+    Tanpa paksa, file yang sudah terdaftar (upload bersamaan) menggagalkan
+    import.
+    """
+    jenis = registry['jenis']
+    potongan = registry.get('potongan', [])
+    jumlah_baris = sum(int(n) for _, n in potongan)
+    upsert = ""
+    if registry.get('paksa'):
+        upsert = """ON DUPLICATE KEY UPDATE jumlah_import = jumlah_import + 1,
+            nama_file = VALUES(nama_file), hash_isi = VALUES(hash_isi)"""
+
+    try:
+        cursor.execute(f"""
+            INSERT INTO import_registry (jenis, hash_file, hash_isi, nama_file, jumlah_baris)
+            VALUES (%s, %s, %s, %s, %s)
+            {upsert}
+        """, (jenis, registry['hash_file'], registry.get('hash_isi'), registry.get('nama_file'), jumlah_baris))
+    except mysql.connector.IntegrityError as e:
+        if e.errno == 1062:
+            raise Exception(f"File '{registry.get('nama_file')}' sudah pernah diimport")
+        raise
+
+    cursor.execute(
+        "SELECT id FROM import_registry WHERE jenis = %s AND hash_file = %s",
+        (jenis, registry['hash_file'])
+    )
+    id_registry = cursor.fetchone()[0]
+
+    _executemany_batch(cursor, """
+        INSERT INTO import_registry_potongan (id_registry, jenis, hash_potongan, jumlah_baris)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE id_registry = VALUES(id_registry), jumlah_baris = VALUES(jumlah_baris)
+    """, [(int(id_registry), jenis, hash_potongan, int(n)) for hash_potongan, n in potongan])
+    return id_registry
+
+
+
+
+
+# ================================================
+# DATA PENJUALAN
+# ================================================
+
+# Cek apakah sudah ada penjualan dengan no_nota, tanggal, dan customer yang sama
+def _sql_existing_penjualan(no_nota, tanggal, id_customer):
+    query = """
+        SELECT id, total 
+        FROM penjualan 
+        WHERE no_nota = %s AND tanggal = %s AND id_customer = %s
+        LIMIT 1
+    """
+    return query, (str(no_nota), tanggal, int(id_customer))
+
+def get_existing_penjualan(no_nota, tanggal, id_customer):
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(*_sql_existing_penjualan(no_nota, tanggal, id_customer))
+    result = cursor.fetchone()
+    
+    cursor.close()
+    conn.close()
+    
+    if result:
+        return {"id": result[0], "total": float(result[1])}
+    return None
+
+# Insert data penjualan (bulk)
+def insert_penjualan(df, default_top=None, registry=None):
+    """
+    Import penjualan dari DataFrame Excel (atau potongan DataFrame dari
+    excel_reader) dalam 1 transaksi. Nama di-resolve sekali per potongan,
+    header/detail/piutang ditulis per batch (executemany).
+    registry (opsional): file & potongan yang dicatat ke registry import
+    di transaksi yang sama (lihat _catat_registry_import).
+    Return (success, failed, errors) seperti sebelumnya.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    progres = {'baris': 0}
+    errors = []
+
+    try:
+        conn.start_transaction(isolation_level=ISOLASI_LEDGER)
+
+        nota, detail = _tulis_potongan_transaksi(cursor, df, default_top, 'customer', 'penjualan', progres)
+        _buat_tagihan_bulk(cursor, nota, 'piutang', 'id_penjualan', 'id_customer')
+
+        # Import lain yang berbagi barang menunggu sampai transaksi ini selesai
+        _kunci_ledger_barang(cursor, detail['id_barang'])
+
+        # ======================
+        # UPDATE LEDGER HPP FIFO
+        # ======================
+        # Barang yang digabung ke detail lama harus di-replay
+        hpp_replay = set(detail.loc[~detail['baru'], 'id_barang'].tolist())
+        for id_barang in hpp_replay:
+            _replay_hpp_barang(cursor, id_barang)
+            _refresh_gp_cube(cursor, id_barang)
+
+        baru = detail[detail['baru'] & ~detail['id_barang'].isin(hpp_replay)]
+        for id_barang, grup in baru.groupby('id_barang', sort=False):
+            detail_baru = list(zip(grup['id_detail'].tolist(), grup['tanggal'].tolist(), grup['kuantitas'].tolist()))
+            if _sinkron_hpp_penjualan(cursor, id_barang, detail_baru):
+                _refresh_gp_cube(cursor, id_barang)
+            else:
+                # Alokasi lama tidak berubah, cukup bulan penjualan baru
+                _refresh_gp_cube(cursor, id_barang, pd.to_datetime(grup['tanggal'].min()))
+
+        mutasi_stok = {}
+        for id_barang, tanggal, kuantitas in detail[['id_barang', 'tanggal', 'kuantitas']].itertuples(index=False):
+            _tambah_mutasi_stok(mutasi_stok, id_barang, tanggal, keluar=kuantitas)
+        _catat_stok_harian(cursor, mutasi_stok)
+
+        if registry:
+            _catat_registry_import(cursor, registry)
+
+        # Checkpoint FIFO bulan >= transaksi tertua sudah tidak valid.
+        # Paling akhir: kunci global checkpoint hanya ditahan sampai commit
+        if not nota.empty:
+            _invalidasi_fifo_checkpoint(cursor, nota['tanggal'].min())
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return progres['baris'], 0, []
+
+    except Exception as e:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        errors.extend(e.errors if isinstance(e, ValidasiUploadGagal) else [str(e)])
+        return 0, progres['baris'], errors
+
+# Insert data penjualan per baris (versi lama, 2-6 query per baris Excel)
+# Dipertahankan untuk benchmark/bench_insert_penjualan.py
+def insert_penjualan_loop(df, default_top=None):
+    conn = get_connection()
+    cursor = conn.cursor()
+    success_count = 0
+    errors = []
+
+    try:
+        conn.start_transaction(isolation_level=ISOLASI_LEDGER)
+
+        penjualan_cache = {}
+        hpp_baru = {}        # id_barang -> [(id_detail, tanggal, kuantitas)]
+        hpp_replay = set()    # id_barang yang ledger-nya harus di-replay
+        tanggal_transaksi = []  # untuk invalidasi checkpoint FIFO
+        mutasi_stok = {}      # (id_barang, tanggal) -> [masuk, keluar] untuk stok_harian
+        
+        for index, row in df.iterrows():
+            # ======================
+            # VALIDASI BARANG
+            # ======================
+            nama_barang = row.get('Keterangan Barang')
+            if pd.isna(nama_barang):
+                raise Exception(f"Baris {index + 2}: Nama barang kosong")
+
+            id_barang = get_barang_id(nama_barang)
+            if not id_barang:
+                raise Exception(f"Baris {index + 2}: Barang '{nama_barang}' tidak ditemukan")
+
+            # ======================
+            # DATA HEADER
+            # ======================
+            no_nota = row.get('No. Faktur')
+            tanggal = row.get('Tgl Faktur')
+            nama_pelanggan = row.get('Nama Pelanggan')
+
+            if pd.isna(no_nota) or pd.isna(tanggal):
+                raise Exception(f"Baris {index + 2}: No nota atau tanggal kosong")
+
+            tanggal_transaksi.append(pd.to_datetime(tanggal).date())
+
+            id_customer = None
+            if not pd.isna(nama_pelanggan):
+                id_customer = get_customer_id(nama_pelanggan)
+                if not id_customer:
+                    raise Exception(f"Baris {index + 2}: Customer '{nama_pelanggan}' tidak ditemukan")
+                
+            # TOP → prioritas DataFrame → fallback ke default
+            top = row.get("TOP") if "TOP" in df.columns and pd.notna(row.get("TOP")) else default_top
+            if pd.isna(top) or top is None:
+                # Ambil default dari customer
+                cursor.execute("SELECT top FROM customer WHERE id = %s", (id_customer,))
+                cust_top = cursor.fetchone()
+                top = cust_top[0] if cust_top else 0
+
+            # ======================
+            # CEK DATABASE DULU (UNTUK INPUT MANUAL)
+            # ======================
+            if no_nota not in penjualan_cache:
+                # Cek apakah transaksi sudah ada di database
                 cursor.execute("""
                     SELECT id, total 
                     FROM penjualan 
@@ -1002,6 +1774,8 @@ def insert_penjualan(df, default_top=None):
                 WHERE id = %s
                 """
                 cursor.execute(query_update, (new_kuantitas, new_subtotal, detail_id))
+                hpp_replay.add(id_barang)
+                _tambah_mutasi_stok(mutasi_stok, id_barang, tanggal, keluar=kuantitas)
                 
                 # Update total penjualan (tambah selisihnya aja)
                 penjualan_cache[no_nota]["total"] += subtotal
@@ -1017,6 +1791,8 @@ def insert_penjualan(df, default_top=None):
                     query_detail,
                     (id_penjualan, id_barang, kuantitas, harga_satuan, subtotal)
                 )
+                hpp_baru.setdefault(id_barang, []).append((cursor.lastrowid, tanggal, kuantitas))
+                _tambah_mutasi_stok(mutasi_stok, id_barang, tanggal, keluar=kuantitas)
                 
                 penjualan_cache[no_nota]["total"] += subtotal
 
@@ -1042,15 +1818,15 @@ def insert_penjualan(df, default_top=None):
             penjualan_data = cursor.fetchone()
             
             if penjualan_data:
-                ualan = penjualan_data[0]
+                tanggal_nota = penjualan_data[0]
                 id_cust = penjualan_data[1]
                 total_penjualan = float(penjualan_data[2])
                 top_value = penjualan_data[3]
                 
                 # Jika TOP > 0, buat piutang
                 if top_value and int(top_value) > 0:
-                    # Hitung due_date
-                    due_date = tanggal_penjualan + timedelta(days=int(top_value))
+                    # Hitung due_date dari tanggal nota (bukan tanggal baris Excel terakhir)
+                    due_date = tanggal_nota + timedelta(days=int(top_value))
                     
                     # Cek apakah piutang sudah ada
                     cursor.execute("""
@@ -1068,13 +1844,35 @@ def insert_penjualan(df, default_top=None):
                         """, (
                             data["id"],
                             no_nota,
-                            tanggal_penjualan,
+                            tanggal_nota,
                             due_date,
                             id_cust,
                             total_penjualan,
                             total_penjualan  # sisa = total
                         ))
 
+        # ======================
+        # UPDATE LEDGER HPP FIFO
+        # ======================
+        for id_barang in hpp_replay:
+            _replay_hpp_barang(cursor, id_barang)
+            _refresh_gp_cube(cursor, id_barang)
+
+        for id_barang, detail_baru in hpp_baru.items():
+            if id_barang not in hpp_replay:
+                if _sinkron_hpp_penjualan(cursor, id_barang, detail_baru):
+                    _refresh_gp_cube(cursor, id_barang)
+                else:
+                    # Alokasi lama tidak berubah, cukup bulan penjualan baru
+                    sejak = min(pd.to_datetime(tanggal) for _, tanggal, _ in detail_baru)
+                    _refresh_gp_cube(cursor, id_barang, sejak)
+
+        # Checkpoint FIFO bulan >= transaksi tertua sudah tidak valid
+        if tanggal_transaksi:
+            _invalidasi_fifo_checkpoint(cursor, min(tanggal_transaksi))
+
+        _catat_stok_harian(cursor, mutasi_stok)
+
         conn.commit()
         cursor.close()
         conn.close()
@@ -1099,10 +1897,7 @@ def get_penjualan_dates():
     conn.close()
     return df['tanggal'].tolist()
 
-# Ambil data penjualan
-def get_data_penjualan(start_date=None, end_date=None, customer=None, barang=None, no_nota=None, id_penjualan=None):
-    conn = get_connection()
-
+def _sql_data_penjualan(start_date=None, end_date=None, customer=None, barang=None, no_nota=None, id_penjualan=None):
     query = """
         SELECT
             p.id,
@@ -1112,9 +1907,9 @@ def get_data_penjualan(start_date=None, end_date=None, customer=None, barang=Non
             b.nama AS nama_barang,
             b.satuan AS satuan,
             pd.kuantitas,
-            pd.harga_satuan,
-            pd.subtotal,
-            p.total AS total_nota,
+            CAST(ROUND(pd.harga_satuan * 100) AS SIGNED) AS harga_satuan,
+            CAST(ROUND(pd.subtotal * 100) AS SIGNED) AS subtotal,
+            CAST(ROUND(p.total * 100) AS SIGNED) AS total_nota,
             p.top AS top
         FROM penjualan p
         JOIN penjualan_detail pd ON p.id = pd.id_penjualan
@@ -1125,14 +1920,15 @@ def get_data_penjualan(start_date=None, end_date=None, customer=None, barang=Non
 
     params = []
 
+    # tanggal bertipe DATE: filter langsung ke kolom agar idx_tanggal terpakai
     if start_date and end_date:
-        query += " AND DATE(p.tanggal) BETWEEN %s AND %s"
+        query += " AND p.tanggal BETWEEN %s AND %s"
         params.extend([start_date, end_date])
     elif start_date:
-        query += " AND DATE(p.tanggal) >= %s"
+        query += " AND p.tanggal >= %s"
         params.append(start_date)
     elif end_date:
-        query += " AND DATE(p.tanggal) <= %s"
+        query += " AND p.tanggal <= %s"
         params.append(end_date)
 
     if customer and customer != "Semua":
@@ -1152,6 +1948,13 @@ def get_data_penjualan(start_date=None, end_date=None, customer=None, barang=Non
         params.append(id_penjualan)
 
     query += " ORDER BY p.tanggal DESC, p.no_nota DESC"
+    return query, params
+
+# Ambil data penjualan (harga_satuan, subtotal & total_nota dalam sen)
+def get_data_penjualan(start_date=None, end_date=None, customer=None, barang=None, no_nota=None, id_penjualan=None):
+    conn = get_connection()
+
+    query, params = _sql_data_penjualan(start_date, end_date, customer, barang, no_nota, id_penjualan)
 
     df = pd.read_sql(query, conn, params=params)
     conn.close()
@@ -1163,6 +1966,31 @@ def delete_penjualan(id_penjualan):
     cursor = conn.cursor()
 
     try:
+        conn.start_transaction(isolation_level=ISOLASI_LEDGER)
+
+        # Barang yang ledger HPP-nya terpengaruh
+        cursor.execute(
+            "SELECT DISTINCT id_barang FROM penjualan_detail WHERE id_penjualan = %s",
+            (int(id_penjualan),)
+        )
+        barang_ids = [row[0] for row in cursor.fetchall()]
+        _kunci_ledger_barang(cursor, barang_ids)
+
+        cursor.execute("SELECT tanggal FROM penjualan WHERE id = %s", (int(id_penjualan),))
+        header = cursor.fetchone()
+
+        # Stok keluar nota ini dikembalikan di stok_harian
+        mutasi_stok = {}
+        if header:
+            cursor.execute("""
+                SELECT id_barang, SUM(kuantitas)
+                FROM penjualan_detail
+                WHERE id_penjualan = %s
+                GROUP BY id_barang
+            """, (int(id_penjualan),))
+            for id_barang, qty in cursor.fetchall():
+                _tambah_mutasi_stok(mutasi_stok, id_barang, header[0], keluar=-int(qty))
+
         cursor.execute(
             "DELETE FROM penjualan_detail WHERE id_penjualan = %s",
             (int(id_penjualan),)
@@ -1171,6 +1999,16 @@ def delete_penjualan(id_penjualan):
             "DELETE FROM penjualan WHERE id = %s",
             (int(id_penjualan),)
         )
+
+        for id_barang in barang_ids:
+            _replay_hpp_barang(cursor, id_barang)
+            _refresh_gp_cube(cursor, id_barang)
+
+        _catat_stok_harian(cursor, mutasi_stok)
+
+        if header:
+            _invalidasi_fifo_checkpoint(cursor, header[0])
+
         conn.commit()
     finally:
         cursor.close()
@@ -1183,7 +2021,7 @@ def get_all_no_nota(start_date=None, end_date=None):
     params = []
     
     if start_date and end_date:
-        query += " AND DATE(tanggal) BETWEEN %s AND %s"
+        query += " AND tanggal BETWEEN %s AND %s"
         params.extend([start_date, end_date])
         
     query += " ORDER BY tanggal DESC, no_nota DESC"
@@ -1225,6 +2063,260 @@ def get_list_nota_untuk_print():
 
 
 
+# ================================================
+# BACKFILL PENJUALAN (LOAD DATA LOCAL INFILE)
+# ================================================
+# Untuk memuat histori bertahun-tahun (tools/backfill_penjualan.py): baris
+# Excel yang sudah dibersihkan dimuat ke tabel staging sementara lewat
+# LOAD DATA LOCAL INFILE, lalu barang & customer di-resolve dan header,
+# detail & piutang ditulis dengan INSERT ... SELECT. Jumlah statement per
+# file tetap (tidak tergantung jumlah baris). Ledger HPP tidak di-update
+# per baris: jalankan rebuild_hpp_allocation() setelah backfill.
+
+def _staging_penjualan(df, default_top=None):
+    """
+    Nilai per baris Excel untuk staging_penjualan. Cek nilai (nota, tanggal,
+    kuantitas, harga) dilakukan di pandas seperti _siapkan_baris_transaksi;
+    barang & customer di-resolve di MySQL.
+    """
+    no_nota = _kolom_excel(df, 'No. Faktur')
+    tanggal_raw = _kolom_excel(df, 'Tgl Faktur')
+    nota_kosong = no_nota.isna() | tanggal_raw.isna()
+    tanggal, tanggal_gagal = parse_tanggal_kolom(tanggal_raw)
+    tanggal_salah = ~nota_kosong & pd.Series(df.index.isin(tanggal_gagal), index=df.index)
+
+    top = pd.to_numeric(_kolom_excel(df, 'TOP'), errors='coerce')
+    if default_top is not None and not pd.isna(default_top):
+        top = top.fillna(default_top)
+
+    kuantitas = pd.to_numeric(_kolom_excel(df, 'Kuantitas'), errors='coerce')
+    harga_raw = _kolom_excel(df, 'Harga Satuan')
+    harga = pd.to_numeric(harga_raw, errors='coerce')
+    jumlah = pd.to_numeric(_kolom_excel(df, 'Jumlah'), errors='coerce')
+
+    pakai_harga = harga_raw.notna()
+    kuantitas_int = np.trunc(kuantitas.fillna(0).to_numpy()).astype(np.int64)
+    kuantitas_float = kuantitas_int.astype(float)
+    subtotal = np.where(pakai_harga, kuantitas_float * harga.to_numpy(dtype=float), jumlah.to_numpy(dtype=float))
+    harga_satuan = np.where(pakai_harga, harga.to_numpy(dtype=float), subtotal / np.where(kuantitas_int == 0, 1, kuantitas_float))
+
+    # Alasan tolak per baris: cek yang lebih awal menimpa cek sesudahnya
+    alasan_nota = pd.Series(None, index=df.index, dtype=object)
+    alasan_nota[tanggal_salah] = [f"Tanggal '{nilai}' tidak valid" for nilai in tanggal_raw[tanggal_salah]]
+    alasan_nota[nota_kosong] = "No nota atau tanggal kosong"
+
+    harga_salah = pakai_harga & harga.isna()
+    alasan_detail = pd.Series(None, index=df.index, dtype=object)
+    alasan_detail[~pakai_harga & jumlah.isna()] = "Jumlah kosong"
+    alasan_detail[harga_salah] = [f"Harga Satuan '{nilai}' tidak valid" for nilai in harga_raw[harga_salah]]
+    alasan_detail[kuantitas.isna() | (~pakai_harga & (kuantitas_int == 0))] = "Kuantitas tidak valid"
+
+    return pd.DataFrame({
+        'baris': df.index + 2,
+        'no_nota': no_nota.astype(object).map(str, na_action='ignore'),
+        'tanggal': tanggal.dt.strftime('%Y-%m-%d'),
+        'nama_customer': _kolom_excel(df, 'Nama Pelanggan').map(normalize_customer_name, na_action='ignore'),
+        'nama_barang': _kolom_excel(df, 'Keterangan Barang'),
+        'kuantitas': kuantitas_int,
+        'harga_satuan': harga_satuan,
+        'subtotal': subtotal,
+        'top': top.round().astype('Int64'),
+        'alasan_nota': alasan_nota,
+        'alasan_detail': alasan_detail
+    }, index=df.index)
+
+def backfill_penjualan(df, default_top=None):
+    """
+    Backfill histori penjualan lewat staging table + LOAD DATA LOCAL INFILE.
+    df: DataFrame Excel yang sudah dibersihkan atau iterable potongannya.
+
+    Beda dengan insert_penjualan: baris yang ditolak (barang / customer tidak
+    ada, nilai tidak valid, nota sudah ada di database) tidak menggagalkan
+    file. Semua baris nota tsb dilewati & dilaporkan, nota lain tetap masuk,
+    sehingga file yang sama aman di-backfill ulang.
+    Return (success, failed, errors): errors = 'Baris N: alasan' per baris
+    yang ditolak.
+    """
+    conn = db_pool.get_connection_infile(DB_NAME)
+    cursor = conn.cursor()
+    potongan = [df] if isinstance(df, pd.DataFrame) else df
+    jumlah_baris = 0
+
+    try:
+        conn.start_transaction(isolation_level=ISOLASI_LEDGER)
+
+        cursor.execute("""
+            CREATE TEMPORARY TABLE staging_penjualan (
+              `baris` int NOT NULL,
+              `no_nota` varchar(50) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+              `tanggal` date DEFAULT NULL,
+              `nama_customer` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+              `nama_barang` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+              `kuantitas` bigint DEFAULT NULL,
+              `harga_satuan` decimal(20,6) DEFAULT NULL,
+              `subtotal` decimal(20,6) DEFAULT NULL,
+              `top` bigint DEFAULT NULL,
+              `alasan_nota` varchar(500) DEFAULT NULL,
+              `alasan_detail` varchar(500) DEFAULT NULL,
+              `id_barang` bigint unsigned DEFAULT NULL,
+              `id_customer` bigint unsigned DEFAULT NULL,
+              `alasan` varchar(500) DEFAULT NULL,
+              PRIMARY KEY (`baris`),
+              KEY `idx_no_nota` (`no_nota`)
+            ) DEFAULT CHARSET=utf8mb4
+        """)
+        cursor.execute("""
+            CREATE TEMPORARY TABLE staging_nota (
+              `no_nota` varchar(50) COLLATE utf8mb4_unicode_ci NOT NULL,
+              `baris` int NOT NULL,
+              `tanggal` date DEFAULT NULL,
+              `id_customer` bigint unsigned DEFAULT NULL,
+              `top` bigint DEFAULT NULL,
+              `total` decimal(20,6) DEFAULT NULL,
+              `ditolak` int DEFAULT NULL,
+              `id` bigint unsigned DEFAULT NULL,
+              PRIMARY KEY (`no_nota`)
+            ) DEFAULT CHARSET=utf8mb4
+        """)
+
+        for bagian in potongan:
+            jumlah_baris += len(bagian)
+            db_pool.load_dataframe(cursor, 'staging_penjualan', _staging_penjualan(bagian, default_top))
+
+        # ======================
+        # RESOLVE BARANG & CUSTOMER (nama kembar: id terkecil)
+        # ======================
+        cursor.execute("""
+            UPDATE staging_penjualan s
+            JOIN (SELECT nama, MIN(id) AS id FROM barang GROUP BY nama) b ON b.nama = s.nama_barang
+            SET s.id_barang = b.id
+        """)
+        cursor.execute("""
+            UPDATE staging_penjualan s
+            JOIN (SELECT nama, MIN(id) AS id FROM customer GROUP BY nama) m ON m.nama = s.nama_customer
+            JOIN customer c ON c.id = m.id
+            SET s.id_customer = c.id, s.top = COALESCE(s.top, c.top)
+        """)
+        cursor.execute("""
+            UPDATE staging_penjualan
+            SET alasan = CASE
+                WHEN nama_barang IS NULL THEN 'Nama barang kosong'
+                WHEN id_barang IS NULL THEN CONCAT('Barang ''', nama_barang, ''' tidak ditemukan')
+                WHEN alasan_nota IS NOT NULL THEN alasan_nota
+                WHEN nama_customer IS NULL THEN 'Customer kosong'
+                WHEN id_customer IS NULL THEN CONCAT('Customer ''', nama_customer, ''' tidak ditemukan')
+                ELSE alasan_detail
+            END
+        """)
+
+        # ======================
+        # HEADER (tanggal, customer & top dari baris pertama nota)
+        # ======================
+        cursor.execute("""
+            INSERT INTO staging_nota (no_nota, baris, total, ditolak)
+            SELECT no_nota, MIN(baris), SUM(subtotal), MIN(CASE WHEN alasan IS NOT NULL THEN baris END)
+            FROM staging_penjualan
+            WHERE no_nota IS NOT NULL
+            GROUP BY no_nota
+        """)
+        cursor.execute("""
+            UPDATE staging_nota n
+            JOIN staging_penjualan s ON s.baris = n.baris
+            SET n.tanggal = s.tanggal, n.id_customer = s.id_customer, n.top = s.top
+        """)
+        cursor.execute("""
+            UPDATE staging_nota n
+            JOIN penjualan p ON p.no_nota = n.no_nota AND p.tanggal = n.tanggal AND p.id_customer = n.id_customer
+            SET n.id = p.id
+        """)
+        # 1 baris ditolak / nota sudah ada -> seluruh nota dilewati
+        cursor.execute("""
+            UPDATE staging_penjualan s
+            JOIN staging_nota n ON n.no_nota = s.no_nota
+            SET s.alasan = IF(n.id IS NOT NULL, 'Nota sudah ada di database',
+                              CONCAT('Nota ikut ditolak karena baris ', n.ditolak))
+            WHERE s.alasan IS NULL AND (n.id IS NOT NULL OR n.ditolak IS NOT NULL)
+        """)
+        cursor.execute("DELETE FROM staging_nota WHERE id IS NOT NULL OR ditolak IS NOT NULL")
+
+        cursor.execute("""
+            INSERT INTO penjualan (no_nota, tanggal, id_customer, total, top)
+            SELECT no_nota, tanggal, id_customer, total, top
+            FROM staging_nota
+            ORDER BY baris
+        """)
+        cursor.execute("""
+            UPDATE staging_nota n
+            JOIN penjualan p ON p.no_nota = n.no_nota AND p.tanggal = n.tanggal AND p.id_customer = n.id_customer
+            SET n.id = p.id
+        """)
+
+        # ======================
+        # DETAIL (1 per nota & barang, harga_satuan dari baris pertama) & PIUTANG
+        # ======================
+        cursor.execute("""
+            INSERT INTO penjualan_detail (id_penjualan, id_barang, kuantitas, harga_satuan, subtotal)
+            SELECT n.id, s.id_barang, SUM(s.kuantitas),
+                   SUBSTRING_INDEX(GROUP_CONCAT(s.harga_satuan ORDER BY s.baris), ',', 1),
+                   SUM(s.subtotal)
+            FROM staging_penjualan s
+            JOIN staging_nota n ON n.no_nota = s.no_nota
+            WHERE s.alasan IS NULL
+            GROUP BY n.id, s.id_barang
+            ORDER BY MIN(s.baris)
+        """)
+        cursor.execute("""
+            INSERT INTO piutang
+            (id_penjualan, no_nota, tanggal, due_date, id_customer,
+             total, terbayar, sisa, status, created_at, updated_at)
+            SELECT id, no_nota, tanggal, DATE_ADD(tanggal, INTERVAL top DAY), id_customer,
+                   total, 0, total, 'BELUM_LUNAS', CURDATE(), CURDATE()
+            FROM staging_nota
+            WHERE top > 0
+        """)
+
+        # ======================
+        # STOK HARIAN & CHECKPOINT FIFO
+        # ======================
+        cursor.execute("""
+            SELECT s.id_barang, n.tanggal, SUM(s.kuantitas)
+            FROM staging_penjualan s
+            JOIN staging_nota n ON n.no_nota = s.no_nota
+            WHERE s.alasan IS NULL
+            GROUP BY s.id_barang, n.tanggal
+        """)
+        mutasi_stok = {}
+        for id_barang, tanggal, kuantitas in cursor.fetchall():
+            _tambah_mutasi_stok(mutasi_stok, id_barang, tanggal, keluar=kuantitas)
+        _catat_stok_harian(cursor, mutasi_stok)
+
+        cursor.execute("SELECT MIN(tanggal) FROM staging_nota")
+        tanggal_awal = cursor.fetchone()[0]
+        if tanggal_awal is not None:
+            _invalidasi_fifo_checkpoint(cursor, tanggal_awal)
+
+        cursor.execute("SELECT baris, alasan FROM staging_penjualan WHERE alasan IS NOT NULL ORDER BY baris")
+        errors = [f"Baris {baris}: {alasan}" for baris, alasan in cursor.fetchall()]
+
+        conn.commit()
+        return jumlah_baris - len(errors), len(errors), errors
+
+    except Exception as e:
+        conn.rollback()
+        return 0, jumlah_baris, [str(e)]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+
+
+
+
+
+
+
+
 # ================================================
 # DATA PEMBELIAN
 # ================================================
@@ -1250,40 +2342,120 @@ def get_existing_pembelian(no_nota, tanggal, id_supplier):
         return {"id": result[0], "total": float(result[1])}
     return None
 
-# Insert data pembelian
-def insert_pembelian(df, default_top=None):
+# Insert data pembelian (bulk)
+def insert_pembelian(df, default_top=None, registry=None):
+    """
+    Import pembelian (Barang & Ongkir) dari DataFrame Excel (atau potongan
+    DataFrame dari excel_reader) dalam 1 transaksi. Nama di-resolve sekali
+    per potongan, header/detail/hutang ditulis per batch (executemany).
+    registry (opsional): file & potongan yang dicatat ke registry import
+    di transaksi yang sama (lihat _catat_registry_import).
+    Return (success, failed, errors) seperti sebelumnya.
+    """
     conn = get_connection()
     cursor = conn.cursor()
-    success_count = 0
+    progres = {'baris': 0}
     errors = []
 
     try:
-        conn.start_transaction()
+        conn.start_transaction(isolation_level=ISOLASI_LEDGER)
 
-        pembelian_cache = {}
-        
-        for index, row in df.iterrows():
-            # ======================
-            # VALIDASI BARANG
-            # ======================
-            nama_barang = row.get('Keterangan Barang')
-            if pd.isna(nama_barang):
-                raise Exception(f"Baris {index + 2}: Nama barang kosong")
+        nota, detail = _tulis_potongan_transaksi(
+            cursor, df, default_top, 'supplier', 'pembelian', progres,
+            # Default BARANG jika tidak ada
+            kolom_tambahan=lambda bagian: {'tipe': _kolom_excel(bagian, 'Tipe').fillna('Barang')}
+        )
+        _buat_tagihan_bulk(cursor, nota, 'hutang', 'id_pembelian', 'id_supplier')
 
-            id_barang = get_barang_id(nama_barang)
-            if not id_barang:
-                raise Exception(f"Baris {index + 2}: Barang '{nama_barang}' tidak ditemukan")
+        # Import lain yang berbagi barang menunggu sampai transaksi ini selesai
+        _kunci_ledger_barang(cursor, detail['id_barang'])
 
-            # ======================
-            # DATA HEADER
-            # ======================
-            no_nota = row.get('No. Faktur')
-            tanggal = row.get('Tgl Faktur')
-            nama_supplier = row.get('Nama Supplier')
+        # Tipe mengikuti header nota (sama dengan ledger HPP & stok_harian)
+        detail['tipe'] = detail['id_header'].map(dict(zip(nota['id'], nota['tipe'])))
+        barang = detail['tipe'] == 'Barang'
 
-            if pd.isna(no_nota) or pd.isna(tanggal):
+        # ======================
+        # UPDATE LEDGER HPP FIFO
+        # ======================
+        # Detail yang digabung & ongkir (mengubah HPP layer di tanggal yang
+        # sama) harus di-replay
+        hpp_replay = set(detail.loc[~detail['baru'] | ~barang, 'id_barang'].tolist())
+        for id_barang in hpp_replay:
+            _replay_hpp_barang(cursor, id_barang)
+            _refresh_gp_cube(cursor, id_barang)
+
+        baru = detail[detail['baru'] & barang & ~detail['id_barang'].isin(hpp_replay)]
+        for id_barang, grup in baru.groupby('id_barang', sort=False):
+            detail_baru = list(zip(grup['id_detail'].tolist(), grup['tanggal'].tolist(), grup['kuantitas'].tolist()))
+            if _sinkron_hpp_pembelian(cursor, id_barang, detail_baru):
+                _refresh_gp_cube(cursor, id_barang)
+
+        mutasi_stok = {}
+        for id_barang, tanggal, kuantitas in detail.loc[barang, ['id_barang', 'tanggal', 'kuantitas']].itertuples(index=False):
+            _tambah_mutasi_stok(mutasi_stok, id_barang, tanggal, masuk=kuantitas)
+        _catat_stok_harian(cursor, mutasi_stok)
+
+        if registry:
+            _catat_registry_import(cursor, registry)
+
+        # Checkpoint FIFO bulan >= transaksi tertua sudah tidak valid.
+        # Paling akhir: kunci global checkpoint hanya ditahan sampai commit
+        if not nota.empty:
+            _invalidasi_fifo_checkpoint(cursor, nota['tanggal'].min())
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return progres['baris'], 0, []
+
+    except Exception as e:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        errors.extend(e.errors if isinstance(e, ValidasiUploadGagal) else [str(e)])
+        return 0, progres['baris'], errors
+
+# Insert data pembelian per baris (versi lama, 2-6 query per baris Excel)
+# Dipertahankan untuk benchmark/bench_insert_pembelian.py
+def insert_pembelian_loop(df, default_top=None):
+    conn = get_connection()
+    cursor = conn.cursor()
+    success_count = 0
+    errors = []
+
+    try:
+        conn.start_transaction(isolation_level=ISOLASI_LEDGER)
+
+        pembelian_cache = {}
+        hpp_baru = {}        # id_barang -> [(id_detail, tanggal, kuantitas)]
+        hpp_replay = set()    # id_barang yang ledger-nya harus di-replay
+        tanggal_transaksi = []  # untuk invalidasi checkpoint FIFO
+        mutasi_stok = {}      # (id_barang, tanggal) -> [masuk, keluar] untuk stok_harian
+        
+        for index, row in df.iterrows():
+            # ======================
+            # VALIDASI BARANG
+            # ======================
+            nama_barang = row.get('Keterangan Barang')
+            if pd.isna(nama_barang):
+                raise Exception(f"Baris {index + 2}: Nama barang kosong")
+
+            id_barang = get_barang_id(nama_barang)
+            if not id_barang:
+                raise Exception(f"Baris {index + 2}: Barang '{nama_barang}' tidak ditemukan")
+
+            # ======================
+            # DATA HEADER
+            # ======================
+            no_nota = row.get('No. Faktur')
+            tanggal = row.get('Tgl Faktur')
+            nama_supplier = row.get('Nama Supplier')
+
+            if pd.isna(no_nota) or pd.isna(tanggal):
                 raise Exception(f"Baris {index + 2}: No nota atau tanggal kosong")
 
+            tanggal_transaksi.append(pd.to_datetime(tanggal).date())
+
             id_supplier = None
             if not pd.isna(nama_supplier):
                 id_supplier = get_supplier_id(nama_supplier)
@@ -1396,6 +2568,9 @@ def insert_pembelian(df, default_top=None):
                 WHERE id = %s
                 """
                 cursor.execute(query_update, (new_kuantitas, new_subtotal, detail_id))
+                hpp_replay.add(id_barang)
+                if tipe == 'Barang':
+                    _tambah_mutasi_stok(mutasi_stok, id_barang, tanggal, masuk=kuantitas)
                 
                 # Update total pembelian (tambah selisihnya aja)
                 pembelian_cache[no_nota]["total"] += subtotal
@@ -1411,6 +2586,12 @@ def insert_pembelian(df, default_top=None):
                     query_detail,
                     (id_pembelian, id_barang, kuantitas, harga_satuan, subtotal)
                 )
+                if tipe == 'Barang':
+                    hpp_baru.setdefault(id_barang, []).append((cursor.lastrowid, tanggal, kuantitas))
+                    _tambah_mutasi_stok(mutasi_stok, id_barang, tanggal, masuk=kuantitas)
+                else:
+                    # Ongkir mengubah HPP layer di (tanggal, id_barang) yang sama
+                    hpp_replay.add(id_barang)
                 
                 pembelian_cache[no_nota]["total"] += subtotal
 
@@ -1469,6 +2650,24 @@ def insert_pembelian(df, default_top=None):
                             total_pembelian  # sisa = total
                         ))
 
+        # ======================
+        # UPDATE LEDGER HPP FIFO
+        # ======================
+        for id_barang in hpp_replay:
+            _replay_hpp_barang(cursor, id_barang)
+            _refresh_gp_cube(cursor, id_barang)
+
+        for id_barang, detail_baru in hpp_baru.items():
+            if id_barang not in hpp_replay:
+                if _sinkron_hpp_pembelian(cursor, id_barang, detail_baru):
+                    _refresh_gp_cube(cursor, id_barang)
+
+        # Checkpoint FIFO bulan >= transaksi tertua sudah tidak valid
+        if tanggal_transaksi:
+            _invalidasi_fifo_checkpoint(cursor, min(tanggal_transaksi))
+
+        _catat_stok_harian(cursor, mutasi_stok)
+
         conn.commit()
         cursor.close()
         conn.close()
@@ -1519,14 +2718,15 @@ def get_data_pembelian(start_date=None, end_date=None, supplier=None, barang=Non
 
     params = []
 
+    # tanggal bertipe DATE: filter langsung ke kolom agar idx_tanggal terpakai
     if start_date and end_date:
-        query += " AND DATE(p.tanggal) BETWEEN %s AND %s"
+        query += " AND p.tanggal BETWEEN %s AND %s"
         params.extend([start_date, end_date])
     elif start_date:
-        query += " AND DATE(p.tanggal) >= %s"
+        query += " AND p.tanggal >= %s"
         params.append(start_date)
     elif end_date:
-        query += " AND DATE(p.tanggal) <= %s"
+        query += " AND p.tanggal <= %s"
         params.append(end_date)
 
     if supplier and supplier != "Semua":
@@ -1549,6 +2749,31 @@ def delete_pembelian(id_pembelian):
     cursor = conn.cursor()
 
     try:
+        conn.start_transaction(isolation_level=ISOLASI_LEDGER)
+
+        # Barang yang ledger HPP-nya terpengaruh
+        cursor.execute(
+            "SELECT DISTINCT id_barang FROM pembelian_detail WHERE id_pembelian = %s",
+            (int(id_pembelian),)
+        )
+        barang_ids = [row[0] for row in cursor.fetchall()]
+        _kunci_ledger_barang(cursor, barang_ids)
+
+        cursor.execute("SELECT tanggal, tipe FROM pembelian WHERE id = %s", (int(id_pembelian),))
+        header = cursor.fetchone()
+
+        # Stok masuk nota ini ditarik dari stok_harian (hanya tipe Barang)
+        mutasi_stok = {}
+        if header and header[1] == 'Barang':
+            cursor.execute("""
+                SELECT id_barang, SUM(kuantitas)
+                FROM pembelian_detail
+                WHERE id_pembelian = %s
+                GROUP BY id_barang
+            """, (int(id_pembelian),))
+            for id_barang, qty in cursor.fetchall():
+                _tambah_mutasi_stok(mutasi_stok, id_barang, header[0], masuk=-int(qty))
+
         cursor.execute(
             "DELETE FROM pembelian_detail WHERE id_pembelian = %s",
             (int(id_pembelian),)
@@ -1557,6 +2782,16 @@ def delete_pembelian(id_pembelian):
             "DELETE FROM pembelian WHERE id = %s",
             (int(id_pembelian),)
         )
+
+        for id_barang in barang_ids:
+            _replay_hpp_barang(cursor, id_barang)
+            _refresh_gp_cube(cursor, id_barang)
+
+        _catat_stok_harian(cursor, mutasi_stok)
+
+        if header:
+            _invalidasi_fifo_checkpoint(cursor, header[0])
+
         conn.commit()
     finally:
         cursor.close()
@@ -1578,13 +2813,7 @@ def delete_pembelian(id_pembelian):
 # MODUL PEMBAYARAN & ANALISIS (FIXED STRUCTURE)
 # ================================================
 
-def get_outstanding_invoices(jenis, id_partner=None):
-    """
-    Mengambil daftar invoice yang belum lunas (sisa > 0)
-    beserta nama customer/supplier-nya.
-    """
-    conn = get_connection()
-    
+def _sql_outstanding_invoices(jenis, id_partner=None):
     # Tentukan tabel target
     table = "piutang" if jenis == "piutang" else "hutang"
     col_partner_id = "id_customer" if jenis == "piutang" else "id_supplier"
@@ -1611,6 +2840,16 @@ def get_outstanding_invoices(jenis, id_partner=None):
         params.append(id_partner)
         
     query += " ORDER BY t.due_date ASC"
+    return query, params
+
+def get_outstanding_invoices(jenis, id_partner=None):
+    """
+    Mengambil daftar invoice yang belum lunas (sisa > 0)
+    beserta nama customer/supplier-nya.
+    """
+    conn = get_connection()
+    
+    query, params = _sql_outstanding_invoices(jenis, id_partner)
     
     df = pd.read_sql(query, conn, params=params)
     conn.close()
@@ -1733,7 +2972,8 @@ def get_analisis_summary(jenis):
 def create_piutang_from_penjualan(id_penjualan, no_nota, tanggal, id_customer, total, top):
     """
     Membuat record piutang otomatis dari transaksi penjualan.
-    Dipanggil otomatis saat insert_penjualan jika TOP > 0.
+    Memakai _buat_tagihan_bulk (generator tagihan yang sama dengan
+    insert_penjualan) untuk 1 nota; piutang yang sudah ada dilewati.
     
     Args:
         id_penjualan: ID dari tabel penjualan
@@ -1747,39 +2987,14 @@ def create_piutang_from_penjualan(id_penjualan, no_nota, tanggal, id_customer, t
     cursor = conn.cursor()
     
     try:
-        # Hitung due_date berdasarkan TOP
-        due_date = tanggal + timedelta(days=int(top))
-        
-        # Cek apakah piutang sudah ada (untuk prevent duplikasi)
-        cursor.execute("""
-            SELECT id FROM piutang 
-            WHERE id_penjualan = %s
-            LIMIT 1
-        """, (id_penjualan,))
-        
-        existing = cursor.fetchone()
-        
-        if not existing:
-            # Insert piutang baru
-            query = """
-                INSERT INTO piutang 
-                (id_penjualan, no_nota, tanggal, due_date, id_customer, total, terbayar, sisa, status, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s, 0, %s, 'BELUM_LUNAS', CURDATE(), CURDATE())
-            """
-            cursor.execute(query, (
-                id_penjualan, 
-                no_nota, 
-                tanggal, 
-                due_date, 
-                id_customer, 
-                total, 
-                total  # sisa = total pada awalnya
-            ))
-            
-            conn.commit()
-            return True, "Piutang berhasil dibuat"
-        else:
-            return True, "Piutang sudah ada"
+        nota = pd.DataFrame([{
+            'id': id_penjualan, 'no_nota': no_nota, 'tanggal': tanggal,
+            'id_partner': id_customer, 'top': top, 'total': total
+        }])
+        if not _buat_tagihan_bulk(cursor, nota, 'piutang', 'id_penjualan', 'id_customer'):
+            return True, "TOP 0, piutang tidak dibuat"
+        conn.commit()
+        return True, "Piutang berhasil dibuat"
             
     except Exception as e:
         conn.rollback()
@@ -1955,7 +3170,7 @@ def insert_pembayaran_hutang(id_hutang, bukti_penerimaan, tanggal_bayar, jumlah,
 
 @st.cache_data(ttl=300)
 def get_pembelian_data(start_date=None, end_date=None):
-    """Mengambil data pembelian detail"""
+    """Mengambil data pembelian detail (harga_satuan & subtotal dalam sen)"""
     conn = get_connection()
     query = """
     SELECT 
@@ -1965,8 +3180,8 @@ def get_pembelian_data(start_date=None, end_date=None):
         pd.id_barang,
         b.nama as nama_barang,
         pd.kuantitas,
-        pd.harga_satuan,
-        pd.subtotal,
+        CAST(ROUND(pd.harga_satuan * 100) AS SIGNED) as harga_satuan,
+        CAST(ROUND(pd.subtotal * 100) AS SIGNED) as subtotal,
         p.tipe
     FROM pembelian_detail pd
     JOIN pembelian p ON pd.id_pembelian = p.id
@@ -1984,7 +3199,7 @@ def get_pembelian_data(start_date=None, end_date=None):
 
 @st.cache_data(ttl=300)
 def get_penjualan_data(start_date=None, end_date=None):
-    """Mengambil data penjualan detail"""
+    """Mengambil data penjualan detail (harga_satuan & subtotal dalam sen)"""
     conn = get_connection()
     query = """
     SELECT 
@@ -1994,8 +3209,8 @@ def get_penjualan_data(start_date=None, end_date=None):
         pd.id_barang,
         b.nama as nama_barang,
         pd.kuantitas,
-        pd.harga_satuan,
-        pd.subtotal
+        CAST(ROUND(pd.harga_satuan * 100) AS SIGNED) as harga_satuan,
+        CAST(ROUND(pd.subtotal * 100) AS SIGNED) as subtotal
     FROM penjualan_detail pd
     JOIN penjualan p ON pd.id_penjualan = p.id
     JOIN barang b ON pd.id_barang = b.id
@@ -2010,6 +3225,81 @@ def get_penjualan_data(start_date=None, end_date=None):
     conn.close()
     return df
 
+def _query_landed_cost(cursor, start_date=None, end_date=None, id_barang=None):
+    """
+    Layer pembelian tipe Barang dengan HPP per unit (landed cost) dihitung
+    di SQL: semua baris Ongkir di (tanggal, id_barang) yang sama dijumlahkan
+    lalu ditambahkan ke subtotal barang sebelum dibagi qty.
+
+    Returns:
+        DataFrame kolom: id, tanggal, no_nota, id_barang, kuantitas,
+        subtotal, ongkir, harga_per_unit, qty_sisa (urut FIFO)
+    """
+    filter_beli = ""
+    filter_ongkir = ""
+    params_ongkir = []
+    params_beli = []
+
+    if start_date and end_date:
+        filter_ongkir += " AND p2.tanggal BETWEEN %s AND %s"
+        filter_beli += " AND p.tanggal BETWEEN %s AND %s"
+        params_ongkir += [start_date, end_date]
+        params_beli += [start_date, end_date]
+
+    if id_barang is not None:
+        filter_ongkir += " AND pd2.id_barang = %s"
+        filter_beli += " AND pd.id_barang = %s"
+        params_ongkir.append(int(id_barang))
+        params_beli.append(int(id_barang))
+
+    cursor.execute(f"""
+        SELECT
+            pd.id,
+            p.tanggal,
+            p.no_nota,
+            pd.id_barang,
+            pd.kuantitas,
+            pd.subtotal,
+            COALESCE(o.ongkir, 0) AS ongkir,
+            CASE WHEN pd.kuantitas > 0
+                THEN (pd.subtotal + COALESCE(o.ongkir, 0)) / pd.kuantitas
+                ELSE 0
+            END AS harga_per_unit,
+            pd.qty_sisa
+        FROM pembelian_detail pd
+        JOIN pembelian p ON pd.id_pembelian = p.id
+        LEFT JOIN (
+            SELECT p2.tanggal, pd2.id_barang, SUM(pd2.subtotal) AS ongkir
+            FROM pembelian_detail pd2
+            JOIN pembelian p2 ON pd2.id_pembelian = p2.id
+            WHERE p2.tipe = 'Ongkir' {filter_ongkir}
+            GROUP BY p2.tanggal, pd2.id_barang
+        ) o ON o.tanggal = p.tanggal AND o.id_barang = pd.id_barang
+        WHERE p.tipe = 'Barang' {filter_beli}
+        ORDER BY p.tanggal, pd.id
+    """, params_ongkir + params_beli)
+
+    layer = pd.DataFrame(cursor.fetchall(), columns=[
+        'id', 'tanggal', 'no_nota', 'id_barang', 'kuantitas',
+        'subtotal', 'ongkir', 'harga_per_unit', 'qty_sisa'
+    ])
+    for col in ['kuantitas', 'subtotal', 'ongkir', 'harga_per_unit']:
+        layer[col] = layer[col].astype(float)
+
+    return layer
+
+@st.cache_data(ttl=300)
+def get_landed_cost_pembelian(start_date=None, end_date=None, id_barang=None):
+    """Landed cost (harga + ongkir) per layer pembelian, lihat _query_landed_cost"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        return _query_landed_cost(cursor, start_date, end_date, id_barang)
+    finally:
+        cursor.close()
+        conn.close()
+
 @st.cache_data(ttl=300)
 def get_barang_list_simple():
     """Mengambil list nama barang saja untuk filter"""
@@ -2019,13 +3309,17 @@ def get_barang_list_simple():
     conn.close()
     return df
 
-def calculate_gross_profit_fifo(pembelian_df, penjualan_df):
+def calculate_gross_profit_fifo_loop(pembelian_df, penjualan_df):
     """
-    Menghitung gross profit menggunakan metode FIFO
-    
+    Menghitung gross profit menggunakan metode FIFO (versi loop per baris)
+
+    Disimpan sebagai referensi & pembanding benchmark untuk
+    calculate_gross_profit_fifo (versi vectorized).
+
     PERBAIKAN:
     - Ongkir dikaitkan dengan barang berdasarkan (tanggal, id_barang)
     - HPP = (Harga Barang + Ongkir Spesifik) / Qty
+    - Beberapa baris ongkir di (tanggal, id_barang) yang sama dijumlahkan
     """
     results = []
     
@@ -2037,7 +3331,7 @@ def calculate_gross_profit_fifo(pembelian_df, penjualan_df):
     
     for _, ongkir_row in ongkir_rows.iterrows():
         key = (ongkir_row['tanggal'], ongkir_row['id_barang'])
-        ongkir_map[key] = float(ongkir_row['subtotal'])
+        ongkir_map[key] = ongkir_map.get(key, 0) + float(ongkir_row['subtotal'])
     
     # STEP 2: Proses setiap barang
     barang_ids = penjualan_df['id_barang'].unique()
@@ -2130,161 +3424,617 @@ def calculate_gross_profit_fifo(pembelian_df, penjualan_df):
     
     return pd.DataFrame(results)
 
+KOLOM_GROSS_PROFIT = [
+    'id_barang', 'nama_barang', 'total_penjualan', 'total_hpp',
+    'gross_profit', 'margin_persen', 'qty_terjual'
+]
+
+def _hitung_layer_pembelian(pembelian_df):
+    """
+    Ambil layer pembelian tipe Barang beserta HPP per unit (harga + ongkir).
+    Ongkir dikaitkan berdasarkan (tanggal, id_barang), sama seperti versi loop
+    dan get_landed_cost_pembelian (beberapa baris ongkir dijumlahkan).
+    Urutan baris pembelian dipertahankan.
+    """
+    barang_rows = pembelian_df[pembelian_df['tipe'] == 'Barang']
+    ongkir_rows = pembelian_df[pembelian_df['tipe'] == 'Ongkir']
+
+    ongkir_map = (
+        ongkir_rows.groupby(['tanggal', 'id_barang'], sort=False)['subtotal']
+        .sum()
+        .astype(float)
+    )
+    key = pd.MultiIndex.from_arrays([barang_rows['tanggal'], barang_rows['id_barang']])
+    ongkir_total = ongkir_map.reindex(key).fillna(0).to_numpy()
+
+    qty = barang_rows['kuantitas'].astype(float).to_numpy()
+    total_cost = barang_rows['subtotal'].astype(float).to_numpy() + ongkir_total
+    unit_cost = np.divide(total_cost, qty, out=np.zeros_like(total_cost), where=qty > 0)
+
+    return pd.DataFrame({
+        'id': barang_rows['id'].to_numpy(),
+        'tanggal': barang_rows['tanggal'].to_numpy(),
+        'no_nota': barang_rows['no_nota'].to_numpy(),
+        'id_barang': barang_rows['id_barang'].to_numpy(),
+        'kuantitas': qty,
+        'harga_per_unit': unit_cost
+    })
+
+def _biaya_kumulatif(qty_kum, biaya_kum, unit_cost, posisi):
+    """Biaya total dari unit pertama sampai unit ke-`posisi` pada kurva FIFO"""
+    k = np.searchsorted(qty_kum, posisi, side='right') - 1
+    k = np.clip(k, 0, len(unit_cost) - 1)
+    return biaya_kum[k] + (posisi - qty_kum[k]) * unit_cost[k]
+
+def _fifo_hpp_per_baris(beli_barang, beli_qty, beli_unit, jual_barang, jual_qty):
+    """
+    Alokasi HPP FIFO per baris penjualan dengan aritmetika interval.
+
+    Penjualan ke-i suatu barang memakai unit pembelian pada interval
+    [qty terjual kumulatif sebelum i, qty terjual kumulatif sampai i).
+    HPP-nya = biaya kumulatif di ujung interval - biaya kumulatif di awal
+    interval (cumsum + searchsorted). Unit yang melebihi total pembelian
+    tidak punya HPP, sama seperti versi loop.
+
+    Urutan baris di dalam tiap barang dianggap urutan transaksi.
+    Mengembalikan array HPP yang sejajar dengan jual_qty.
+    """
+    jual_barang = np.asarray(jual_barang)
+    hpp = np.zeros(len(jual_barang))
+    if len(beli_barang) == 0 or len(jual_barang) == 0:
+        return hpp
+
+    # Layer pembelian dikelompokkan per barang (stable → urutan FIFO tetap)
+    urut_beli = np.argsort(beli_barang, kind='stable')
+    beli_barang = np.asarray(beli_barang)[urut_beli]
+    beli_qty = np.clip(np.asarray(beli_qty, dtype=float)[urut_beli], 0, None)
+    beli_unit = np.asarray(beli_unit, dtype=float)[urut_beli]
+
+    # Kurva biaya kumulatif seluruh layer
+    qty_kum = np.concatenate(([0.0], np.cumsum(beli_qty)))
+    biaya_kum = np.concatenate(([0.0], np.cumsum(beli_qty * beli_unit)))
+
+    barang_ids, awal = np.unique(beli_barang, return_index=True)
+    akhir = np.append(awal[1:], len(beli_barang))
+
+    # Penjualan dikelompokkan per barang dengan cara yang sama
+    urut_jual = np.argsort(jual_barang, kind='stable')
+    jb = jual_barang[urut_jual]
+    jq = np.clip(np.asarray(jual_qty, dtype=float)[urut_jual], 0, None)
+
+    pos = np.minimum(np.searchsorted(barang_ids, jb), len(barang_ids) - 1)
+    ada_pembelian = barang_ids[pos] == jb
+
+    # Qty terjual kumulatif di dalam tiap barang
+    kum = np.cumsum(jq)
+    _, awal_jual = np.unique(jb, return_index=True)
+    ukuran_grup = np.diff(np.append(awal_jual, len(jb)))
+    kum_grup = kum - np.repeat((kum - jq)[awal_jual], ukuran_grup)
+
+    # Geser ke posisi barang di kurva global & batasi ke total pembelian barang
+    basis = qty_kum[awal[pos]]
+    batas = qty_kum[akhir[pos]]
+    x_akhir = np.minimum(basis + kum_grup, batas)
+    x_awal = np.minimum(basis + kum_grup - jq, batas)
+
+    hasil = (
+        _biaya_kumulatif(qty_kum, biaya_kum, beli_unit, x_akhir)
+        - _biaya_kumulatif(qty_kum, biaya_kum, beli_unit, x_awal)
+    )
+    hpp[urut_jual] = np.where(ada_pembelian, hasil, 0.0)
+    return hpp
+
+def _fifo_alokasi_pasangan(beli_qty, jual_qty):
+    """
+    Pasangan alokasi FIFO untuk 1 barang: interval unit tiap penjualan
+    dipotong dengan interval unit tiap layer pembelian (urutan sesuai array).
+
+    Returns:
+        Tuple (idx_jual, idx_beli, qty, qty_kurang)
+        - idx_jual, idx_beli, qty : 1 baris per potongan (penjualan, layer)
+        - qty_kurang : qty tiap penjualan yang tidak kebagian stok
+    """
+    beli_qty = np.clip(np.asarray(beli_qty, dtype=np.int64), 0, None)
+    jual_qty = np.clip(np.asarray(jual_qty, dtype=np.int64), 0, None)
+
+    qty_kum = np.concatenate(([0], np.cumsum(beli_qty)))
+    total_beli = qty_kum[-1]
+
+    jual_akhir = np.minimum(np.cumsum(jual_qty), total_beli)
+    jual_awal = np.minimum(np.cumsum(jual_qty) - jual_qty, total_beli)
+    qty_kurang = jual_qty - (jual_akhir - jual_awal)
+
+    # Layer pertama & terakhir yang tersentuh tiap penjualan
+    k_awal = np.searchsorted(qty_kum, jual_awal, side='right') - 1
+    k_akhir = np.searchsorted(qty_kum, jual_akhir, side='left') - 1
+    jumlah = np.where(jual_akhir > jual_awal, k_akhir - k_awal + 1, 0)
 
+    idx_jual = np.repeat(np.arange(len(jual_qty)), jumlah)
+    offset = np.arange(jumlah.sum()) - np.repeat(np.cumsum(jumlah) - jumlah, jumlah)
+    idx_beli = np.repeat(k_awal, jumlah) + offset
 
+    qty = (
+        np.minimum(jual_akhir[idx_jual], qty_kum[idx_beli + 1])
+        - np.maximum(jual_awal[idx_jual], qty_kum[idx_beli])
+    )
+    ada = qty > 0
+
+    return idx_jual[ada], idx_beli[ada], qty[ada], qty_kurang
+
+def _pisah_saldo_awal(saldo_awal):
+    """
+    Pisahkan saldo checkpoint FIFO (lihat get_fifo_window_data) menjadi:
+    - layer : layer pembelian yang masih terbuka (format _hitung_layer_pembelian)
+    - backlog : DataFrame (id_barang, kuantitas) penjualan lama yang melebihi
+                pembelian dan akan "memakan" layer berikutnya lebih dulu
+    """
+    if saldo_awal is None or saldo_awal.empty:
+        return (
+            pd.DataFrame(columns=['id', 'tanggal', 'no_nota', 'id_barang', 'kuantitas', 'harga_per_unit']),
+            pd.DataFrame(columns=['id_barang', 'kuantitas'])
+        )
+
+    is_layer = saldo_awal['id_pembelian_detail'].notna()
+    buka = saldo_awal[is_layer]
+    backlog = saldo_awal[~is_layer]
+
+    layer = pd.DataFrame({
+        'id': buka['id_pembelian_detail'].to_numpy(),
+        'tanggal': None,
+        'no_nota': buka['no_nota'].to_numpy(),
+        'id_barang': buka['id_barang'].to_numpy(),
+        'kuantitas': buka['qty_sisa'].astype(float).to_numpy(),
+        'harga_per_unit': buka['unit_cost'].astype(float).to_numpy()
+    })
+    backlog = pd.DataFrame({
+        'id_barang': backlog['id_barang'].to_numpy(),
+        'kuantitas': backlog['qty_sisa'].astype(float).to_numpy()
+    })
+    return layer, backlog
+
+def calculate_gross_profit_fifo(pembelian_df, penjualan_df, saldo_awal=None, start_date=None):
+    """
+    Menghitung gross profit menggunakan metode FIFO (vectorized)
+
+    Hasil sama dengan calculate_gross_profit_fifo_loop, tapi data cukup
+    dikelompokkan 1x per id_barang dan HPP dihitung dengan
+    _fifo_hpp_per_baris (tanpa iterrows & pop(0)).
+
+    Args opsional (dipakai get_gross_profit_periode):
+        saldo_awal: saldo checkpoint FIFO; layer terbuka dipakai lebih dulu
+                    sebelum layer di pembelian_df
+        start_date: penjualan sebelum tanggal ini hanya menggeser antrian
+                    FIFO dan tidak ikut dihitung
+    """
+    if penjualan_df.empty:
+        return pd.DataFrame(columns=KOLOM_GROSS_PROFIT)
+
+    saldo_layer, backlog = _pisah_saldo_awal(saldo_awal)
+    layer = _hitung_layer_pembelian(pembelian_df)
+    if not saldo_layer.empty:
+        layer = pd.concat([saldo_layer, layer], ignore_index=True)
+
+    if layer.empty:
+        return pd.DataFrame(columns=KOLOM_GROSS_PROFIT)
+
+    jual_qty = penjualan_df['kuantitas'].astype(float).to_numpy()
+
+    # Backlog diletakkan di depan penjualan barang yang sama (urutan FIFO)
+    hpp = _fifo_hpp_per_baris(
+        layer['id_barang'].to_numpy(),
+        layer['kuantitas'].to_numpy(),
+        layer['harga_per_unit'].to_numpy(),
+        np.concatenate((backlog['id_barang'].to_numpy(), penjualan_df['id_barang'].to_numpy())),
+        np.concatenate((backlog['kuantitas'].to_numpy(dtype=float), jual_qty))
+    )
+    hpp = hpp[len(backlog):]
+
+    return _ringkas_gross_profit(penjualan_df, hpp, layer['id_barang'], start_date)
+
+def _ringkas_gross_profit(penjualan_df, hpp, barang_dibeli, start_date=None):
+    """
+    Ringkas HPP per baris penjualan menjadi gross profit per barang
+    (kolom KOLOM_GROSS_PROFIT). Dipakai semua metode HPP.
+
+    barang_dibeli: id_barang yang punya pembelian tipe Barang; barang lain
+    dilewati, sama seperti versi loop.
+    """
+    jual_qty = penjualan_df['kuantitas'].astype(float).to_numpy()
+    harga_jual = penjualan_df['harga_satuan'].astype(float).to_numpy()
+
+    detail = pd.DataFrame({
+        'id_barang': penjualan_df['id_barang'].to_numpy(),
+        'nama_barang': penjualan_df['nama_barang'].to_numpy(),
+        'penjualan': jual_qty * harga_jual,
+        'hpp': hpp,
+        'kuantitas': penjualan_df['kuantitas'].to_numpy()
+    })
+
+    if start_date is not None:
+        detail = detail[
+            (pd.to_datetime(penjualan_df['tanggal']) >= pd.Timestamp(start_date)).to_numpy()
+        ]
+
+    detail = detail[detail['id_barang'].isin(barang_dibeli)]
+    if detail.empty:
+        return pd.DataFrame(columns=KOLOM_GROSS_PROFIT)
+
+    result = detail.groupby('id_barang', sort=False).agg(
+        nama_barang=('nama_barang', 'first'),
+        total_penjualan=('penjualan', 'sum'),
+        total_hpp=('hpp', 'sum'),
+        qty_terjual=('kuantitas', 'sum')
+    ).reset_index()
+
+    result['gross_profit'] = result['total_penjualan'] - result['total_hpp']
+    result['margin_persen'] = np.where(
+        result['total_penjualan'] > 0,
+        result['gross_profit'] / result['total_penjualan'].where(result['total_penjualan'] > 0, 1) * 100,
+        0
+    )
+
+    return result[KOLOM_GROSS_PROFIT]
 
 # ================================================
-# 2. FUNGSI GENERATE KARTU STOK FIFO (NEW)
+# METODE HPP (FIFO, MOVING AVERAGE, LIFO)
 # ================================================
+# Setiap metode adalah fungsi (layer, jual) -> array HPP per baris penjualan:
+# - layer : hasil _hitung_layer_pembelian (urut FIFO)
+# - jual  : penjualan_df (id_barang, tanggal, kuantitas), urut transaksi
+# Hasil akhirnya diringkas dengan _ringkas_gross_profit, jadi semua metode
+# punya kolom yang sama.
+#
+# Moving Average & LIFO memakai urutan waktu per barang (pembelian lebih
+# dulu dari penjualan di tanggal yang sama). Unit yang terjual saat stok
+# kosong tidak punya HPP.
+
+def _hpp_fifo(layer, jual):
+    """FIFO: sama seperti calculate_gross_profit_fifo"""
+    return _fifo_hpp_per_baris(
+        layer['id_barang'].to_numpy(),
+        layer['kuantitas'].to_numpy(),
+        layer['harga_per_unit'].to_numpy(),
+        jual['id_barang'].to_numpy(),
+        jual['kuantitas'].astype(float).to_numpy()
+    )
 
-def generate_kartu_stok_fifo(barang_id, pembelian_df, penjualan_df):
+def _urutkan_mutasi(layer, jual):
     """
-    Generate kartu stok FIFO untuk 1 barang tertentu
-    Menampilkan setiap transaksi penjualan dengan:
-    - Qty terjual
-    - Harga jual per pcs
-    - HPP per pcs (FIFO)
-    - Gross Profit per transaksi
-    
-    Args:
-        barang_id: ID barang yang ingin dilihat
-        pembelian_df: DataFrame pembelian (sudah termasuk perhitungan ongkir)
-        penjualan_df: DataFrame penjualan
-    
+    Gabungkan layer pembelian & penjualan menjadi 1 timeline per barang.
+
+    Stok dihitung dengan cumsum per barang yang "dipantulkan" di 0
+    (stok - min(0, cummin stok)), jadi penjualan saat stok kosong tidak
+    membuat stok negatif.
+
     Returns:
-        DataFrame dengan kolom: tanggal, no_nota, qty, harga_jual, hpp_avg, subtotal, 
-                                total_hpp, gross_profit, margin_persen, hpp_breakdown
+        dict berisi array sejajar timeline: idx (posisi di layer/jual),
+        is_jual, qty, unit, stok_sebelum, stok_sesudah, awal_barang
     """
-    
-    # Filter data untuk barang ini
-    pembelian_barang = pembelian_df[
-        (pembelian_df['id_barang'] == barang_id) & 
-        (pembelian_df['tipe'] == 'Barang')
-    ].copy().sort_values('tanggal')
-    
+    n_beli = len(layer)
+    barang = np.concatenate((layer['id_barang'].to_numpy(), jual['id_barang'].to_numpy()))
+    tanggal = np.concatenate((
+        pd.to_datetime(layer['tanggal']).to_numpy(),
+        pd.to_datetime(jual['tanggal']).to_numpy()
+    )).astype('datetime64[D]')
+    is_jual = np.concatenate((np.zeros(n_beli, dtype=bool), np.ones(len(jual), dtype=bool)))
+    idx = np.concatenate((np.arange(n_beli), np.arange(len(jual))))
+    qty = np.clip(np.concatenate((
+        layer['kuantitas'].to_numpy(dtype=float),
+        jual['kuantitas'].astype(float).to_numpy()
+    )), 0, None)
+    unit = np.concatenate((layer['harga_per_unit'].to_numpy(dtype=float), np.zeros(len(jual))))
+
+    urut = np.lexsort((idx, is_jual, tanggal, barang))
+    barang, is_jual, idx, qty, unit = barang[urut], is_jual[urut], idx[urut], qty[urut], unit[urut]
+
+    awal_barang = np.ones(len(barang), dtype=bool)
+    awal_barang[1:] = barang[1:] != barang[:-1]
+    grup = np.cumsum(awal_barang) - 1
+    ukuran_grup = np.bincount(grup)
+
+    delta = np.where(is_jual, -qty, qty)
+    kum = np.cumsum(delta)
+    kum = kum - np.repeat((kum - delta)[awal_barang], ukuran_grup)
+    min_kum = pd.Series(kum).groupby(grup).cummin().to_numpy()
+
+    stok_sesudah = kum - np.minimum(min_kum, 0)
+    stok_sebelum = np.concatenate(([0.0], stok_sesudah[:-1]))
+    stok_sebelum[awal_barang] = 0
+
+    return {
+        'idx': idx,
+        'is_jual': is_jual,
+        'qty': qty,
+        'unit': unit,
+        'stok_sebelum': stok_sebelum,
+        'stok_sesudah': stok_sesudah,
+        'awal_barang': awal_barang
+    }
+
+def _scan_affine(a, b):
+    """
+    Hitung x[i] = a[i] * x[i-1] + b[i] (x[-1] = 0) secara vectorized
+    dengan prefix scan (log2(n) langkah numpy, tanpa loop per baris).
+    """
+    a = np.array(a, dtype=float)
+    b = np.array(b, dtype=float)
+    langkah = 1
+    while langkah < len(a):
+        b[langkah:] = a[langkah:] * b[:-langkah] + b[langkah:]
+        a[langkah:] = a[langkah:] * a[:-langkah]
+        langkah *= 2
+    return b
+
+def _hpp_moving_average(layer, jual):
+    """
+    Moving average perpetual: setiap pembelian mengubah rata-rata
+    (stok lama x rata-rata lama + qty baru x harga baru) / stok baru,
+    penjualan memakai rata-rata saat itu.
+
+    Rekurensi rata-rata = bobot_lama x rata-rata sebelumnya + bobot_baru x
+    harga, dihitung sekaligus dengan _scan_affine.
+    """
+    m = _urutkan_mutasi(layer, jual)
+    beli = ~m['is_jual']
+
+    stok_baru = m['stok_sebelum'] + m['qty']
+    bobot_lama = np.divide(
+        m['stok_sebelum'], stok_baru,
+        out=np.ones_like(stok_baru), where=beli & (stok_baru > 0)
+    )
+
+    # Penjualan tidak mengubah rata-rata; awal tiap barang mulai dari 0
+    a = np.where(beli, bobot_lama, 1.0)
+    a[m['awal_barang']] = 0.0
+    b = np.where(beli, (1 - bobot_lama) * m['unit'], 0.0)
+    rata_rata = _scan_affine(a, b)
+
+    hpp = np.zeros(len(jual))
+    terjual = (m['stok_sebelum'] - m['stok_sesudah']) * rata_rata
+    hpp[m['idx'][m['is_jual']]] = terjual[m['is_jual']]
+    return hpp
+
+def _hpp_lifo(layer, jual):
+    """
+    LIFO perpetual: penjualan mengambil layer pembelian terbaru yang
+    masih ada saat itu.
+
+    Timeline disusun vectorized (_urutkan_mutasi); pemakaian layer
+    memakai stack karena LIFO perpetual tidak punya bentuk kumulatif
+    seperti FIFO. Tiap layer paling banyak 1x masuk & 1x keluar stack,
+    jadi tetap O(n).
+    """
+    m = _urutkan_mutasi(layer, jual)
+    hpp = np.zeros(len(jual))
+    stack = []  # [qty_sisa, harga_per_unit]
+
+    for awal, is_jual, idx, qty, unit in zip(
+        m['awal_barang'].tolist(), m['is_jual'].tolist(),
+        m['idx'].tolist(), m['qty'].tolist(), m['unit'].tolist()
+    ):
+        if awal:
+            stack = []
+
+        if not is_jual:
+            if qty > 0:
+                stack.append([qty, unit])
+            continue
+
+        sisa = qty
+        total = 0.0
+        while sisa > 0 and stack:
+            terbaru = stack[-1]
+            ambil = min(terbaru[0], sisa)
+            total += ambil * terbaru[1]
+            terbaru[0] -= ambil
+            sisa -= ambil
+            if terbaru[0] <= 0:
+                stack.pop()
+
+        hpp[idx] = total
+
+    return hpp
+
+# Metode HPP yang bisa dipilih di halaman Gross Profit
+METODE_HPP = {
+    'FIFO': _hpp_fifo,
+    'Moving Average': _hpp_moving_average,
+    'LIFO': _hpp_lifo
+}
+
+def calculate_gross_profit(pembelian_df, penjualan_df, metode='FIFO', start_date=None):
+    """
+    Menghitung gross profit per barang dengan metode HPP pilihan
+    (lihat METODE_HPP). Kolom hasil sama dengan calculate_gross_profit_fifo.
+
+    start_date (opsional): penjualan sebelum tanggal ini hanya dipakai
+    untuk menghitung stok/biaya, tidak ikut dihitung.
+    """
+    if metode not in METODE_HPP:
+        raise Exception(f"Metode HPP '{metode}' tidak dikenal")
+
+    if penjualan_df.empty:
+        return pd.DataFrame(columns=KOLOM_GROSS_PROFIT)
+
+    layer = _hitung_layer_pembelian(pembelian_df)
+    if layer.empty:
+        return pd.DataFrame(columns=KOLOM_GROSS_PROFIT)
+
+    hpp = METODE_HPP[metode](layer, penjualan_df)
+    return _ringkas_gross_profit(penjualan_df, hpp, layer['id_barang'], start_date)
+
+
+
+
+# ================================================
+# 2. FUNGSI GENERATE KARTU STOK FIFO (NEW)
+# ================================================
+
+def iter_kartu_stok_fifo(barang_id, pembelian_df, penjualan_df, saldo_awal=None, start_date=None):
+    """
+    Generator kartu stok FIFO untuk 1 barang (1 baris per penjualan).
+
+    Layer pembelian disimpan ringkas di deque [no_nota, hpp_per_unit, qty_sisa]
+    dan dipakai langsung tanpa copy per penjualan, jadi total kerja O(n).
+    Setiap baris membawa hpp_detail berupa list tuple
+    (nota_beli, qty, hpp_per_unit); teks breakdown dibuat terpisah lewat
+    format_hpp_breakdown hanya untuk baris yang ditampilkan.
+
+    saldo_awal & start_date sama seperti di calculate_gross_profit_fifo:
+    antrian dimulai dari checkpoint dan penjualan sebelum start_date
+    hanya menggeser antrian (tidak di-yield).
+    """
+    saldo_layer, backlog = _pisah_saldo_awal(saldo_awal)
+    saldo_layer = saldo_layer[saldo_layer['id_barang'] == barang_id]
+    backlog_qty = float(backlog.loc[backlog['id_barang'] == barang_id, 'kuantitas'].sum())
+
+    layer = _hitung_layer_pembelian(
+        pembelian_df[pembelian_df['id_barang'] == barang_id]
+    ).sort_values('tanggal', kind='stable')
+
     penjualan_barang = penjualan_df[
         penjualan_df['id_barang'] == barang_id
-    ].copy().sort_values('tanggal')
-    
-    if pembelian_barang.empty or penjualan_barang.empty:
-        return pd.DataFrame()
-    
-    # STEP 1: Mapping ongkir untuk perhitungan HPP
-    ongkir_map = {}
-    ongkir_rows = pembelian_df[
-        (pembelian_df['id_barang'] == barang_id) & 
-        (pembelian_df['tipe'] == 'Ongkir')
-    ]
-    
-    for _, ongkir_row in ongkir_rows.iterrows():
-        key = (ongkir_row['tanggal'], ongkir_row['id_barang'])
-        ongkir_map[key] = float(ongkir_row['subtotal'])
-    
-    # STEP 2: Hitung HPP per unit untuk setiap pembelian (termasuk ongkir)
-    purchase_queue = []
-    
-    for _, row in pembelian_barang.iterrows():
-        tanggal = row['tanggal']
-        qty = float(row['kuantitas'])
-        harga_barang = float(row['subtotal'])
-        
-        # Cari ongkir spesifik
-        key = (tanggal, barang_id)
-        ongkir_total = ongkir_map.get(key, 0)
-        
-        # Total cost = harga barang + ongkir
-        total_cost = harga_barang + ongkir_total
-        unit_cost = total_cost / qty if qty > 0 else 0
-        
-        purchase_queue.append({
-            'tanggal': tanggal,
-            'no_nota': row['no_nota'],
-            'kuantitas': qty,
-            'harga_per_unit': unit_cost,
-            'kuantitas_sisa': qty
-        })
-    
-    # STEP 3: Proses setiap transaksi penjualan dengan FIFO
-    kartu_stok = []
-    
-    for _, penjualan in penjualan_barang.iterrows():
-        tanggal_jual = penjualan['tanggal']
-        no_nota = penjualan['no_nota']
-        qty_terjual = float(penjualan['kuantitas'])
-        harga_jual = float(penjualan['harga_satuan'])
-        subtotal_jual = float(penjualan['subtotal'])
-        
+    ].sort_values('tanggal', kind='stable')
+
+    if (layer.empty and saldo_layer.empty) or penjualan_barang.empty:
+        return
+
+    # Layer checkpoint dengan sisa 0 hanya penanda barang pernah dibeli
+    saldo_layer = saldo_layer[saldo_layer['kuantitas'] > 0]
+
+    purchase_queue = deque(
+        [no_nota, harga_per_unit, qty]
+        for no_nota, harga_per_unit, qty in zip(
+            list(saldo_layer['no_nota']) + list(layer['no_nota']),
+            list(saldo_layer['harga_per_unit']) + list(layer['harga_per_unit']),
+            list(saldo_layer['kuantitas']) + list(layer['kuantitas'])
+        )
+    )
+
+    # Backlog checkpoint memakai layer paling awal lebih dulu
+    while backlog_qty > 0 and purchase_queue:
+        qty_ambil = min(purchase_queue[0][2], backlog_qty)
+        purchase_queue[0][2] -= qty_ambil
+        backlog_qty -= qty_ambil
+        if purchase_queue[0][2] <= 0:
+            purchase_queue.popleft()
+
+    batas_awal = pd.Timestamp(start_date) if start_date is not None else None
+
+    for tanggal_jual, no_nota, qty_terjual, harga_jual, subtotal_jual in zip(
+        penjualan_barang['tanggal'],
+        penjualan_barang['no_nota'],
+        penjualan_barang['kuantitas'].astype(float),
+        penjualan_barang['harga_satuan'].astype(float),
+        penjualan_barang['subtotal'].astype(float)
+    ):
         # Alokasi HPP menggunakan FIFO
         qty_remaining = qty_terjual
         total_hpp_transaksi = 0
-        hpp_details = []  # Untuk tracking dari mana HPP diambil
-        
-        # Buat copy queue untuk transaksi ini
-        temp_queue = [p.copy() for p in purchase_queue]
-        
-        while qty_remaining > 0 and temp_queue:
-            oldest_purchase = temp_queue[0]
-            
-            if oldest_purchase['kuantitas_sisa'] >= qty_remaining:
-                # Pembelian ini cukup untuk memenuhi penjualan
-                hpp = qty_remaining * oldest_purchase['harga_per_unit']
-                total_hpp_transaksi += hpp
-                
-                hpp_details.append({
-                    'nota_beli': oldest_purchase['no_nota'],
-                    'qty': qty_remaining,
-                    'hpp_per_unit': oldest_purchase['harga_per_unit']
-                })
-                
-                oldest_purchase['kuantitas_sisa'] -= qty_remaining
-                qty_remaining = 0
-                
-                if oldest_purchase['kuantitas_sisa'] == 0:
-                    temp_queue.pop(0)
-            else:
-                # Pembelian ini tidak cukup, ambil semua
-                hpp = oldest_purchase['kuantitas_sisa'] * oldest_purchase['harga_per_unit']
-                total_hpp_transaksi += hpp
-                
-                hpp_details.append({
-                    'nota_beli': oldest_purchase['no_nota'],
-                    'qty': oldest_purchase['kuantitas_sisa'],
-                    'hpp_per_unit': oldest_purchase['harga_per_unit']
-                })
-                
-                qty_remaining -= oldest_purchase['kuantitas_sisa']
-                temp_queue.pop(0)
-        
-        # Update purchase_queue asli dengan yang sudah dipakai
-        purchase_queue = temp_queue
-        
-        # Hitung gross profit untuk transaksi ini
+        hpp_details = []
+
+        while qty_remaining > 0 and purchase_queue:
+            oldest_purchase = purchase_queue[0]
+            qty_ambil = min(oldest_purchase[2], qty_remaining)
+
+            total_hpp_transaksi += qty_ambil * oldest_purchase[1]
+            hpp_details.append((oldest_purchase[0], qty_ambil, oldest_purchase[1]))
+
+            oldest_purchase[2] -= qty_ambil
+            qty_remaining -= qty_ambil
+
+            if oldest_purchase[2] <= 0:
+                purchase_queue.popleft()
+
+        if batas_awal is not None and pd.Timestamp(tanggal_jual) < batas_awal:
+            continue
+
         gross_profit = subtotal_jual - total_hpp_transaksi
-        margin_persen = (gross_profit / subtotal_jual * 100) if subtotal_jual > 0 else 0
-        
-        # HPP rata-rata per unit untuk transaksi ini
-        hpp_avg_per_unit = total_hpp_transaksi / qty_terjual if qty_terjual > 0 else 0
-        
-        # Format HPP details untuk tooltip/info
-        hpp_breakdown = " + ".join([
-            f"{d['qty']:.0f} pcs @ Rp {d['hpp_per_unit']:,.0f} ({d['nota_beli']})"
-            for d in hpp_details
-        ])
-        
-        kartu_stok.append({
+
+        yield {
             'tanggal': tanggal_jual,
             'no_nota': no_nota,
             'qty': qty_terjual,
             'harga_jual': harga_jual,
-            'hpp_avg': hpp_avg_per_unit,
+            'hpp_avg': total_hpp_transaksi / qty_terjual if qty_terjual > 0 else 0,
             'subtotal': subtotal_jual,
             'total_hpp': total_hpp_transaksi,
             'gross_profit': gross_profit,
-            'margin_persen': margin_persen,
-            'hpp_breakdown': hpp_breakdown  # Detail dari mana HPP diambil
-        })
-    
-    return pd.DataFrame(kartu_stok)
+            'margin_persen': (gross_profit / subtotal_jual * 100) if subtotal_jual > 0 else 0,
+            'hpp_detail': hpp_details
+        }
+
+def format_hpp_breakdown(hpp_detail, sen=False):
+    """Format hpp_detail dari iter_kartu_stok_fifo untuk tooltip/info"""
+    return " + ".join([
+        f"{qty:.0f} pcs @ Rp {(dari_sen(hpp_per_unit) if sen else hpp_per_unit):,.0f} ({nota_beli})"
+        for nota_beli, qty, hpp_per_unit in hpp_detail
+    ])
+
+def count_kartu_stok_fifo(barang_id, pembelian_df, penjualan_df, saldo_awal=None, start_date=None):
+    """Jumlah baris kartu stok FIFO 1 barang (tanpa menghitung FIFO)"""
+    saldo_layer, _ = _pisah_saldo_awal(saldo_awal)
+    ada_pembelian = (
+        (saldo_layer['id_barang'] == barang_id).any() or
+        ((pembelian_df['id_barang'] == barang_id) & (pembelian_df['tipe'] == 'Barang')).any()
+    )
+
+    if not ada_pembelian:
+        return 0
+
+    baris = penjualan_df['id_barang'] == barang_id
+    if start_date is not None:
+        baris &= pd.to_datetime(penjualan_df['tanggal']) >= pd.Timestamp(start_date)
+
+    return int(baris.sum())
+
+def get_kartu_stok_page(barang_id, pembelian_df, penjualan_df, offset=0, limit=50,
+                        saldo_awal=None, start_date=None, sen=False):
+    """
+    Ambil 1 halaman kartu stok FIFO.
+    Baris sebelum offset tetap dilewati generator (state FIFO) tapi tidak
+    disimpan, dan hpp_breakdown hanya diformat untuk baris di halaman ini.
+
+    sen=True jika data berasal dari loader (uang dalam sen); kolom uang
+    hasil dikonversi ke rupiah.
+    """
+    rows = list(islice(
+        iter_kartu_stok_fifo(barang_id, pembelian_df, penjualan_df, saldo_awal, start_date),
+        offset,
+        offset + limit
+    ))
+
+    for row in rows:
+        row['hpp_breakdown'] = format_hpp_breakdown(row.pop('hpp_detail'), sen)
+        if sen:
+            for col in ['harga_jual', 'hpp_avg', 'subtotal', 'total_hpp', 'gross_profit']:
+                row[col] = dari_sen(row[col])
+
+    return pd.DataFrame(rows)
+
+def generate_kartu_stok_fifo(barang_id, pembelian_df, penjualan_df):
+    """
+    Generate kartu stok FIFO untuk 1 barang tertentu
+    Menampilkan setiap transaksi penjualan dengan:
+    - Qty terjual
+    - Harga jual per pcs
+    - HPP per pcs (FIFO)
+    - Gross Profit per transaksi
+    
+    Args:
+        barang_id: ID barang yang ingin dilihat
+        pembelian_df: DataFrame pembelian (sudah termasuk perhitungan ongkir)
+        penjualan_df: DataFrame penjualan
+    
+    Returns:
+        DataFrame dengan kolom: tanggal, no_nota, qty, harga_jual, hpp_avg, subtotal, 
+                                total_hpp, gross_profit, margin_persen, hpp_breakdown
+    """
+    return get_kartu_stok_page(
+        barang_id, pembelian_df, penjualan_df,
+        offset=0,
+        limit=len(penjualan_df)
+    )
 
 
 
@@ -2293,34 +4043,1187 @@ def generate_kartu_stok_fifo(barang_id, pembelian_df, penjualan_df):
 
 
 # ================================================
-# DATA KARTU STOK
+# LEDGER HPP FIFO (hpp_allocation)
 # ================================================
+# Alokasi FIFO disimpan permanen: 1 baris per potongan
+# (penjualan_detail, pembelian_detail). Sisa tiap layer pembelian
+# disimpan di pembelian_detail.qty_sisa. Penjualan yang melebihi stok
+# dicatat dengan id_pembelian_detail NULL & unit_cost 0.
+#
+# Ledger di-update di dalam transaksi insert/delete penjualan & pembelian.
+# Untuk data lama, jalankan rebuild_hpp_allocation() sekali
+# (lihat tools/rebuild_hpp_allocation.py).
+#
+# Import bisa berjalan bersamaan (worker import_job), jadi setiap transaksi
+# yang menulis ledger barang mengunci barangnya dulu di ledger_barang_lock
+# (migrasi 0009, _kunci_ledger_barang) dan berjalan READ COMMITTED: setelah
+# kunci didapat, qty_sisa & alokasi yang dibaca sudah termasuk hasil
+# transaksi lain yang commit lebih dulu, bukan snapshot awal transaksi.
+
+ISOLASI_LEDGER = 'READ COMMITTED'
+
+def _kunci_ledger_barang(cursor, id_barangs=None):
+    """
+    Kunci ledger barang `id_barangs` (None = semua barang) sampai commit /
+    rollback. Baris ledger_barang_lock di-upsert urut id_barang, jadi 2
+    transaksi yang berbagi barang saling menunggu tanpa deadlock.
+    Panggil sebelum membaca ledger barang tsb.
+    """
+    if id_barangs is None:
+        cursor.execute("""
+            INSERT INTO ledger_barang_lock (id_barang)
+            SELECT id FROM barang ORDER BY id
+            ON DUPLICATE KEY UPDATE id_barang = ledger_barang_lock.id_barang
+        """)
+        return
+
+    _executemany_batch(cursor, """
+        INSERT INTO ledger_barang_lock (id_barang) VALUES (%s)
+        ON DUPLICATE KEY UPDATE id_barang = id_barang
+    """, [(id_barang,) for id_barang in sorted({int(i) for i in id_barangs})])
+
+def _get_layer_pembelian_barang(cursor, id_barang):
+    """Layer pembelian 1 barang (urut FIFO) beserta HPP per unit & qty_sisa"""
+    return _query_landed_cost(cursor, id_barang=id_barang)
+
+def _simpan_alokasi_hpp(cursor, id_barang, jual_df, layer, layer_qty):
+    """
+    Alokasikan jual_df (id, tanggal, kuantitas; urut FIFO) ke layer
+    dengan kapasitas layer_qty, lalu simpan ke hpp_allocation.
+    Mengembalikan qty terpakai per layer.
+    """
+    idx_jual, idx_beli, qty, qty_kurang = _fifo_alokasi_pasangan(
+        layer_qty, jual_df['kuantitas'].to_numpy()
+    )
 
-def get_stok_awal_barang(id_barang, start_date):
-    """Menghitung stok sebelum tanggal mulai (Start Date)"""
+    rows = list(zip(
+        jual_df['id'].to_numpy()[idx_jual].tolist(),
+        layer['id'].to_numpy()[idx_beli].tolist(),
+        [int(id_barang)] * len(qty),
+        jual_df['tanggal'].to_numpy()[idx_jual].tolist(),
+        qty.tolist(),
+        layer['harga_per_unit'].to_numpy()[idx_beli].round(6).tolist()
+    ))
+
+    # Penjualan melebihi stok → HPP 0 (sama seperti perhitungan FIFO)
+    kurang = qty_kurang > 0
+    rows += list(zip(
+        jual_df['id'].to_numpy()[kurang].tolist(),
+        [None] * int(kurang.sum()),
+        [int(id_barang)] * int(kurang.sum()),
+        jual_df['tanggal'].to_numpy()[kurang].tolist(),
+        qty_kurang[kurang].tolist(),
+        [0] * int(kurang.sum())
+    ))
+
+    if rows:
+        cursor.executemany("""
+            INSERT INTO hpp_allocation
+            (id_penjualan_detail, id_pembelian_detail, id_barang, tanggal, qty, unit_cost)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, rows)
+
+    return np.bincount(idx_beli, weights=qty, minlength=len(layer)).astype(np.int64)
+
+def _replay_hpp_barang(cursor, id_barang):
+    """
+    Hitung ulang seluruh alokasi HPP FIFO 1 barang.
+    Dipakai untuk transaksi backdate, merge detail, ongkir & delete.
+    """
+    _kunci_ledger_barang(cursor, [id_barang])
+    layer = _get_layer_pembelian_barang(cursor, id_barang)
+
+    cursor.execute("""
+        SELECT pd.id, p.tanggal, pd.kuantitas
+        FROM penjualan_detail pd
+        JOIN penjualan p ON pd.id_penjualan = p.id
+        WHERE pd.id_barang = %s
+        ORDER BY p.tanggal, pd.id
+    """, (int(id_barang),))
+    jual_df = pd.DataFrame(cursor.fetchall(), columns=['id', 'tanggal', 'kuantitas'])
+
+    cursor.execute("DELETE FROM hpp_allocation WHERE id_barang = %s", (int(id_barang),))
+
+    layer_qty = layer['kuantitas'].to_numpy().astype(np.int64)
+    terpakai = _simpan_alokasi_hpp(cursor, id_barang, jual_df, layer, layer_qty)
+
+    cursor.execute("UPDATE pembelian_detail SET qty_sisa = 0 WHERE id_barang = %s", (int(id_barang),))
+    sisa = layer_qty - terpakai
+    ada_sisa = sisa > 0
+    if ada_sisa.any():
+        cursor.executemany(
+            "UPDATE pembelian_detail SET qty_sisa = %s WHERE id = %s",
+            list(zip(sisa[ada_sisa].tolist(), layer['id'].to_numpy()[ada_sisa].tolist()))
+        )
+
+def _sinkron_hpp_penjualan(cursor, id_barang, detail_baru):
+    """
+    Update ledger setelah penjualan_detail baru masuk.
+
+    detail_baru: list of (id_penjualan_detail, tanggal, kuantitas).
+    Jika semua tanggalnya >= penjualan terakhir barang ini, penjualan cukup
+    diambil dari layer yang masih punya qty_sisa (tanpa replay).
+    Selain itu (backdate) barang di-replay penuh.
+    Mengembalikan True jika barang di-replay penuh.
+    """
+    _kunci_ledger_barang(cursor, [id_barang])
+    jual_df = pd.DataFrame(detail_baru, columns=['id', 'tanggal', 'kuantitas'])
+    jual_df['tanggal'] = pd.to_datetime(jual_df['tanggal']).dt.date
+
+    cursor.execute(
+        "SELECT MAX(tanggal) FROM hpp_allocation WHERE id_barang = %s",
+        (int(id_barang),)
+    )
+    tanggal_terakhir = cursor.fetchone()[0]
+
+    if tanggal_terakhir is not None and jual_df['tanggal'].min() < tanggal_terakhir:
+        _replay_hpp_barang(cursor, id_barang)
+        return True
+
+    jual_df = jual_df.sort_values(['tanggal', 'id'], kind='stable')
+    layer = _get_layer_pembelian_barang(cursor, id_barang)
+    layer_qty = layer['qty_sisa'].to_numpy().astype(np.int64)
+    terpakai = _simpan_alokasi_hpp(cursor, id_barang, jual_df, layer, layer_qty)
+
+    dipakai = terpakai > 0
+    if dipakai.any():
+        cursor.executemany(
+            "UPDATE pembelian_detail SET qty_sisa = qty_sisa - %s WHERE id = %s",
+            list(zip(terpakai[dipakai].tolist(), layer['id'].to_numpy()[dipakai].tolist()))
+        )
+
+    return False
+
+def _sinkron_hpp_pembelian(cursor, id_barang, detail_baru):
+    """
+    Update ledger setelah pembelian_detail baru (tipe Barang) masuk.
+
+    detail_baru: list of (id_pembelian_detail, tanggal, kuantitas).
+    Layer baru yang tanggalnya >= layer terakhir dan tidak ada penjualan
+    yang kekurangan stok cukup di-set qty_sisa = kuantitas.
+    Selain itu barang di-replay penuh.
+    Mengembalikan True jika barang di-replay penuh.
+    """
+    _kunci_ledger_barang(cursor, [id_barang])
+    baru_df = pd.DataFrame(detail_baru, columns=['id', 'tanggal', 'kuantitas'])
+    baru_df['tanggal'] = pd.to_datetime(baru_df['tanggal']).dt.date
+
+    cursor.execute("""
+        SELECT MAX(p.tanggal)
+        FROM pembelian_detail pd
+        JOIN pembelian p ON pd.id_pembelian = p.id
+        WHERE pd.id_barang = %s AND p.tipe = 'Barang' AND pd.id NOT IN ({})
+    """.format(", ".join(["%s"] * len(baru_df))), (int(id_barang), *baru_df['id'].tolist()))
+    tanggal_terakhir = cursor.fetchone()[0]
+
+    cursor.execute("""
+        SELECT COUNT(*) FROM hpp_allocation
+        WHERE id_barang = %s AND id_pembelian_detail IS NULL
+    """, (int(id_barang),))
+    ada_kurang = cursor.fetchone()[0] > 0
+
+    if ada_kurang or (tanggal_terakhir is not None and baru_df['tanggal'].min() < tanggal_terakhir):
+        _replay_hpp_barang(cursor, id_barang)
+        return True
+
+    cursor.executemany(
+        "UPDATE pembelian_detail SET qty_sisa = kuantitas WHERE id = %s",
+        [(int(i),) for i in baru_df['id']]
+    )
+    return False
+
+def rebuild_hpp_allocation(id_barang=None, progress_callback=None):
+    """
+    Bangun ulang ledger hpp_allocation (beserta gp_cube) dari data mentah
+    (backfill). 1 transaksi per barang agar tidak mengunci tabel terlalu lama.
+
+    Args:
+        id_barang: Rebuild 1 barang saja. None = semua barang.
+        progress_callback: fungsi (selesai, total) opsional untuk progress
+
+    Returns:
+        Tuple (jumlah_barang, errors)
+    """
     conn = get_connection()
     cursor = conn.cursor()
-    
-    query = """
-        SELECT COALESCE(SUM(masuk) - SUM(keluar), 0) as stok_awal
+    errors = []
+
+    try:
+        if id_barang is None:
+            cursor.execute("""
+                SELECT id_barang FROM pembelian_detail
+                UNION
+                SELECT id_barang FROM penjualan_detail
+            """)
+            barang_ids = [row[0] for row in cursor.fetchall()]
+        else:
+            barang_ids = [int(id_barang)]
+        conn.commit()
+
+        for i, bid in enumerate(barang_ids, start=1):
+            try:
+                # Tiap barang 1 transaksi (dikunci di _replay_hpp_barang)
+                conn.start_transaction(isolation_level=ISOLASI_LEDGER)
+                _replay_hpp_barang(cursor, bid)
+                _refresh_gp_cube(cursor, bid)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                errors.append(f"Barang {bid}: {str(e)}")
+
+            if progress_callback:
+                progress_callback(i, len(barang_ids))
+
+        return len(barang_ids), errors
+
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_gross_profit_ledger(start_date=None, end_date=None):
+    """
+    Gross profit per barang langsung dari ledger hpp_allocation.
+    Kolom hasil sama dengan calculate_gross_profit_fifo.
+
+    HPP diambil dari alokasi FIFO seluruh histori, jadi stok yang dibeli
+    sebelum start_date tetap ikut terhitung.
+
+    Barang tanpa pembelian tipe Barang (s/d end_date) dilewati, sama seperti
+    calculate_gross_profit_fifo & calculate_gross_profit (MA/LIFO): alokasinya
+    hanya baris kekurangan stok tanpa layer, jadi HPP-nya akan terbaca 0.
+    """
+    conn = get_connection()
+
+    filter_jual = ""
+    filter_alokasi = ""
+    filter_beli = ""
+    params = []
+
+    if start_date and end_date:
+        filter_jual = " AND p.tanggal BETWEEN %s AND %s"
+        filter_alokasi = " AND a.tanggal BETWEEN %s AND %s"
+        filter_beli = " AND pb.tanggal <= %s"
+        params = [start_date, end_date, start_date, end_date, end_date]
+
+    query = f"""
+        SELECT
+            x.id_barang,
+            b.nama AS nama_barang,
+            SUM(x.penjualan) AS total_penjualan,
+            SUM(x.hpp) AS total_hpp,
+            SUM(x.qty) AS qty_terjual
         FROM (
-            -- Barang Masuk dari Pembelian
-            SELECT pd.kuantitas as masuk, 0 as keluar
-            FROM pembelian_detail pd
-            JOIN pembelian p ON pd.id_pembelian = p.id
-            WHERE pd.id_barang = %s AND p.tipe = 'Barang' AND p.tanggal < %s
-            
+            -- Penjualan
+            SELECT pd.id_barang, pd.kuantitas * pd.harga_satuan AS penjualan, 0 AS hpp, pd.kuantitas AS qty
+            FROM penjualan_detail pd
+            JOIN penjualan p ON pd.id_penjualan = p.id
+            WHERE 1=1 {filter_jual}
+
             UNION ALL
-            
-            -- Barang Keluar dari Penjualan
-            SELECT 0 as masuk, pjd.kuantitas as keluar
-            FROM penjualan_detail pjd
-            JOIN penjualan pj ON pjd.id_penjualan = pj.id
-            WHERE pjd.id_barang = %s AND pj.tanggal < %s
-        ) as riwayat_awal
+
+            -- HPP dari ledger FIFO
+            SELECT a.id_barang, 0 AS penjualan, a.qty * a.unit_cost AS hpp, 0 AS qty
+            FROM hpp_allocation a
+            WHERE 1=1 {filter_alokasi}
+        ) x
+        JOIN barang b ON x.id_barang = b.id
+        JOIN (
+            -- Hanya barang yang punya layer pembelian
+            SELECT DISTINCT pbd.id_barang
+            FROM pembelian_detail pbd
+            JOIN pembelian pb ON pbd.id_pembelian = pb.id
+            WHERE pb.tipe = 'Barang' {filter_beli}
+        ) dibeli ON dibeli.id_barang = x.id_barang
+        GROUP BY x.id_barang, b.nama
+        ORDER BY b.nama
+    """
+
+    df = pd.read_sql(query, conn, params=params)
+    conn.close()
+
+    if df.empty:
+        return pd.DataFrame(columns=KOLOM_GROSS_PROFIT)
+
+    for col in ['total_penjualan', 'total_hpp']:
+        df[col] = df[col].astype(float)
+
+    df['gross_profit'] = df['total_penjualan'] - df['total_hpp']
+    df['margin_persen'] = np.where(
+        df['total_penjualan'] > 0,
+        df['gross_profit'] / df['total_penjualan'].where(df['total_penjualan'] > 0, 1) * 100,
+        0
+    )
+
+    return df[KOLOM_GROSS_PROFIT]
+
+
+
+
+
+
+
+# ================================================
+# CUBE GROSS PROFIT (gp_cube)
+# ================================================
+# Ringkasan gross profit per (barang, customer, bulan) dari ledger
+# hpp_allocation. Di-refresh per barang setiap ledger berubah
+# (insert/delete penjualan & pembelian, rebuild), jadi drill-down per
+# customer/bulan cukup membaca tabel kecil ini tanpa replay FIFO.
+
+KOLOM_GP_CUBE = {
+    'barang': ['id_barang', 'nama_barang'],
+    'customer': ['id_customer', 'nama_customer'],
+    'bulan': ['bulan']
+}
+
+def _awal_bulan(tanggal):
+    """Tanggal 1 dari bulan `tanggal`"""
+    return pd.Timestamp(tanggal).replace(day=1).date()
+
+def _refresh_gp_cube(cursor, id_barang=None, sejak=None):
+    """
+    Hitung ulang baris cube 1 barang (None = semua barang).
+    sejak: hanya bulan >= bulan dari tanggal ini (penjualan baru yang
+    tidak menggeser alokasi lama).
+    """
+    filter_hapus = ""
+    filter_ledger = ""
+    filter_jual = ""
+    params_hapus = []
+    params_ledger = []
+    params_jual = []
+
+    if id_barang is not None:
+        filter_hapus += " AND id_barang = %s"
+        filter_ledger += " AND id_barang = %s"
+        filter_jual += " AND pd.id_barang = %s"
+        params_hapus.append(int(id_barang))
+        params_ledger.append(int(id_barang))
+        params_jual.append(int(id_barang))
+
+    if sejak is not None:
+        bulan_awal = _awal_bulan(sejak)
+        filter_hapus += " AND bulan >= %s"
+        filter_ledger += " AND tanggal >= %s"
+        filter_jual += " AND p.tanggal >= %s"
+        params_hapus.append(bulan_awal)
+        params_ledger.append(bulan_awal)
+        params_jual.append(bulan_awal)
+
+    cursor.execute(f"DELETE FROM gp_cube WHERE 1=1 {filter_hapus}", params_hapus)
+
+    cursor.execute(f"""
+        INSERT INTO gp_cube (id_barang, id_customer, bulan, total_penjualan, total_hpp, qty)
+        SELECT
+            pd.id_barang,
+            p.id_customer,
+            DATE_SUB(p.tanggal, INTERVAL DAYOFMONTH(p.tanggal) - 1 DAY) AS bulan,
+            SUM(pd.kuantitas * pd.harga_satuan),
+            SUM(COALESCE(a.hpp, 0)),
+            SUM(pd.kuantitas)
+        FROM penjualan_detail pd
+        JOIN penjualan p ON pd.id_penjualan = p.id
+        LEFT JOIN (
+            SELECT id_penjualan_detail, SUM(qty * unit_cost) AS hpp
+            FROM hpp_allocation
+            WHERE 1=1 {filter_ledger}
+            GROUP BY id_penjualan_detail
+        ) a ON a.id_penjualan_detail = pd.id
+        WHERE 1=1 {filter_jual}
+        GROUP BY pd.id_barang, p.id_customer, bulan
+    """, params_ledger + params_jual)
+
+def rebuild_gp_cube():
+    """Bangun ulang seluruh gp_cube dari ledger hpp_allocation"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        conn.start_transaction(isolation_level=ISOLASI_LEDGER)
+        _kunci_ledger_barang(cursor)
+        _refresh_gp_cube(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+@st.cache_data(ttl=300)
+def get_gross_profit_cube(start_date=None, end_date=None, group_by=('barang',)):
+    """
+    Gross profit dari gp_cube, dikelompokkan per kombinasi
+    'barang', 'customer' dan/atau 'bulan'.
+
+    Filter tanggal dibulatkan ke bulan penuh (bulan start_date s/d
+    bulan end_date) karena cube disimpan per bulan.
+    """
+    kolom = []
+    for dimensi in group_by:
+        if dimensi not in KOLOM_GP_CUBE:
+            raise Exception(f"Dimensi cube '{dimensi}' tidak dikenal")
+        kolom += KOLOM_GP_CUBE[dimensi]
+
+    pilih = {
+        'id_barang': "g.id_barang",
+        'nama_barang': "b.nama AS nama_barang",
+        'id_customer': "g.id_customer",
+        'nama_customer': "COALESCE(c.nama, '-') AS nama_customer",
+        'bulan': "g.bulan"
+    }
+    grup = {
+        'id_barang': "g.id_barang",
+        'nama_barang': "b.nama",
+        'id_customer': "g.id_customer",
+        'nama_customer': "c.nama",
+        'bulan': "g.bulan"
+    }
+
+    query = f"""
+        SELECT
+            {", ".join(pilih[k] for k in kolom)},
+            SUM(g.total_penjualan) AS total_penjualan,
+            SUM(g.total_hpp) AS total_hpp,
+            SUM(g.qty) AS qty_terjual
+        FROM gp_cube g
+        JOIN barang b ON g.id_barang = b.id
+        LEFT JOIN customer c ON g.id_customer = c.id
+        WHERE 1=1
+    """
+    params = []
+
+    if start_date and end_date:
+        query += " AND g.bulan BETWEEN %s AND %s"
+        params += [_awal_bulan(start_date), end_date]
+
+    query += f" GROUP BY {', '.join(grup[k] for k in kolom)}"
+    query += f" ORDER BY {', '.join(grup[k] for k in kolom)}"
+
+    conn = get_connection()
+    df = pd.read_sql(query, conn, params=params)
+    conn.close()
+
+    for col in ['total_penjualan', 'total_hpp']:
+        df[col] = df[col].astype(float)
+
+    df['gross_profit'] = df['total_penjualan'] - df['total_hpp']
+    df['margin_persen'] = np.where(
+        df['total_penjualan'] > 0,
+        df['gross_profit'] / df['total_penjualan'].where(df['total_penjualan'] > 0, 1) * 100,
+        0
+    )
+
+    return df
+
+@st.cache_data(ttl=300)
+def get_gross_profit_per_nota(start_date=None, end_date=None, id_customer=None, id_barang=None):
+    """Gross profit per nota penjualan langsung dari ledger (lookup ber-index)"""
+    query = """
+        SELECT
+            p.id,
+            p.no_nota,
+            p.tanggal,
+            COALESCE(c.nama, '-') AS nama_customer,
+            SUM(pd.kuantitas * pd.harga_satuan) AS total_penjualan,
+            SUM(COALESCE(a.hpp, 0)) AS total_hpp,
+            SUM(pd.kuantitas) AS qty_terjual
+        FROM penjualan p
+        JOIN penjualan_detail pd ON pd.id_penjualan = p.id
+        LEFT JOIN customer c ON p.id_customer = c.id
+        LEFT JOIN (
+            SELECT id_penjualan_detail, SUM(qty * unit_cost) AS hpp
+            FROM hpp_allocation
+            GROUP BY id_penjualan_detail
+        ) a ON a.id_penjualan_detail = pd.id
+        WHERE 1=1
+    """
+    params = []
+
+    if start_date and end_date:
+        query += " AND p.tanggal BETWEEN %s AND %s"
+        params += [start_date, end_date]
+
+    if id_customer is not None:
+        query += " AND p.id_customer = %s"
+        params.append(int(id_customer))
+
+    if id_barang is not None:
+        query += " AND pd.id_barang = %s"
+        params.append(int(id_barang))
+
+    query += " GROUP BY p.id, p.no_nota, p.tanggal, c.nama ORDER BY p.tanggal, p.no_nota"
+
+    conn = get_connection()
+    df = pd.read_sql(query, conn, params=params)
+    conn.close()
+
+    for col in ['total_penjualan', 'total_hpp']:
+        df[col] = df[col].astype(float)
+
+    df['gross_profit'] = df['total_penjualan'] - df['total_hpp']
+    df['margin_persen'] = np.where(
+        df['total_penjualan'] > 0,
+        df['gross_profit'] / df['total_penjualan'].where(df['total_penjualan'] > 0, 1) * 100,
+        0
+    )
+
+    return df
+
+
+
+
+
+
+# ================================================
+# CHECKPOINT FIFO BULANAN (fifo_checkpoint)
+# ================================================
+# Snapshot antrian FIFO per barang di setiap akhir bulan:
+# - 1 baris per layer pembelian yang masih terbuka (qty_sisa > 0).
+#   Jika semua layer sudah habis, layer terakhir disimpan dengan
+#   qty_sisa 0 sebagai penanda barang pernah dibeli.
+# - 1 baris backlog (id_pembelian_detail NULL) jika penjualan sampai
+#   akhir bulan melebihi pembelian; backlog ini memakai layer
+#   berikutnya lebih dulu, sama seperti replay penuh.
+#
+# fifo_checkpoint_status mencatat bulan yang checkpoint-nya lengkap.
+# Insert/delete penjualan & pembelian menghapus checkpoint bulan >=
+# tanggal transaksi, dan checkpoint dibangun ulang saat dibutuhkan.
+# Build & invalidasi dikunci pada baris sentinel fifo_checkpoint_lock
+# (_kunci_fifo_checkpoint) sampai transaksinya commit.
+#
+# Kunci ini sengaja global, bukan per barang: status checkpoint
+# (fifo_checkpoint_status) berlaku per bulan untuk semua barang, jadi
+# invalidasi 1 barang tetap membatalkan bulan itu untuk build berikutnya.
+# Biayanya kecil karena invalidasi dipanggil paling akhir sebelum commit
+# (kunci hanya ditahan selama commit), ledger per barang sudah dikunci
+# terpisah (_kunci_ledger_barang), dan build hanya berjalan saat laporan
+# berperiode butuh bulan yang belum punya checkpoint.
+
+KOLOM_CHECKPOINT_FIFO = [
+    'bulan', 'id_barang', 'urutan', 'id_pembelian_detail',
+    'no_nota', 'qty_sisa', 'unit_cost'
+]
+
+def _akhir_bulan_sebelum(tanggal):
+    """Tanggal akhir bulan sebelum bulan dari `tanggal`"""
+    return (pd.Timestamp(tanggal).replace(day=1) - pd.Timedelta(days=1)).date()
+
+def _daftar_akhir_bulan(mulai, sampai):
+    """Semua tanggal akhir bulan dalam rentang (mulai, sampai]"""
+    daftar = []
+    bulan = pd.Timestamp(mulai) + pd.offsets.MonthEnd(1)
+    while bulan <= pd.Timestamp(sampai):
+        daftar.append(bulan.date())
+        bulan += pd.offsets.MonthEnd(1)
+    return daftar
+
+def _hitung_checkpoint_fifo(pembelian_df, penjualan_df, daftar_bulan, saldo_awal=None):
     """
+    Hitung snapshot antrian FIFO per barang di setiap tanggal daftar_bulan.
+
+    pembelian_df & penjualan_df berisi transaksi setelah saldo_awal
+    (urut tanggal). Posisi FIFO tiap akhir bulan cukup dibaca dari
+    qty kumulatif pembelian & penjualan (searchsorted), tanpa replay
+    per transaksi.
+
+    Returns:
+        DataFrame dengan kolom KOLOM_CHECKPOINT_FIFO
+    """
+    saldo_layer, backlog = _pisah_saldo_awal(saldo_awal)
+    layer = _hitung_layer_pembelian(pembelian_df)
+
+    # Saldo awal selalu lebih dulu dari transaksi baru
+    paling_awal = np.datetime64('1900-01-01')
+    layer['tanggal'] = pd.to_datetime(layer['tanggal']).to_numpy().astype('datetime64[D]')
+    saldo_layer['tanggal'] = paling_awal
+    if not saldo_layer.empty:
+        layer = pd.concat([saldo_layer, layer], ignore_index=True)
+
+    jual = pd.DataFrame({
+        'id_barang': penjualan_df['id_barang'].to_numpy(),
+        'tanggal': pd.to_datetime(penjualan_df['tanggal']).to_numpy().astype('datetime64[D]'),
+        'kuantitas': penjualan_df['kuantitas'].astype(float).to_numpy()
+    })
+    if not backlog.empty:
+        backlog['tanggal'] = paling_awal
+        jual = pd.concat([backlog, jual], ignore_index=True)
+
+    bulan_arr = np.array(daftar_bulan, dtype='datetime64[D]')
+    layer_grup = layer.groupby('id_barang', sort=False).indices
+    jual_grup = jual.groupby('id_barang', sort=False).indices
+
+    rows = []
+    for id_barang in list(dict.fromkeys(list(layer_grup) + list(jual_grup))):
+        idx_l = layer_grup.get(id_barang, np.array([], dtype=int))
+        idx_j = jual_grup.get(id_barang, np.array([], dtype=int))
+        lb = layer.iloc[idx_l].sort_values('tanggal', kind='stable')
+        jb = jual.iloc[idx_j].sort_values('tanggal', kind='stable')
+
+        lt = lb['tanggal'].to_numpy().astype('datetime64[D]')
+        jt = jb['tanggal'].to_numpy().astype('datetime64[D]')
+        qty_beli = np.concatenate(([0.0], np.cumsum(np.clip(lb['kuantitas'].to_numpy(dtype=float), 0, None))))
+        qty_jual = np.concatenate(([0.0], np.cumsum(np.clip(jb['kuantitas'].to_numpy(dtype=float), 0, None))))
+        layer_id = lb['id'].to_numpy()
+        layer_nota = lb['no_nota'].to_numpy()
+        layer_unit = lb['harga_per_unit'].to_numpy(dtype=float)
+
+        n_beli = np.searchsorted(lt, bulan_arr, side='right')
+        n_jual = np.searchsorted(jt, bulan_arr, side='right')
+
+        for bulan, nb, nj in zip(daftar_bulan, n_beli, n_jual):
+            total_beli = qty_beli[nb]
+            total_jual = qty_jual[nj]
+            urutan = 0
+
+            if nb > 0:
+                k_awal = max(np.searchsorted(qty_beli, total_jual, side='right') - 1, 0)
+                terbuka = [
+                    (k, qty_beli[k + 1] - max(qty_beli[k], total_jual))
+                    for k in range(k_awal, nb)
+                    if qty_beli[k + 1] - max(qty_beli[k], total_jual) > 0
+                ]
+                if not terbuka:
+                    terbuka = [(nb - 1, 0)]
+
+                for k, sisa in terbuka:
+                    rows.append((bulan, id_barang, urutan, layer_id[k], layer_nota[k], sisa, layer_unit[k]))
+                    urutan += 1
+
+            if total_jual > total_beli:
+                rows.append((bulan, id_barang, urutan, None, None, total_jual - total_beli, 0.0))
+
+    return pd.DataFrame(rows, columns=KOLOM_CHECKPOINT_FIFO)
+
+def _kunci_fifo_checkpoint(cursor):
+    """
+    Kunci baris sentinel fifo_checkpoint_lock sampai commit / rollback.
+    Build checkpoint & semua invalidasi saling menunggu, jadi checkpoint
+    tidak pernah di-commit dari snapshot yang mendahului transaksi
+    bertanggal mundur yang commit lebih dulu.
+    """
+    cursor.execute("SELECT id FROM fifo_checkpoint_lock WHERE id = 1 FOR UPDATE")
+    cursor.fetchall()
+
+def _invalidasi_fifo_checkpoint(cursor, tanggal):
+    """Hapus checkpoint yang mencakup transaksi bertanggal `tanggal`"""
+    _kunci_fifo_checkpoint(cursor)
+    cursor.execute("DELETE FROM fifo_checkpoint_status WHERE bulan >= %s", (tanggal,))
+    cursor.execute("DELETE FROM fifo_checkpoint WHERE bulan >= %s", (tanggal,))
+
+def _get_saldo_checkpoint(cursor, bulan):
+    """Saldo FIFO semua barang pada checkpoint `bulan` (format saldo_awal)"""
+    cursor.execute("""
+        SELECT id_barang, id_pembelian_detail, no_nota, qty_sisa, unit_cost
+        FROM fifo_checkpoint
+        WHERE bulan = %s
+        ORDER BY id_barang, urutan
+    """, (bulan,))
+
+    saldo = pd.DataFrame(
+        cursor.fetchall(),
+        columns=['id_barang', 'id_pembelian_detail', 'no_nota', 'qty_sisa', 'unit_cost']
+    )
+    saldo['qty_sisa'] = saldo['qty_sisa'].astype(float)
+    # Tabel menyimpan rupiah, loader memakai sen
+    saldo['unit_cost'] = saldo['unit_cost'].astype(float) * 100
+    return saldo
+
+def _get_data_fifo_rentang(cursor, sejak=None, sampai=None):
+    """
+    Detail pembelian & penjualan dengan sejak < tanggal <= sampai.
+    Kolom sama dengan get_pembelian_data & get_penjualan_data (uang dalam sen).
+    """
+    filter_tanggal = ""
+    params = []
+    if sejak is not None:
+        filter_tanggal += " AND p.tanggal > %s"
+        params.append(sejak)
+    if sampai is not None:
+        filter_tanggal += " AND p.tanggal <= %s"
+        params.append(sampai)
+
+    cursor.execute(f"""
+        SELECT pd.id, p.tanggal, p.no_nota, pd.id_barang, b.nama, pd.kuantitas,
+               CAST(ROUND(pd.harga_satuan * 100) AS SIGNED), CAST(ROUND(pd.subtotal * 100) AS SIGNED), p.tipe
+        FROM pembelian_detail pd
+        JOIN pembelian p ON pd.id_pembelian = p.id
+        JOIN barang b ON pd.id_barang = b.id
+        WHERE 1=1 {filter_tanggal}
+        ORDER BY p.tanggal, pd.id
+    """, params)
+    pembelian_df = pd.DataFrame(cursor.fetchall(), columns=[
+        'id', 'tanggal', 'no_nota', 'id_barang', 'nama_barang',
+        'kuantitas', 'harga_satuan', 'subtotal', 'tipe'
+    ])
+
+    cursor.execute(f"""
+        SELECT pd.id, p.tanggal, p.no_nota, pd.id_barang, b.nama, pd.kuantitas,
+               CAST(ROUND(pd.harga_satuan * 100) AS SIGNED), CAST(ROUND(pd.subtotal * 100) AS SIGNED)
+        FROM penjualan_detail pd
+        JOIN penjualan p ON pd.id_penjualan = p.id
+        JOIN barang b ON pd.id_barang = b.id
+        WHERE 1=1 {filter_tanggal}
+        ORDER BY p.tanggal, pd.id
+    """, params)
+    penjualan_df = pd.DataFrame(cursor.fetchall(), columns=[
+        'id', 'tanggal', 'no_nota', 'id_barang', 'nama_barang',
+        'kuantitas', 'harga_satuan', 'subtotal'
+    ])
+
+    for df in (pembelian_df, penjualan_df):
+        for col in ['kuantitas', 'harga_satuan', 'subtotal']:
+            df[col] = df[col].astype(np.int64)
+
+    return pembelian_df, penjualan_df
+
+def build_fifo_checkpoint(sampai=None):
+    """
+    Lengkapi checkpoint FIFO sampai akhir bulan terakhir <= `sampai`
+    (default & maksimal: akhir bulan lalu).
+
+    Dimulai dari checkpoint lengkap terakhir, jadi hanya transaksi
+    setelahnya yang dibaca.
+
+    Returns:
+        Jumlah bulan checkpoint yang dibuat
+    """
+    target = _akhir_bulan_sebelum(datetime.now())
+    if sampai is not None:
+        sampai = pd.Timestamp(sampai).date()
+        if (pd.Timestamp(sampai) + pd.Timedelta(days=1)).day != 1:
+            sampai = _akhir_bulan_sebelum(sampai)
+        target = min(target, sampai)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        # Kunci dulu sebelum membaca apa pun: snapshot baru dibuat setelah
+        # import / build lain yang memegang kunci selesai commit
+        conn.start_transaction()
+        _kunci_fifo_checkpoint(cursor)
+
+        # Checkpoint selalu berurutan (invalidasi menghapus semua bulan setelahnya)
+        cursor.execute("SELECT MAX(bulan) FROM fifo_checkpoint_status WHERE bulan <= %s", (target,))
+        terakhir = cursor.fetchone()[0]
+        if terakhir is not None and terakhir >= target:
+            return 0
+
+        if terakhir is None:
+            cursor.execute("""
+                SELECT MIN(tanggal) FROM (
+                    SELECT MIN(tanggal) AS tanggal FROM pembelian
+                    UNION ALL
+                    SELECT MIN(tanggal) AS tanggal FROM penjualan
+                ) t
+            """)
+            transaksi_pertama = cursor.fetchone()[0]
+            if transaksi_pertama is None:
+                return 0
+            daftar_bulan = _daftar_akhir_bulan(_akhir_bulan_sebelum(transaksi_pertama), target)
+            saldo = None
+        else:
+            daftar_bulan = _daftar_akhir_bulan(terakhir, target)
+            saldo = _get_saldo_checkpoint(cursor, terakhir)
+
+        if not daftar_bulan:
+            return 0
+
+        pembelian_df, penjualan_df = _get_data_fifo_rentang(cursor, terakhir, target)
+        checkpoint = _hitung_checkpoint_fifo(pembelian_df, penjualan_df, daftar_bulan, saldo)
+
+        # unit_cost hasil hitung dalam sen, disimpan sebagai rupiah
+        # Baca & tulis dalam 1 transaksi (autocommit mati) agar snapshot konsisten
+        _invalidasi_fifo_checkpoint(cursor, daftar_bulan[0])
+
+        if not checkpoint.empty:
+            cursor.executemany("""
+                INSERT INTO fifo_checkpoint
+                (bulan, id_barang, urutan, id_pembelian_detail, no_nota, qty_sisa, unit_cost)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, [
+                (bulan, int(id_barang), int(urutan),
+                 None if pd.isna(id_detail) else int(id_detail),
+                 None if pd.isna(no_nota) else str(no_nota),
+                 int(round(qty_sisa)), round(dari_sen(unit_cost), 6))
+                for bulan, id_barang, urutan, id_detail, no_nota, qty_sisa, unit_cost
+                in checkpoint.itertuples(index=False)
+            ])
+
+        cursor.executemany(
+            "INSERT INTO fifo_checkpoint_status (bulan) VALUES (%s)",
+            [(bulan,) for bulan in daftar_bulan]
+        )
+
+        conn.commit()
+        return len(daftar_bulan)
+
+    except mysql.connector.IntegrityError as e:
+        conn.rollback()
+        # Bulan yang sama sudah dibangun sesi lain
+        if e.errno == 1062:
+            return 0
+        raise
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        cursor.close()
+        conn.close()
+
+@st.cache_data(ttl=300)
+def get_fifo_window_data(start_date=None, end_date=None):
+    """
+    Data FIFO untuk periode start_date s/d end_date, dimulai dari
+    checkpoint akhir bulan terdekat sebelum start_date.
+
+    Returns:
+        Tuple (saldo_awal, pembelian_df, penjualan_df)
+        - saldo_awal : saldo checkpoint (None jika tidak ada checkpoint)
+        - pembelian_df, penjualan_df : transaksi setelah checkpoint s/d end_date
+          (penjualan sebelum start_date tetap ikut untuk menggeser antrian)
+    """
+    bulan = None
+    if start_date:
+        build_fifo_checkpoint(_akhir_bulan_sebelum(start_date))
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        saldo = None
+        if start_date:
+            cursor.execute(
+                "SELECT MAX(bulan) FROM fifo_checkpoint_status WHERE bulan < %s",
+                (start_date,)
+            )
+            bulan = cursor.fetchone()[0]
+            if bulan is not None:
+                saldo = _get_saldo_checkpoint(cursor, bulan)
+
+        pembelian_df, penjualan_df = _get_data_fifo_rentang(cursor, bulan, end_date)
+        return saldo, pembelian_df, penjualan_df
+
+    finally:
+        cursor.close()
+        conn.close()
+
+def _rupiahkan_gross_profit(result):
+    """Kolom uang hasil calculate_gross_profit* dari sen ke rupiah"""
+    for col in ['total_penjualan', 'total_hpp', 'gross_profit']:
+        result[col] = dari_sen(result[col])
+    return result
+
+def get_gross_profit_periode(start_date=None, end_date=None):
+    """
+    Gross profit FIFO per barang untuk 1 periode, dihitung ulang dari
+    checkpoint bulanan (hanya transaksi sejak checkpoint yang di-replay).
+    Kolom hasil sama dengan calculate_gross_profit_fifo (dalam rupiah).
+    """
+    saldo_awal, pembelian_df, penjualan_df = get_fifo_window_data(start_date, end_date)
+    return _rupiahkan_gross_profit(calculate_gross_profit_fifo(
+        pembelian_df, penjualan_df,
+        saldo_awal=saldo_awal,
+        start_date=start_date
+    ))
+
+@st.cache_data(ttl=300)
+def get_gross_profit_metode(metode='FIFO', start_date=None, end_date=None):
+    """
+    Gross profit per barang dengan metode HPP pilihan (METODE_HPP).
+    FIFO dengan periode dihitung dari checkpoint bulanan terdekat sebelum
+    start_date (get_gross_profit_periode), tanpa periode dari ledger
+    hpp_allocation; metode lain dihitung dari seluruh histori s/d end_date
+    agar stok sebelum start_date ikut terhitung.
+    """
+    if metode == 'FIFO':
+        if start_date:
+            return get_gross_profit_periode(start_date, end_date)
+        return get_gross_profit_ledger(start_date, end_date)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        pembelian_df, penjualan_df = _get_data_fifo_rentang(cursor, None, end_date)
+    finally:
+        cursor.close()
+        conn.close()
+
+    return _rupiahkan_gross_profit(
+        calculate_gross_profit(pembelian_df, penjualan_df, metode, start_date)
+    )
+
+
+
+
+
+
+# ================================================
+# STOK HARIAN (stok_harian)
+# ================================================
+# 1 baris per (id_barang, tanggal) yang punya mutasi: masuk/keluar hari itu
+# plus total_masuk, total_keluar & saldo kumulatif s/d tanggal tsb.
+# Stok per tanggal cukup 1 lookup baris terakhir <= tanggal (primary key).
+# Di-update oleh insert/delete penjualan & pembelian, bisa di-rebuild &
+# dicek ulang dengan tools/rebuild_stok_harian.py.
+# Baris barang dibaca & ditulis ulang hanya setelah barangnya dikunci
+# (_kunci_ledger_barang, transaksi READ COMMITTED), jadi import yang
+# berjalan bersamaan tidak saling menimpa mutasi dari snapshot lama.
+
+KOLOM_STOK_HARIAN = [
+    'id_barang', 'tanggal', 'masuk', 'keluar',
+    'total_masuk', 'total_keluar', 'saldo'
+]
+
+def _tambah_mutasi_stok(mutasi, id_barang, tanggal, masuk=0, keluar=0):
+    """Akumulasi mutasi stok per (id_barang, tanggal) sebelum ditulis"""
+    key = (int(id_barang), pd.to_datetime(tanggal).date())
+    total = mutasi.setdefault(key, [0, 0])
+    total[0] += int(masuk)
+    total[1] += int(keluar)
+
+def _tulis_ulang_stok_harian(cursor, id_barang, mutasi_barang):
+    """
+    Terapkan banyak tanggal mutasi 1 barang sekaligus: baris stok_harian
+    sejak tanggal mutasi tertua dihitung ulang di pandas lalu ditulis ulang
+    (4 query per barang, berapapun jumlah tanggalnya).
+    mutasi_barang: dict tanggal -> [masuk, keluar]
+    """
+    sejak = min(mutasi_barang)
+
+    cursor.execute("""
+        SELECT total_masuk, total_keluar
+        FROM stok_harian
+        WHERE id_barang = %s AND tanggal < %s
+        ORDER BY tanggal DESC
+        LIMIT 1
+    """, (id_barang, sejak))
+    sebelum = cursor.fetchone() or (0, 0)
+
+    cursor.execute("""
+        SELECT tanggal, masuk, keluar
+        FROM stok_harian
+        WHERE id_barang = %s AND tanggal >= %s
+    """, (id_barang, sejak))
+    lama = pd.DataFrame(cursor.fetchall(), columns=['tanggal', 'masuk', 'keluar'])
+    lama['tanggal'] = pd.to_datetime(lama['tanggal']).dt.date
+
+    tambahan = pd.DataFrame(
+        [(tanggal, masuk, keluar) for tanggal, (masuk, keluar) in mutasi_barang.items()],
+        columns=['tanggal', 'masuk', 'keluar']
+    )
+    harian = pd.concat([lama, tambahan]).groupby('tanggal', sort=True)[['masuk', 'keluar']].sum().astype(np.int64)
+    harian = harian[(harian['masuk'] != 0) | (harian['keluar'] != 0)]
+
+    total_masuk = harian['masuk'].cumsum() + int(sebelum[0])
+    total_keluar = harian['keluar'].cumsum() + int(sebelum[1])
+
+    cursor.execute("DELETE FROM stok_harian WHERE id_barang = %s AND tanggal >= %s", (id_barang, sejak))
+    _executemany_batch(cursor, """
+        INSERT INTO stok_harian
+        (id_barang, tanggal, masuk, keluar, total_masuk, total_keluar, saldo)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, [
+        (id_barang, tanggal, int(masuk), int(keluar), int(t_masuk), int(t_keluar), int(t_masuk - t_keluar))
+        for tanggal, masuk, keluar, t_masuk, t_keluar in zip(
+            harian.index, harian['masuk'], harian['keluar'], total_masuk, total_keluar
+        )
+    ])
+
+def _catat_stok_harian(cursor, mutasi):
+    """
+    Terapkan mutasi ke stok_harian.
+    mutasi: dict (id_barang, tanggal) -> [masuk, keluar]; negatif untuk hapus.
+    Baris tanggal yang sama & sesudahnya digeser kumulatifnya.
+    Barang dengan mutasi di banyak tanggal (import bulk) ditulis ulang
+    sekaligus lewat _tulis_ulang_stok_harian.
+    Transaksi pemanggil harus READ COMMITTED (ISOLASI_LEDGER); barangnya
+    dikunci di sini sebelum baris stok_harian dibaca.
+    """
+    per_barang = {}
+    for (id_barang, tanggal), nilai in mutasi.items():
+        per_barang.setdefault(id_barang, {})[tanggal] = nilai
+    _kunci_ledger_barang(cursor, per_barang)
+
+    for id_barang, mutasi_barang in per_barang.items():
+        if len(mutasi_barang) > 1:
+            _tulis_ulang_stok_harian(cursor, id_barang, mutasi_barang)
+    mutasi = {k: v for k, v in mutasi.items() if len(per_barang[k[0]]) == 1}
+
+    for (id_barang, tanggal), (masuk, keluar) in sorted(mutasi.items()):
+        if masuk == 0 and keluar == 0:
+            continue
+
+        cursor.execute(
+            "SELECT 1 FROM stok_harian WHERE id_barang = %s AND tanggal = %s",
+            (id_barang, tanggal)
+        )
+        if cursor.fetchone() is None:
+            # Baris baru mewarisi kumulatif hari mutasi sebelumnya
+            cursor.execute("""
+                SELECT total_masuk, total_keluar
+                FROM stok_harian
+                WHERE id_barang = %s AND tanggal < %s
+                ORDER BY tanggal DESC
+                LIMIT 1
+            """, (id_barang, tanggal))
+            sebelum = cursor.fetchone() or (0, 0)
+            cursor.execute("""
+                INSERT INTO stok_harian
+                (id_barang, tanggal, masuk, keluar, total_masuk, total_keluar, saldo)
+                VALUES (%s, %s, 0, 0, %s, %s, %s)
+            """, (id_barang, tanggal, int(sebelum[0]), int(sebelum[1]), int(sebelum[0]) - int(sebelum[1])))
+
+        cursor.execute("""
+            UPDATE stok_harian
+            SET masuk = masuk + %s, keluar = keluar + %s
+            WHERE id_barang = %s AND tanggal = %s
+        """, (masuk, keluar, id_barang, tanggal))
+
+        cursor.execute("""
+            UPDATE stok_harian
+            SET total_masuk = total_masuk + %s,
+                total_keluar = total_keluar + %s,
+                saldo = saldo + %s
+            WHERE id_barang = %s AND tanggal >= %s
+        """, (masuk, keluar, masuk - keluar, id_barang, tanggal))
+
+        cursor.execute("""
+            DELETE FROM stok_harian
+            WHERE id_barang = %s AND tanggal = %s AND masuk = 0 AND keluar = 0
+        """, (id_barang, tanggal))
+
+def _query_stok_harian_ledger(cursor):
+    """Isi stok_harian yang seharusnya, dihitung dari pembelian & penjualan mentah"""
+    cursor.execute("""
+        SELECT
+            id_barang, tanggal, masuk, keluar,
+            SUM(masuk) OVER w AS total_masuk,
+            SUM(keluar) OVER w AS total_keluar,
+            SUM(masuk - keluar) OVER w AS saldo
+        FROM (
+            SELECT id_barang, tanggal, SUM(masuk) AS masuk, SUM(keluar) AS keluar
+            FROM (
+                SELECT pd.id_barang, p.tanggal, pd.kuantitas AS masuk, 0 AS keluar
+                FROM pembelian_detail pd
+                JOIN pembelian p ON pd.id_pembelian = p.id
+                WHERE p.tipe = 'Barang'
+
+                UNION ALL
+
+                SELECT pjd.id_barang, pj.tanggal, 0 AS masuk, pjd.kuantitas AS keluar
+                FROM penjualan_detail pjd
+                JOIN penjualan pj ON pjd.id_penjualan = pj.id
+            ) mutasi
+            GROUP BY id_barang, tanggal
+            HAVING SUM(masuk) <> 0 OR SUM(keluar) <> 0
+        ) harian
+        WINDOW w AS (PARTITION BY id_barang ORDER BY tanggal)
+        ORDER BY id_barang, tanggal
+    """)
+    return pd.DataFrame(cursor.fetchall(), columns=KOLOM_STOK_HARIAN)
+
+def rebuild_stok_harian():
+    """Hitung ulang seluruh stok_harian dari data mentah. Return jumlah baris."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        # Import yang sedang berjalan selesai dulu, import baru menunggu rebuild
+        conn.start_transaction(isolation_level=ISOLASI_LEDGER)
+        _kunci_ledger_barang(cursor)
+        harian = _query_stok_harian_ledger(cursor)
+
+        cursor.execute("DELETE FROM stok_harian")
+        if not harian.empty:
+            cursor.executemany("""
+                INSERT INTO stok_harian
+                (id_barang, tanggal, masuk, keluar, total_masuk, total_keluar, saldo)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, [
+                (int(id_barang), tanggal, int(masuk), int(keluar),
+                 int(total_masuk), int(total_keluar), int(saldo))
+                for id_barang, tanggal, masuk, keluar, total_masuk, total_keluar, saldo
+                in harian.itertuples(index=False)
+            ])
+
+        conn.commit()
+        return len(harian)
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        cursor.close()
+        conn.close()
+
+def verify_stok_harian():
+    """
+    Bandingkan stok_harian dengan data mentah.
+    Return DataFrame baris yang berbeda (kosong = cocok), kolom
+    id_barang, tanggal, lalu <kolom>_tabel & <kolom>_ledger.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        ledger = _query_stok_harian_ledger(cursor)
+        cursor.execute(f"""
+            SELECT {', '.join(KOLOM_STOK_HARIAN)}
+            FROM stok_harian
+            ORDER BY id_barang, tanggal
+        """)
+        tabel = pd.DataFrame(cursor.fetchall(), columns=KOLOM_STOK_HARIAN)
+    finally:
+        cursor.close()
+        conn.close()
+
+    for df in (ledger, tabel):
+        df['tanggal'] = pd.to_datetime(df['tanggal'])
+        for col in KOLOM_STOK_HARIAN[2:]:
+            df[col] = df[col].astype(np.int64)
+
+    gabung = tabel.merge(
+        ledger, on=['id_barang', 'tanggal'], how='outer',
+        suffixes=('_tabel', '_ledger')
+    )
+
+    beda = np.zeros(len(gabung), dtype=bool)
+    for col in KOLOM_STOK_HARIAN[2:]:
+        beda |= (gabung[f'{col}_tabel'] != gabung[f'{col}_ledger']).to_numpy()
+
+    return gabung[beda].reset_index(drop=True)
+
+
+
+
+
+
+# ================================================
+# DATA KARTU STOK
+# ================================================
+
+def _sql_stok_awal_barang(id_barang, start_date):
+    query = """
+        SELECT saldo
+        FROM stok_harian
+        WHERE id_barang = %s AND tanggal < %s
+        ORDER BY tanggal DESC
+        LIMIT 1
+    """
+    return query, (id_barang, start_date)
+
+def get_stok_awal_barang(id_barang, start_date):
+    """Menghitung stok sebelum tanggal mulai (Start Date) dari stok_harian"""
+    conn = get_connection()
+    cursor = conn.cursor()
     
-    cursor.execute(query, (id_barang, start_date, id_barang, start_date))
+    cursor.execute(*_sql_stok_awal_barang(id_barang, start_date))
     result = cursor.fetchone()
     
     cursor.close()
@@ -2335,28 +5238,14 @@ def get_mutasi_harian(id_barang, start_date, end_date):
     query = """
         SELECT 
             tanggal,
-            SUM(masuk) as total_masuk,
-            SUM(keluar) as total_keluar
-        FROM (
-            -- Barang Masuk dari Pembelian
-            SELECT p.tanggal, pd.kuantitas as masuk, 0 as keluar
-            FROM pembelian_detail pd
-            JOIN pembelian p ON pd.id_pembelian = p.id
-            WHERE pd.id_barang = %s AND p.tipe = 'Barang' AND p.tanggal BETWEEN %s AND %s
-            
-            UNION ALL
-            
-            -- Barang Keluar dari Penjualan
-            SELECT pj.tanggal, 0 as masuk, pjd.kuantitas as keluar
-            FROM penjualan_detail pjd
-            JOIN penjualan pj ON pjd.id_penjualan = pj.id
-            WHERE pjd.id_barang = %s AND pj.tanggal BETWEEN %s AND %s
-        ) as mutasi
-        GROUP BY tanggal
+            masuk as total_masuk,
+            keluar as total_keluar
+        FROM stok_harian
+        WHERE id_barang = %s AND tanggal BETWEEN %s AND %s
         ORDER BY tanggal ASC
     """
     
-    df = pd.read_sql(query, conn, params=(id_barang, start_date, end_date, id_barang, start_date, end_date))
+    df = pd.read_sql(query, conn, params=(id_barang, start_date, end_date))
     conn.close()
     return df
 
@@ -2364,32 +5253,25 @@ def get_stok_seluruh_barang(target_date):
     """Mengambil akumulasi stok seluruh barang berdasarkan batas tanggal tertentu"""
     conn = get_connection()
     
+    # 1 lookup stok_harian per barang: baris terakhir <= target_date
     query = """
         SELECT 
             b.nama AS 'Nama Barang',
-            COALESCE(SUM(masuk.qty), 0) AS 'Total Masuk',
-            COALESCE(SUM(keluar.qty), 0) AS 'Total Keluar',
-            (COALESCE(SUM(masuk.qty), 0) - COALESCE(SUM(keluar.qty), 0)) AS 'Stok Akhir'
+            COALESCE(s.total_masuk, 0) AS 'Total Masuk',
+            COALESCE(s.total_keluar, 0) AS 'Total Keluar',
+            COALESCE(s.saldo, 0) AS 'Stok Akhir'
         FROM barang b
-        LEFT JOIN (
-            SELECT pd.id_barang, SUM(pd.kuantitas) as qty
-            FROM pembelian_detail pd
-            JOIN pembelian p ON pd.id_pembelian = p.id
-            WHERE p.tipe = 'Barang' AND p.tanggal <= %s
-            GROUP BY pd.id_barang
-        ) masuk ON b.id = masuk.id_barang
-        LEFT JOIN (
-            SELECT pjd.id_barang, SUM(pjd.kuantitas) as qty
-            FROM penjualan_detail pjd
-            JOIN penjualan pj ON pjd.id_penjualan = pj.id
-            WHERE pj.tanggal <= %s
-            GROUP BY pjd.id_barang
-        ) keluar ON b.id = keluar.id_barang
-        GROUP BY b.id, b.nama
+        LEFT JOIN stok_harian s
+            ON s.id_barang = b.id
+            AND s.tanggal = (
+                SELECT MAX(s2.tanggal)
+                FROM stok_harian s2
+                WHERE s2.id_barang = b.id AND s2.tanggal <= %s
+            )
         ORDER BY b.nama
     """
     
-    df = pd.read_sql(query, conn, params=(target_date, target_date))
+    df = pd.read_sql(query, conn, params=(target_date,))
     conn.close()
     
     return df
@@ -2460,4 +5342,170 @@ def update_biaya_tambahan(id_biaya, jumlah):
         return False
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+
+
+
+
+
+# ================================================
+# MIGRASI SKEMA (schema_migrations)
+# ================================================
+# File migrations/NNNN_nama.sql dijalankan berurutan sekali saja; versi
+# yang sudah terpasang dicatat di schema_migrations. Statement yang
+# objeknya sudah ada (tabel/kolom/index dari fix struktur db.sql) dilewati
+# supaya database lama & baru bisa memakai migrasi yang sama.
+# Database prediksi (DB_NAME_PREDIKSI) punya folder migrasi sendiri.
+
+FOLDER_MIGRASI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+FOLDER_MIGRASI_PREDIKSI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prediksi', 'migrations')
+DB_NAME_PREDIKSI = os.environ.get('DB_NAME_PREDIKSI', 'fix_manajemen_stok')
+
+# 1050 tabel sudah ada, 1060 kolom sudah ada, 1061 index sudah ada,
+# 1091 index yang di-DROP sudah tidak ada, 3822 check constraint sudah ada
+ERRNO_SUDAH_ADA = {1050, 1060, 1061, 1091, 3822}
+
+def _daftar_file_migrasi(folder=FOLDER_MIGRASI):
+    """List (versi, nama, path) file migrasi, urut versi"""
+    daftar = []
+    for nama in sorted(os.listdir(folder)):
+        versi, _, sisa = nama.partition('_')
+        if versi.isdigit() and sisa and nama.endswith('.sql'):
+            daftar.append((int(versi), nama[:-4], os.path.join(folder, nama)))
+    return daftar
+
+def _pecah_statement_sql(teks):
+    """Pisah isi file .sql per statement (komentar -- dibuang)"""
+    baris = [b for b in teks.splitlines() if not b.strip().startswith('--')]
+    return [s.strip() for s in "\n".join(baris).split(';') if s.strip()]
+
+def _buat_tabel_migrasi(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            versi INT NOT NULL PRIMARY KEY,
+            nama VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _target_migrasi(prediksi=False):
+    """(folder migrasi, koneksi) untuk database utama / database prediksi"""
+    if prediksi:
+        return FOLDER_MIGRASI_PREDIKSI, db_pool.get_connection(DB_NAME_PREDIKSI)
+    return FOLDER_MIGRASI, get_connection()
+
+def get_status_migrasi(prediksi=False):
+    """DataFrame versi, nama, applied_at (NaT = belum dijalankan)"""
+    folder, conn = _target_migrasi(prediksi)
+    cursor = conn.cursor()
+
+    try:
+        _buat_tabel_migrasi(cursor)
+        cursor.execute("SELECT versi, applied_at FROM schema_migrations")
+        terpasang = dict(cursor.fetchall())
+    finally:
+        cursor.close()
+        conn.close()
+
+    return pd.DataFrame(
+        [(versi, nama, terpasang.get(versi)) for versi, nama, _ in _daftar_file_migrasi(folder)],
+        columns=['versi', 'nama', 'applied_at']
+    )
+
+def jalankan_migrasi(sampai=None, prediksi=False):
+    """
+    Jalankan migrasi yang belum terpasang, berurutan s/d versi `sampai`.
+    Berhenti di migrasi pertama yang gagal. prediksi=True untuk database
+    prediksi (prediksi/migrations).
+
+    Returns:
+        Tuple (terpasang, errors) - nama migrasi yang baru dijalankan & list error
+    """
+    folder, conn = _target_migrasi(prediksi)
+    cursor = conn.cursor()
+    terpasang, errors = [], []
+
+    try:
+        _buat_tabel_migrasi(cursor)
+        cursor.execute("SELECT versi FROM schema_migrations")
+        sudah = {row[0] for row in cursor.fetchall()}
+
+        for versi, nama, path in _daftar_file_migrasi(folder):
+            if versi in sudah or (sampai is not None and versi > sampai):
+                continue
+
+            with open(path, encoding='utf-8') as f:
+                statements = _pecah_statement_sql(f.read())
+
+            try:
+                for statement in statements:
+                    try:
+                        cursor.execute(statement)
+                    except mysql.connector.Error as e:
+                        if e.errno not in ERRNO_SUDAH_ADA:
+                            raise
+
+                cursor.execute(
+                    "INSERT INTO schema_migrations (versi, nama) VALUES (%s, %s)",
+                    (versi, nama)
+                )
+                conn.commit()
+                terpasang.append(nama)
+
+            except Exception as e:
+                # DDL MySQL auto-commit: statement sebelum error tetap terpasang,
+                # tapi versi tidak dicatat sehingga migrasi diulang di run berikutnya
+                conn.rollback()
+                errors.append(f"{nama}: {e}")
+                break
+
+        return terpasang, errors
+
+    finally:
+        cursor.close()
+        conn.close()
+
+def explain_query_utama():
+    """
+    EXPLAIN query utama dengan parameter contoh.
+    Jalankan di database dengan volume data nyata: untuk tabel yang masih
+    hampir kosong MySQL memang memilih full scan walaupun index ada.
+
+    Returns:
+        DataFrame kolom query, table (alias), type, key, rows, full_scan
+        (full_scan = type ALL)
+    """
+    hari_ini = datetime.now().date()
+    daftar_query = [
+        ('get_data_penjualan (periode)', _sql_data_penjualan(hari_ini - timedelta(days=30), hari_ini)),
+        ('get_data_penjualan (no_nota)', _sql_data_penjualan(no_nota='-')),
+        ('get_existing_penjualan', _sql_existing_penjualan('-', hari_ini, 0)),
+        ('get_stok_awal_barang', _sql_stok_awal_barang(0, hari_ini)),
+        ('get_outstanding_invoices (piutang)', _sql_outstanding_invoices('piutang')),
+        ('get_outstanding_invoices (hutang)', _sql_outstanding_invoices('hutang')),
+    ]
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    hasil = []
+
+    try:
+        for nama, (query, params) in daftar_query:
+            cursor.execute("EXPLAIN " + query, tuple(params))
+            kolom = [d[0] for d in cursor.description]
+            for row in cursor.fetchall():
+                row = dict(zip(kolom, row))
+                hasil.append({
+                    'query': nama,
+                    'table': row.get('table'),
+                    'type': row.get('type'),
+                    'key': row.get('key'),
+                    'rows': row.get('rows'),
+                    'full_scan': row.get('type') == 'ALL'
+                })
+    finally:
+        cursor.close()
+        conn.close()
+
+    return pd.DataFrame(hasil, columns=['query', 'table', 'type', 'key', 'rows', 'full_scan'])
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 import database
+import excel_reader  # root project, path ditambahkan oleh database
 import prediction
 
 st.set_page_config(page_title="Data Penjualan", page_icon="📊", layout="wide")
@@ -23,35 +24,35 @@ uploaded_file = st.file_uploader(
         
 if uploaded_file is not None:
     try:
-        df_raw = pd.read_excel(uploaded_file, header=None)
-
         EXPECTED_COLS = ["Tgl Faktur", "No. Faktur", "Nama Pelanggan", "Keterangan Barang", "Kuantitas", "Jumlah"]
 
-        header_row_index = None
-
-        for i, row in df_raw.iterrows():
-            row_str = row.astype(str).str.upper()
-            if all(any(col.upper() in cell for cell in row_str) for col in EXPECTED_COLS):
-                header_row_index = i
-                break
+        # File dibaca streaming per potongan, isinya tidak ditahan di memory
+        def potongan_bersih():
+            for df in excel_reader.baca_excel_bertahap(uploaded_file, EXPECTED_COLS):
+                df = df.dropna(how="all")
+                df = df[EXPECTED_COLS]
+                yield excel_reader.clean_excel_apostrophe(df)
 
-        df = pd.read_excel(uploaded_file, header=header_row_index)
-
-        df = df.dropna(how="all")
-        df = df[EXPECTED_COLS]
-        df = database.clean_excel_apostrophe(df)
+        # Preview & jumlah baris dihitung 1x per upload, tidak di setiap rerun
+        if st.session_state.get("ringkasan_upload", {}).get("file_id") != uploaded_file.file_id:
+            ringkasan = {"file_id": uploaded_file.file_id, "preview": pd.DataFrame(columns=EXPECTED_COLS), "total_baris": 0}
+            for df in potongan_bersih():
+                if ringkasan["total_baris"] == 0 and not df.empty:
+                    ringkasan["preview"] = df.head(10)
+                ringkasan["total_baris"] += len(df)
+            st.session_state.ringkasan_upload = ringkasan
+        ringkasan = st.session_state.ringkasan_upload
 
         st.success("✅ Data berhasil dibersihkan!")
                 
         st.subheader("📋 Preview Data")
-        st.dataframe(df.head(10))
-        st.info(f"Total baris: {len(df)}")
-
-        print(df.applymap(type).head())
+        st.dataframe(ringkasan["preview"])
+        st.info(f"Total baris: {ringkasan['total_baris']}")
 
         if st.button("📤 Upload Data", type="primary", use_container_width=True):
             with st.spinner("Mengupload data ke database..."):
-                success_count, error_count, errors = database.insert_data_penjualan(df)
+                # File dibaca ulang & langsung ditulis per potongan
+                success_count, error_count, errors = database.insert_data_penjualan(potongan_bersih())
                         
             if success_count > 0:
                 st.success(f"✅ Berhasil mengupload {success_count} baris data!")
@@ -47,6 +47,18 @@ if uploaded_file is not None:
         if missing_cols:
             st.error(f"❌ Kolom yang hilang: {', '.join(missing_cols)}")
         else:
+            # Dry-run: semua baris dicek sekaligus sebelum menulis ke database
+            validasi_errors, validasi_peringatan = database.validasi_data_stok(df)
+            if validasi_errors:
+                st.error(f"❌ {len(validasi_errors)} error di file. Perbaiki semua baris berikut lalu upload ulang.")
+                with st.expander("Lihat detail error", expanded=True):
+                    st.dataframe(pd.DataFrame({"Error": validasi_errors}), use_container_width=True, hide_index=True)
+                st.stop()
+
+            if validasi_peringatan:
+                with st.expander(f"⚠️ {len(validasi_peringatan)} barang muncul lebih dari 1x (dipakai baris terakhir)"):
+                    st.dataframe(pd.DataFrame({"Peringatan": validasi_peringatan}), use_container_width=True, hide_index=True)
+
             st.success("✅ File berhasil dibaca!")
             
             # Preview data
@@ -337,14 +349,12 @@ if len(barang_lead_time) > 0:
             ):
                 with st.spinner("Mengupdate lead time massal..."):
                     try:
-                        update_count = 0
-                        for idx, row in selected_items.iterrows():
-                            database.update_lead_time(
-                                int(row['id']), 
-                                bulk_max_lead,  # Pakai nilai dari input bulk
-                                bulk_avg_lead
-                            )
-                            update_count += 1
+                        # Pakai nilai dari input bulk, 1 upsert untuk semua barang
+                        database.update_lead_time_batch([
+                            (int(row['id']), bulk_max_lead, bulk_avg_lead)
+                            for idx, row in selected_items.iterrows()
+                        ])
+                        update_count = len(selected_items)
                         
                         st.success(f"✅ Berhasil update {update_count} barang dengan Avg={bulk_avg_lead}, Max={bulk_max_lead}!")
                         st.info("💡 Silakan lakukan 'Proses Akhir Bulan' untuk update rekomendasi dengan lead time baru")
@@ -369,12 +379,10 @@ if len(barang_lead_time) > 0:
         ):
             with st.spinner("Menyimpan perubahan..."):
                 try:
-                    for idx, row in edited_df.iterrows():
-                        database.update_lead_time(
-                            int(row['id']), 
-                            int(row['max_lead_time']),
-                            int(row['avg_lead_time'])
-                        )
+                    database.update_lead_time_batch([
+                        (int(row['id']), int(row['max_lead_time']), int(row['avg_lead_time']))
+                        for idx, row in edited_df.iterrows()
+                    ])
                     
                     st.success("✅ Lead time berhasil diupdate!")
                     st.info("💡 Silakan lakukan 'Proses Akhir Bulan' untuk update rekomendasi dengan lead time baru")
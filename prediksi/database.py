@@ -1,15 +1,21 @@
-import mysql.connector
+import os
+import sys
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 import streamlit as st
 
+# db_pool & excel_reader ada di root project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool
+from excel_reader import parse_tanggal_kolom
+
+DB_NAME = os.environ.get('DB_NAME_PREDIKSI', 'fix_manajemen_stok')
+
 def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="fix_manajemen_stok"
-    )
+    """Koneksi dari pool bersama (db_pool); conn.close() mengembalikan ke pool"""
+    return db_pool.get_connection(DB_NAME)
     
 def run_query(query):
     conn = get_connection()
@@ -79,6 +85,11 @@ def get_data_barang(nama_barang):
         st.error(f"Error mencari barang: {e}")
         return None
     
+def get_peta_id_barang():
+    """dict nama barang (case-insensitive, spasi akhir diabaikan seperti collation MySQL) -> id"""
+    rows = run_query("SELECT id, nama FROM barang")
+    return {str(row['nama']).rstrip().casefold(): row['id'] for row in rows}
+
 def get_all_data_barang():
     conn = get_connection()
     query = "SELECT * FROM barang"
@@ -164,91 +175,74 @@ def check_related_data(id_barang):
 # DATA PENJUALAN
 # ================================================
 
-def parse_tanggal(value):
-    # Jika NaN
-    if pd.isna(value):
-        return None
-
-    # Jika numeric dari Excel serial
-    if isinstance(value, (int, float)):
-        try:
-            return pd.to_datetime(value, unit='D', origin='1899-12-30').strftime('%Y-%m-%d')
-        except:
-            pass
-
-    BULAN_ID = {
-        "Jan": "Jan", "Feb": "Feb", "Mar": "Mar", "Apr": "Apr", "Mei": "May",
-        "Jun": "Jun", "Jul": "Jul", "Agu": "Aug", "Sep": "Sep", "Okt": "Oct",
-        "Nov": "Nov", "Des": "Dec"
-    }
-
-    # Jika string
-    if isinstance(value, str):
-        value = value.strip()
-
-        # Ubah bulan Indonesian ke English
-        for indo, eng in BULAN_ID.items():
-            if indo in value:
-                value = value.replace(indo, eng)
-
-        try:
-            return pd.to_datetime(value).strftime('%Y-%m-%d')
-        except:
-            raise Exception(f"Format tanggal tidak valid: {value}")
-
-    raise Exception(f"Format tanggal tidak dikenali: {value}")
-
+# df: DataFrame utuh atau iterable potongan DataFrame (excel_reader),
+# ditulis per potongan dengan executemany dalam 1 transaksi
 def insert_data_penjualan(df):
     conn = get_connection()
     cursor = conn.cursor()
     success_count = 0
+    jumlah_baris = 0
     errors = []
 
+    potongan = [df] if isinstance(df, pd.DataFrame) else df
+
+    query = """
+    INSERT INTO penjualan (no_faktur, tgl_faktur, nama_pelanggan, id_barang, kuantitas, jumlah)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    """
+
     try:
         conn.start_transaction()
         
-        for index, row in df.iterrows():
-            nama_barang = row.get('Keterangan Barang')
-            
-            if pd.isna(nama_barang):
-                raise Exception(f"Baris {index + 2}: Nama barang kosong")
-            
-            id_barang = get_data_barang(nama_barang)
+        for bagian in potongan:
+            jumlah_baris += len(bagian)
+            values = []
 
-            if id_barang:
-                id_barang = id_barang[0]
-            
-            if not id_barang:
-                raise Exception(f"Baris {index + 2}: Barang '{nama_barang}' tidak ditemukan di database")
-            
-            no_faktur = row.get('No. Faktur')
-            tgl_faktur = row.get('Tgl Faktur')
-            nama_pelanggan = row.get('Nama Pelanggan')
-            kuantitas = row.get('Kuantitas')
-            jumlah = row.get('Jumlah')
-            
-            # Validasi data wajib
-            if pd.isna(no_faktur) or pd.isna(tgl_faktur) or pd.isna(kuantitas):
-                raise Exception(f"Baris {index + 2}: Data wajib (no_faktur, tgl_faktur, atau kuantitas) kosong")
+            # Tanggal di-parse sekaligus per potongan (serial Excel, ISO, bulan Indonesia)
+            tanggal, tanggal_gagal = parse_tanggal_kolom(bagian['Tgl Faktur'])
+            tanggal_gagal = set(tanggal_gagal)
 
-            tgl_faktur = parse_tanggal(tgl_faktur)
+            for index, row in bagian.iterrows():
+                nama_barang = row.get('Keterangan Barang')
+                
+                if pd.isna(nama_barang):
+                    raise Exception(f"Baris {index + 2}: Nama barang kosong")
+                
+                id_barang = get_data_barang(nama_barang)
 
-            query = """
-            INSERT INTO penjualan (no_faktur, tgl_faktur, nama_pelanggan, id_barang, kuantitas, jumlah)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            
-            values = (
-                str(no_faktur),
-                tgl_faktur,
-                str(nama_pelanggan) if not pd.isna(nama_pelanggan) else None,
-                id_barang,
-                int(float(kuantitas)),
-                float(jumlah) if not pd.isna(jumlah) else 0
-            )
-            
-            cursor.execute(query, values)
-            success_count += 1
+                if id_barang:
+                    id_barang = id_barang[0]
+                
+                if not id_barang:
+                    raise Exception(f"Baris {index + 2}: Barang '{nama_barang}' tidak ditemukan di database")
+                
+                no_faktur = row.get('No. Faktur')
+                tgl_faktur = row.get('Tgl Faktur')
+                nama_pelanggan = row.get('Nama Pelanggan')
+                kuantitas = row.get('Kuantitas')
+                jumlah = row.get('Jumlah')
+                
+                # Validasi data wajib
+                if pd.isna(no_faktur) or pd.isna(tgl_faktur) or pd.isna(kuantitas):
+                    raise Exception(f"Baris {index + 2}: Data wajib (no_faktur, tgl_faktur, atau kuantitas) kosong")
+
+                if index in tanggal_gagal:
+                    raise Exception(f"Baris {index + 2}: Format tanggal tidak valid: {tgl_faktur}")
+
+                tgl_faktur = tanggal[index].strftime('%Y-%m-%d')
+
+                values.append((
+                    str(no_faktur),
+                    tgl_faktur,
+                    str(nama_pelanggan) if not pd.isna(nama_pelanggan) else None,
+                    id_barang,
+                    int(float(kuantitas)),
+                    float(jumlah) if not pd.isna(jumlah) else 0
+                ))
+
+            if values:
+                cursor.executemany(query, values)
+            success_count += len(values)
         
         conn.commit()
         cursor.close()
@@ -260,7 +254,110 @@ def insert_data_penjualan(df):
         cursor.close()
         conn.close()
         errors.append(str(e))
-        return 0, df.shape[0], errors
+        return 0, jumlah_baris, errors
+
+# Backfill histori (tools/backfill_penjualan.py --prediksi): baris dimuat ke
+# staging table lewat LOAD DATA LOCAL INFILE, barang di-resolve dengan
+# 1 UPDATE ... JOIN lalu ditulis dengan 1 INSERT ... SELECT.
+# Baris yang ditolak dilaporkan, baris lain tetap masuk (beda dengan
+# insert_data_penjualan yang membatalkan seluruh file). Faktur yang sudah ada
+# (no_faktur & tgl_faktur sama) ditolak, sehingga file aman di-backfill ulang.
+def backfill_data_penjualan(df):
+    conn = db_pool.get_connection_infile(DB_NAME)
+    cursor = conn.cursor()
+    potongan = [df] if isinstance(df, pd.DataFrame) else df
+    jumlah_baris = 0
+
+    try:
+        conn.start_transaction()
+
+        cursor.execute("""
+            CREATE TEMPORARY TABLE staging_penjualan (
+              `baris` int NOT NULL,
+              `no_faktur` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+              `tgl_faktur` date DEFAULT NULL,
+              `nama_pelanggan` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+              `nama_barang` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+              `kuantitas` bigint DEFAULT NULL,
+              `jumlah` decimal(20,2) DEFAULT NULL,
+              `alasan_nilai` varchar(500) DEFAULT NULL,
+              `id_barang` bigint unsigned DEFAULT NULL,
+              `alasan` varchar(500) DEFAULT NULL,
+              PRIMARY KEY (`baris`),
+              KEY `idx_faktur` (`no_faktur`, `tgl_faktur`)
+            ) DEFAULT CHARSET=utf8mb4
+        """)
+
+        for bagian in potongan:
+            jumlah_baris += len(bagian)
+
+            tgl_raw = bagian['Tgl Faktur']
+            tanggal, tanggal_gagal = parse_tanggal_kolom(tgl_raw)
+            kuantitas_raw = bagian['Kuantitas']
+            kuantitas = pd.to_numeric(kuantitas_raw, errors='coerce')
+            wajib_kosong = bagian['No. Faktur'].isna() | tgl_raw.isna() | kuantitas_raw.isna()
+            tanggal_salah = ~wajib_kosong & pd.Series(bagian.index.isin(tanggal_gagal), index=bagian.index)
+            kuantitas_salah = ~wajib_kosong & ~tanggal_salah & kuantitas.isna()
+
+            # Urutan cek sama dengan insert_data_penjualan (barang dicek di MySQL)
+            alasan_nilai = pd.Series(None, index=bagian.index, dtype=object)
+            alasan_nilai[kuantitas_salah] = [f"Kuantitas '{nilai}' bukan angka" for nilai in kuantitas_raw[kuantitas_salah]]
+            alasan_nilai[tanggal_salah] = [f"Format tanggal tidak valid: {nilai}" for nilai in tgl_raw[tanggal_salah]]
+            alasan_nilai[wajib_kosong] = "Data wajib (no_faktur, tgl_faktur, atau kuantitas) kosong"
+
+            db_pool.load_dataframe(cursor, 'staging_penjualan', pd.DataFrame({
+                'baris': bagian.index + 2,
+                'no_faktur': bagian['No. Faktur'].astype(object).map(str, na_action='ignore'),
+                'tgl_faktur': tanggal.dt.strftime('%Y-%m-%d'),
+                'nama_pelanggan': bagian['Nama Pelanggan'].astype(object).map(str, na_action='ignore'),
+                'nama_barang': bagian['Keterangan Barang'],
+                'kuantitas': np.trunc(kuantitas).astype('Int64'),
+                'jumlah': pd.to_numeric(bagian['Jumlah'], errors='coerce').fillna(0),
+                'alasan_nilai': alasan_nilai
+            }))
+
+        cursor.execute("""
+            UPDATE staging_penjualan s
+            JOIN (SELECT nama, MIN(id) AS id FROM barang GROUP BY nama) b
+              ON b.nama = s.nama_barang COLLATE utf8mb4_unicode_ci
+            SET s.id_barang = b.id
+        """)
+        cursor.execute("""
+            UPDATE staging_penjualan
+            SET alasan = CASE
+                WHEN nama_barang IS NULL THEN 'Nama barang kosong'
+                WHEN id_barang IS NULL THEN CONCAT('Barang ''', nama_barang, ''' tidak ditemukan di database')
+                ELSE alasan_nilai
+            END
+        """)
+        cursor.execute("""
+            UPDATE staging_penjualan s
+            JOIN (SELECT DISTINCT no_faktur, tgl_faktur FROM penjualan) p
+              ON p.no_faktur = s.no_faktur COLLATE utf8mb4_unicode_ci AND p.tgl_faktur = s.tgl_faktur
+            SET s.alasan = 'Faktur sudah ada di database'
+            WHERE s.alasan IS NULL
+        """)
+
+        cursor.execute("""
+            INSERT INTO penjualan (no_faktur, tgl_faktur, nama_pelanggan, id_barang, kuantitas, jumlah)
+            SELECT no_faktur, tgl_faktur, nama_pelanggan, id_barang, kuantitas, jumlah
+            FROM staging_penjualan
+            WHERE alasan IS NULL
+            ORDER BY baris
+        """)
+
+        cursor.execute("SELECT baris, alasan FROM staging_penjualan WHERE alasan IS NOT NULL ORDER BY baris")
+        errors = [f"Baris {baris}: {alasan}" for baris, alasan in cursor.fetchall()]
+
+        conn.commit()
+        return jumlah_baris - len(errors), len(errors), errors
+
+    except Exception as e:
+        conn.rollback()
+        return 0, jumlah_baris, [str(e)]
+    finally:
+        cursor.close()
+        conn.close()
 
 def get_all_data_penjualan(id_barang):
     conn = get_connection()
@@ -606,77 +703,87 @@ def insert_hasil_prediksi(id_barang, tanggal, kuantitas):
 # DATA STOK
 # ================================================
 
+def validasi_data_stok(df, peta_barang=None):
+    """
+    Dry-run insert_data_stok: semua baris dicek sekaligus tanpa menulis ke
+    database (nama kosong, barang tidak dikenal, jumlah gudang bukan angka).
+
+    Return (errors, peringatan), peringatan = barang yang muncul lebih dari
+    1x (yang dipakai baris terakhir).
+    """
+    if peta_barang is None:
+        peta_barang = get_peta_id_barang()
+
+    baris = pd.Series(df.index, index=df.index) + 2
+    nama = df['Deskripsi Barang'] if 'Deskripsi Barang' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    kunci = nama.map(lambda n: None if pd.isna(n) else str(n).rstrip().casefold())
+
+    cek = [
+        (nama.isna(), lambda i: "Nama barang kosong"),
+        (nama.notna() & ~kunci.isin(list(peta_barang)), lambda i: f"Barang '{nama[i]}' tidak ditemukan di database"),
+    ]
+    for kolom in ['BANJARMASIN', 'CENTRE']:
+        if kolom in df.columns:
+            nilai = df[kolom]
+            salah = nilai.notna() & pd.to_numeric(nilai, errors='coerce').isna()
+            cek.append((salah, lambda i, kolom=kolom: f"Stok {kolom} '{df[kolom][i]}' bukan angka"))
+
+    errors = []
+    for urutan, (mask, pesan) in enumerate(cek):
+        errors.extend((baris[i], urutan, f"Baris {baris[i]}: {pesan(i)}") for i in df.index[mask.to_numpy()])
+
+    kembar = kunci.notna() & kunci.duplicated(keep='last')
+    peringatan = [
+        f"Baris {baris[i]}: Barang '{nama[i]}' muncul lagi di baris berikutnya, baris ini diabaikan"
+        for i in df.index[kembar.to_numpy()]
+    ]
+    return [teks for _, _, teks in sorted(errors)], peringatan
+
 def insert_data_stok(df, tanggal):
+    if isinstance(tanggal, str):
+        tanggal_str = tanggal
+    else:
+        tanggal_str = tanggal.strftime('%Y-%m-%d')
+
+    # Semua baris divalidasi dulu, error dilaporkan sekaligus
+    peta_barang = get_peta_id_barang()
+    errors, _ = validasi_data_stok(df, peta_barang)
+    if errors:
+        return 0, df.shape[0], errors
+
+    id_barang = df['Deskripsi Barang'].map(lambda n: peta_barang[str(n).rstrip().casefold()])
+    gudang_bjm = pd.to_numeric(df['BANJARMASIN'], errors='coerce').fillna(0) if 'BANJARMASIN' in df.columns else pd.Series(0.0, index=df.index)
+    gudang_sby = pd.to_numeric(df['CENTRE'], errors='coerce').fillna(0) if 'CENTRE' in df.columns else pd.Series(0.0, index=df.index)
+    values = [
+        (tanggal_str, int(id_b), float(bjm), float(sby))
+        for id_b, bjm, sby in zip(id_barang, gudang_bjm, gudang_sby)
+    ]
+
+    # 1 executemany upsert: unique key (tanggal, id_barang) menentukan
+    # insert / update, barang yang muncul 2x di file -> baris terakhir menang
+    query = """
+    INSERT INTO stok (tanggal, id_barang, gudang_bjm, gudang_sby)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE gudang_bjm = VALUES(gudang_bjm), gudang_sby = VALUES(gudang_sby)
+    """
+
     conn = get_connection()
     cursor = conn.cursor()
-    success_count = 0
-    errors = []
 
     try:
         conn.start_transaction()
-        
-        for index, row in df.iterrows():
-            nama_barang = row.get('Deskripsi Barang')
-            
-            if pd.isna(nama_barang):
-                raise Exception(f"Baris {index + 2}: Nama barang kosong")
-            
-            barang_info = get_data_barang(nama_barang)
-            
-            if not barang_info:
-                raise Exception(f"Baris {index + 2}: Barang '{nama_barang}' tidak ditemukan di database")
-            
-            id_barang = barang_info[0]
-            gudang_bjm = row.get('BANJARMASIN', 0)
-            gudang_sby = row.get('CENTRE', 0)
-
-            if pd.isna(gudang_bjm):
-                gudang_bjm = 0
-            if pd.isna(gudang_sby):
-                gudang_sby = 0
-            
-            if isinstance(tanggal, str):
-                tanggal_str = tanggal
-            else:
-                tanggal_str = tanggal.strftime('%Y-%m-%d')
-            
-            # Check if data exists
-            check_query = """
-            SELECT id FROM stok 
-            WHERE tanggal = %s AND id_barang = %s
-            """
-            cursor.execute(check_query, (tanggal_str, id_barang))
-            existing = cursor.fetchone()
-            
-            if existing:
-                # Update
-                update_query = """
-                UPDATE stok 
-                SET gudang_bjm = %s, gudang_sby = %s
-                WHERE tanggal = %s AND id_barang = %s
-                """
-                cursor.execute(update_query, (gudang_bjm, gudang_sby, tanggal_str, id_barang))
-            else:
-                # Insert
-                insert_query = """
-                INSERT INTO stok (tanggal, id_barang, gudang_bjm, gudang_sby)
-                VALUES (%s, %s, %s, %s)
-                """
-                cursor.execute(insert_query, (tanggal_str, id_barang, gudang_bjm, gudang_sby))
-            
-            success_count += 1
-        
+        if values:
+            cursor.executemany(query, values)
         conn.commit()
-        cursor.close()
-        conn.close()
-        return success_count, 0, []
+        return len(values), 0, []
         
     except Exception as e:
         conn.rollback()
+        return 0, df.shape[0], [str(e)]
+
+    finally:
         cursor.close()
         conn.close()
-        errors.append(str(e))
-        return 0, df.shape[0], errors
 
 def get_all_data_stok():
     conn = get_connection()
@@ -749,31 +856,28 @@ def get_stok_by_date(tanggal):
     return df
 
 def update_lead_time(id_barang, max_lead_time, avg_lead_time):
+    update_lead_time_batch([(id_barang, max_lead_time, avg_lead_time)])
+
+# rows: list (id_barang, max_lead_time, avg_lead_time), 1 executemany upsert
+# (unique key id_barang di rekomendasi_stok)
+def update_lead_time_batch(rows):
     conn = get_connection()
     cursor = conn.cursor()
     
-    # Check if exists
-    check_query = "SELECT id FROM rekomendasi_stok WHERE id_barang = %s"
-    cursor.execute(check_query, (id_barang,))
-    existing = cursor.fetchone()
-    
-    if existing:
-        update_query = """
-        UPDATE rekomendasi_stok 
-        SET max_lead_time = %s, avg_lead_time = %s
-        WHERE id_barang = %s
-        """
-        cursor.execute(update_query, (max_lead_time, avg_lead_time, id_barang))
-    else:
-        insert_query = """
-        INSERT INTO rekomendasi_stok (id_barang, max_lead_time, avg_lead_time, safety_stock, reorder_point)
-        VALUES (%s, %s, %s, 0, 0)
-        """
-        cursor.execute(insert_query, (id_barang, max_lead_time, avg_lead_time))
+    query = """
+    INSERT INTO rekomendasi_stok (id_barang, max_lead_time, avg_lead_time, safety_stock, reorder_point)
+    VALUES (%s, %s, %s, 0, 0)
+    ON DUPLICATE KEY UPDATE max_lead_time = VALUES(max_lead_time), avg_lead_time = VALUES(avg_lead_time)
+    """
     
-    conn.commit()
-    cursor.close()
-    conn.close()
+    try:
+        values = [(int(id_barang), int(max_lead), int(avg_lead)) for id_barang, max_lead, avg_lead in rows]
+        if values:
+            cursor.executemany(query, values)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
 
 def check_data_stok_hari_ini():
     latest_date = get_latest_stok_date()
@@ -882,29 +986,20 @@ def insert_rekomendasi_stok(id_barang, max_lead_time, avg_lead_time, safety_stoc
     
     tgl_update = datetime.now().strftime('%Y-%m-%d')
     
-    # Check if exists
-    check_query = "SELECT id FROM rekomendasi_stok WHERE id_barang = %s"
-    cursor.execute(check_query, (id_barang,))
-    existing = cursor.fetchone()
-    
-    if existing:
-        update_query = """
-        UPDATE rekomendasi_stok 
-        SET max_lead_time = %s, avg_lead_time = %s, safety_stock = %s, reorder_point = %s,
-            tgl_update = %s, stok_aktual = %s, hasil_prediksi = %s, saran_stok = %s
-        WHERE id_barang = %s
-        """
-        cursor.execute(update_query, (max_lead_time, avg_lead_time, safety_stock, reorder_point, 
-                                     tgl_update, stok_aktual, hasil_prediksi, saran_stok, id_barang))
-    else:
-        insert_query = """
-        INSERT INTO rekomendasi_stok 
-        (id_barang, max_lead_time, avg_lead_time, safety_stock, reorder_point, tgl_update, 
-         stok_aktual, hasil_prediksi, saran_stok)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(insert_query, (id_barang, max_lead_time, avg_lead_time, safety_stock, reorder_point,
-                                     tgl_update, stok_aktual, hasil_prediksi, saran_stok))
+    # 1 statement: unique key id_barang menentukan insert / update
+    query = """
+    INSERT INTO rekomendasi_stok 
+    (id_barang, max_lead_time, avg_lead_time, safety_stock, reorder_point, tgl_update, 
+     stok_aktual, hasil_prediksi, saran_stok)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        max_lead_time = VALUES(max_lead_time), avg_lead_time = VALUES(avg_lead_time),
+        safety_stock = VALUES(safety_stock), reorder_point = VALUES(reorder_point),
+        tgl_update = VALUES(tgl_update), stok_aktual = VALUES(stok_aktual),
+        hasil_prediksi = VALUES(hasil_prediksi), saran_stok = VALUES(saran_stok)
+    """
+    cursor.execute(query, (id_barang, max_lead_time, avg_lead_time, safety_stock, reorder_point,
+                           tgl_update, stok_aktual, hasil_prediksi, saran_stok))
     
     conn.commit()
     cursor.close()
@@ -1105,46 +1200,3 @@ def get_rekomendasi_stok_with_gudang():
     merged['stok_aktual'] = merged['gudang_bjm'] + merged['gudang_sby']
     
     return merged
-
-
-
-
-
-
-
-
-
-
-
-
-import pandas as pd
-
-def clean_excel_apostrophe(df):   
-    def clean_value(value):
-        # Handle NaN/None
-        if pd.isna(value):
-            return None
-        
-        # Convert ke string dan strip
-        str_value = str(value).strip()
-        
-        # Remove leading apostrophe
-        if str_value.startswith("'"):
-            str_value = str_value[1:]
-        
-        return str_value if str_value else None
-
-    # Copy df agar tidak ubah yang asli
-    df = df.copy()
-
-    # --- Bersihkan Nama Kolom ---
-    df.columns = [
-        col[1:] if isinstance(col, str) and col.startswith("'") else col
-        for col in df.columns
-    ]
-
-    # --- Bersihkan Isi Cell ---
-    for col in df.columns:
-        df[col] = df[col].apply(clean_value)
-
-    return df
@@ -0,0 +1,13 @@
+-- Unique key database prediksi supaya insert_data_stok, update_lead_time &
+-- insert_rekomendasi_stok cukup 1 statement INSERT ... ON DUPLICATE KEY
+-- UPDATE dan tidak ada baris kembar saat beberapa user menulis bersamaan.
+-- Jalankan: python tools/migrate.py --prediksi
+--
+-- Migrasi gagal (errno 1062) jika data lama sudah ada yang kembar. Cek dulu:
+--   SELECT tanggal, id_barang, COUNT(*) FROM stok
+--   GROUP BY tanggal, id_barang HAVING COUNT(*) > 1;
+--   SELECT id_barang, COUNT(*) FROM rekomendasi_stok
+--   GROUP BY id_barang HAVING COUNT(*) > 1;
+
+ALTER TABLE `stok` ADD UNIQUE KEY `uq_tanggal_barang` (`tanggal`, `id_barang`);
+ALTER TABLE `rekomendasi_stok` ADD UNIQUE KEY `uq_barang` (`id_barang`);
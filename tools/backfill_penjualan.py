@@ -0,0 +1,108 @@
+"""
+Script untuk backfill histori penjualan (bertahun-tahun) dari file Excel
+lewat staging table + LOAD DATA LOCAL INFILE, jauh lebih cepat dari upload
+biasa yang menulis per batch INSERT.
+
+CARA PAKAI:
+1. Pastikan skema terbaru (python tools/migrate.py, --prediksi untuk
+   database prediksi) dan server MySQL mengizinkan LOAD DATA LOCAL:
+   SET GLOBAL local_infile = 1;
+2. Jalankan dari root project:
+   python tools/backfill_penjualan.py histori/2021.xlsx histori/2022.xlsx
+3. Database prediksi (tabel penjualan prediksi):
+   python tools/backfill_penjualan.py --prediksi histori/*.xlsx
+4. Opsional: --default-top 30 (TOP jika kolom TOP kosong & customer tanpa TOP),
+   --tanpa-rebuild (lewati rebuild ledger HPP), --tampil-error 50
+
+CATATAN:
+- Format file sama dengan upload Excel halaman penjualan
+- Baris yang ditolak (barang/customer tidak ada, nilai tidak valid) TIDAK
+  menggagalkan file: nota tsb dilewati & dilaporkan, nota lain tetap masuk.
+  Nota yang sudah ada di database juga dilewati, jadi aman dijalankan ulang
+  setelah baris yang ditolak diperbaiki
+- trading_db: piutang & stok_harian ikut ditulis, ledger HPP FIFO & gp_cube
+  di-rebuild sekali di akhir (rebuild_hpp_allocation)
+- Exit code 1 jika ada baris yang ditolak
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# Add project root to path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import new_database
+import excel_reader
+
+EXPECTED_COLS = ["Tgl Faktur", "No. Faktur", "Nama Pelanggan", "Keterangan Barang", "Kuantitas", "Jumlah"]
+KOLOM_OPSIONAL = ["Harga Satuan", "TOP"]
+
+
+def baca_potongan(path, prediksi):
+    """Potongan DataFrame yang sudah dibersihkan (seperti halaman upload)"""
+    potongan = excel_reader.baca_excel_bertahap(path, EXPECTED_COLS)
+    kolom = EXPECTED_COLS if prediksi else EXPECTED_COLS + [k for k in KOLOM_OPSIONAL if k in potongan.columns]
+
+    for df in potongan:
+        df = df.dropna(how="all")
+        yield excel_reader.clean_excel_apostrophe(df[kolom])
+
+
+def print_progress(selesai, total):
+    print(f"\r  {selesai}/{total} barang", end="", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill histori penjualan (LOAD DATA LOCAL INFILE)")
+    parser.add_argument("files", nargs="+", help="File Excel histori penjualan")
+    parser.add_argument("--prediksi", action="store_true", help="Backfill ke database prediksi")
+    parser.add_argument("--default-top", type=int, default=None, help="TOP default (trading_db)")
+    parser.add_argument("--tanpa-rebuild", action="store_true", help="Lewati rebuild ledger HPP")
+    parser.add_argument("--tampil-error", type=int, default=20, help="Jumlah baris ditolak yang ditampilkan per file")
+    args = parser.parse_args()
+
+    if args.prediksi:
+        sys.path.append(os.path.join(ROOT, 'prediksi'))
+        import database as prediksi_db
+        backfill = prediksi_db.backfill_data_penjualan
+        print(f"Database: {prediksi_db.DB_NAME}")
+    else:
+        backfill = lambda potongan: new_database.backfill_penjualan(potongan, default_top=args.default_top)
+        print(f"Database: {new_database.DB_NAME}")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    total_sukses, total_gagal = 0, 0
+
+    for path in args.files:
+        mulai = time.perf_counter()
+        sukses, gagal, errors = backfill(baca_potongan(path, args.prediksi))
+        total_sukses += sukses
+        total_gagal += gagal
+
+        status = '✅' if not errors else '⚠️'
+        print(f"{status} {os.path.basename(path)}: {sukses:,} baris masuk, {gagal:,} ditolak "
+              f"({time.perf_counter() - mulai:.1f} detik)")
+        for error in errors[:args.tampil_error]:
+            print(f"    {error}")
+        if len(errors) > args.tampil_error:
+            print(f"    ... dan {len(errors) - args.tampil_error} baris lainnya")
+
+    if not args.prediksi and not args.tanpa_rebuild and total_sukses:
+        print("Rebuild ledger HPP FIFO...")
+        _, errors = new_database.rebuild_hpp_allocation(progress_callback=print_progress)
+        print()
+        for error in errors:
+            print(f"  ⚠️ {error}")
+
+    print("=" * 70)
+    print(f"Total: {total_sukses:,} baris masuk, {total_gagal:,} ditolak ({time.perf_counter() - start:.1f} detik)")
+    if total_gagal:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Uji upsert paralel: beberapa writer menulis natural key yang sama
+bersamaan, lalu dicek tidak ada baris kembar pada unique key
+(migrations/0003_unique_key_upsert.sql & prediksi/migrations/0001).
+Juga import penjualan & pembelian berbeda yang berbagi barang bersamaan,
+lalu dicek stok_harian sama dengan hasil rebuild_stok_harian dan ledger
+HPP tidak dialokasikan ganda (migrations/0009_ledger_barang_lock.sql).
+
+CARA PAKAI:
+1. Siapkan database KOSONG khusus uji dengan skema terbaru
+   (DB_NAME=bench_trading_db python tools/migrate.py)
+2. Jalankan dari root project:
+   DB_NAME=bench_trading_db python tools/cek_upsert_paralel.py
+3. Opsional: --writers 4 --ulang 10 --rows 2000 --seed 42
+4. Tambah --prediksi untuk juga menguji stok & rekomendasi_stok
+   (DB_NAME_PREDIKSI=bench_prediksi python tools/migrate.py --prediksi,
+   tabel barang database prediksi harus sudah berisi data)
+
+CATATAN:
+- MENULIS ke database (master data BENCH ..., pricelist, penjualan,
+  stok tanggal 2099-12-31); trading_db & fix_manajemen_stok ditolak
+- Import paralel nota yang sama boleh saja ada yang gagal karena deadlock
+  (di-rollback & dilaporkan), yang dicek: tidak ada baris kembar dan
+  total header = jumlah subtotal detail
+- Exit code 1 jika ada baris kembar / total tidak cocok / stok_harian atau
+  ledger HPP selisih
+"""
+
+import sys
+import os
+import argparse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Add project root & benchmark/ to path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'benchmark'))
+
+import new_database
+from bench_insert_penjualan import siapkan_master, generate_data
+from bench_insert_pembelian import siapkan_supplier, generate_data as generate_data_pembelian
+
+TANGGAL_UJI = '2099-12-31'
+
+
+def paralel(func, daftar_args, writers):
+    """Jalankan func(*args) untuk setiap args di `writers` thread sekaligus; list (hasil, error)"""
+    def jalankan(args):
+        try:
+            return func(*args), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=writers) as executor:
+        return list(executor.map(jalankan, daftar_args))
+
+
+def jumlah_kembar(get_connection, tabel, kolom, where="1 = 1", params=()):
+    """Jumlah kombinasi `kolom` yang muncul lebih dari 1x di tabel"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM (
+                SELECT {', '.join(kolom)}
+                FROM {tabel}
+                WHERE {where}
+                GROUP BY {', '.join(kolom)}
+                HAVING COUNT(*) > 1
+            ) kembar
+        """, params)
+        return int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def ambil_id(get_connection, tabel, pola, n):
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(f"SELECT id FROM {tabel} WHERE nama LIKE %s ORDER BY id LIMIT {int(n)}", (pola,))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def laporkan(nama, kembar, gagal=0):
+    status = '✅' if kembar == 0 else '❌'
+    keterangan = f" | {gagal} writer gagal" if gagal else ""
+    print(f"{status} {nama:<40} {kembar} key kembar{keterangan}")
+    return kembar == 0
+
+
+def uji_pricelist(writers, ulang, seed):
+    """Semua writer meng-upsert pasangan (partner, barang) yang sama berulang-ulang"""
+    id_barang = ambil_id(new_database.get_connection, 'barang', 'BENCH Barang %', 5)
+    id_customer = ambil_id(new_database.get_connection, 'customer', 'Bench Customer %', 3)
+    id_supplier = ambil_id(new_database.get_connection, 'supplier', 'Bench Supplier %', 3)
+
+    def tulis(upsert, daftar_partner, writer):
+        rng = np.random.default_rng(seed + writer)
+        for _ in range(ulang):
+            for id_partner in daftar_partner:
+                for barang in id_barang:
+                    upsert(id_partner, barang, int(rng.integers(1, 1000)) * 100)
+
+    ok = True
+    for nama, upsert, daftar_partner, kolom in [
+        ('customer_pricelist', new_database.upsert_customer_pricelist, id_customer, 'id_customer'),
+        ('supplier_pricelist', new_database.upsert_supplier_pricelist, id_supplier, 'id_supplier'),
+    ]:
+        if not daftar_partner:
+            print(f"⚠️ {nama}: master data bench belum ada, dilewati")
+            continue
+        hasil = paralel(tulis, [(upsert, daftar_partner, w) for w in range(writers)], writers)
+        gagal = sum(err is not None for _, err in hasil)
+        ok &= laporkan(nama, jumlah_kembar(new_database.get_connection, nama, [kolom, 'id_barang']), gagal)
+    return ok
+
+
+def uji_import(writers, rows, seed):
+    """Semua writer mengimport file Excel yang sama (nota sama) bersamaan"""
+    prefix = f"UP{uuid.uuid4().hex[:6].upper()}"
+    df = generate_data(rows, 50, 10, prefix, seed)
+
+    hasil = paralel(new_database.insert_penjualan, [(df.copy(),) for _ in range(writers)], writers)
+    gagal = sum(err is not None or r[2] != [] for r, err in hasil)
+
+    ok = laporkan(
+        'penjualan (no_nota, tanggal, id_customer)',
+        jumlah_kembar(new_database.get_connection, 'penjualan', ['no_nota', 'tanggal', 'id_customer'],
+                      "no_nota LIKE %s", (f"{prefix}-%",)),
+        gagal
+    )
+
+    conn = new_database.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT COUNT(*) FROM penjualan p
+            WHERE p.no_nota LIKE %s
+            AND p.total <> (SELECT COALESCE(SUM(d.subtotal), 0) FROM penjualan_detail d WHERE d.id_penjualan = p.id)
+        """, (f"{prefix}-%",))
+        selisih = int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"{'✅' if selisih == 0 else '❌'} {'total header = subtotal detail':<40} {selisih} nota selisih")
+    return ok and selisih == 0
+
+
+def uji_ledger(writers, rows, seed):
+    """
+    Import penjualan & pembelian (file berbeda, barang sama) bersamaan, lalu
+    stok_harian dibandingkan dengan data mentah (= hasil rebuild_stok_harian)
+    dan ledger HPP dicek: qty_sisa tidak negatif & setiap detail penjualan
+    bench teralokasi tepat sebesar kuantitasnya.
+    """
+    prefix = f"LP{uuid.uuid4().hex[:6].upper()}"
+    daftar_args = []
+    for w in range(writers):
+        daftar_args.append((new_database.insert_pembelian, generate_data_pembelian(rows, 50, 3, f"{prefix}B{w}", seed + w)))
+        daftar_args.append((new_database.insert_penjualan, generate_data(rows, 50, 10, f"{prefix}J{w}", seed + w)))
+
+    hasil = paralel(lambda func, df: func(df), daftar_args, writers * 2)
+    gagal = sum(err is not None or r[2] != [] for r, err in hasil)
+
+    selisih = len(new_database.verify_stok_harian())
+    print(f"{'✅' if selisih == 0 else '❌'} {'stok_harian = rebuild_stok_harian':<40} {selisih} baris selisih"
+          + (f" | {gagal} import gagal" if gagal else ""))
+
+    conn = new_database.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM pembelian_detail WHERE qty_sisa < 0")
+        negatif = int(cursor.fetchone()[0])
+        cursor.execute("""
+            SELECT COUNT(*) FROM (
+                SELECT pd.id
+                FROM penjualan_detail pd
+                JOIN penjualan p ON pd.id_penjualan = p.id
+                LEFT JOIN hpp_allocation a ON a.id_penjualan_detail = pd.id
+                WHERE p.no_nota LIKE %s
+                GROUP BY pd.id, pd.kuantitas
+                HAVING COALESCE(SUM(a.qty), 0) <> pd.kuantitas
+            ) beda
+        """, (f"{prefix}%",))
+        alokasi_beda = int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"{'✅' if negatif == 0 else '❌'} {'qty_sisa >= 0':<40} {negatif} layer negatif")
+    print(f"{'✅' if alokasi_beda == 0 else '❌'} {'alokasi HPP = kuantitas penjualan':<40} {alokasi_beda} detail selisih")
+    return selisih == 0 and negatif == 0 and alokasi_beda == 0
+
+
+def uji_prediksi(writers, ulang, seed):
+    """insert_data_stok & update_lead_time_batch paralel di database prediksi"""
+    sys.path.append(os.path.join(ROOT, 'prediksi'))
+    import database as prediksi_db
+
+    barang = prediksi_db.get_all_nama_barang()['nama'].head(20).tolist()
+    if not barang:
+        print("⚠️ Tabel barang database prediksi kosong, uji prediksi dilewati")
+        return True
+    id_barang = [prediksi_db.get_data_barang(nama)[0] for nama in barang]
+
+    def tulis_stok(writer):
+        rng = np.random.default_rng(seed + writer)
+        for _ in range(ulang):
+            df = pd.DataFrame({
+                'Deskripsi Barang': barang,
+                'BANJARMASIN': rng.integers(0, 100, len(barang)),
+                'CENTRE': rng.integers(0, 100, len(barang))
+            })
+            sukses, _, errors = prediksi_db.insert_data_stok(df, TANGGAL_UJI)
+            if errors:
+                raise Exception(errors[0])
+
+    def tulis_lead_time(writer):
+        rng = np.random.default_rng(seed + writer)
+        for _ in range(ulang):
+            prediksi_db.update_lead_time_batch([
+                (i, int(rng.integers(7, 30)), int(rng.integers(1, 7))) for i in id_barang
+            ])
+
+    ok = True
+    for nama, func, tabel, kolom in [
+        ('stok (tanggal, id_barang)', tulis_stok, 'stok', ['tanggal', 'id_barang']),
+        ('rekomendasi_stok (id_barang)', tulis_lead_time, 'rekomendasi_stok', ['id_barang']),
+    ]:
+        hasil = paralel(func, [(w,) for w in range(writers)], writers)
+        gagal = sum(err is not None for _, err in hasil)
+        ok &= laporkan(nama, jumlah_kembar(prediksi_db.get_connection, tabel, kolom), gagal)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uji upsert paralel (tidak ada baris kembar)")
+    parser.add_argument("--writers", type=int, default=4, help="Jumlah writer paralel")
+    parser.add_argument("--ulang", type=int, default=10, help="Pengulangan upsert per writer")
+    parser.add_argument("--rows", type=int, default=2000, help="Baris Excel per import")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prediksi", action="store_true", help="Uji juga database prediksi")
+    args = parser.parse_args()
+
+    if new_database.DB_NAME == 'trading_db':
+        print("❌ Set DB_NAME ke database khusus uji (bukan trading_db)")
+        sys.exit(1)
+    if args.prediksi and new_database.DB_NAME_PREDIKSI == 'fix_manajemen_stok':
+        print("❌ Set DB_NAME_PREDIKSI ke database khusus uji (bukan fix_manajemen_stok)")
+        sys.exit(1)
+
+    print(f"Database: {new_database.DB_NAME} | {args.writers} writer paralel")
+    print("=" * 70)
+    siapkan_master(50, 10)
+    siapkan_supplier(3)
+
+    ok = uji_pricelist(args.writers, args.ulang, args.seed)
+    ok &= uji_import(args.writers, args.rows, args.seed)
+    ok &= uji_ledger(args.writers, args.rows, args.seed)
+    if args.prediksi:
+        ok &= uji_prediksi(args.writers, args.ulang, args.seed)
+
+    print("=" * 70)
+    if not ok:
+        sys.exit(1)
+    print("✅ Tidak ada baris kembar, stok_harian & ledger HPP cocok")
+
+
+if __name__ == "__main__":
+    main()
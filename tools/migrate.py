@@ -0,0 +1,84 @@
+"""
+Script untuk menjalankan migrasi skema database (folder migrations/)
+dan memverifikasi index lewat EXPLAIN.
+
+CARA PAKAI:
+1. Jalankan dari root project: python tools/migrate.py
+2. Lihat status migrasi: python tools/migrate.py --status
+3. Migrasi s/d versi tertentu: python tools/migrate.py --sampai 1
+4. Cek EXPLAIN query utama: python tools/migrate.py --explain
+5. Database prediksi (DB_NAME_PREDIKSI, folder prediksi/migrations):
+   python tools/migrate.py --prediksi
+
+CATATAN:
+- Migrasi baru = file migrations/NNNN_nama.sql dengan nomor berikutnya,
+  jangan mengubah file yang sudah pernah dijalankan
+- Aman dijalankan ulang: migrasi yang tercatat di schema_migrations dilewati,
+  tabel/kolom/index yang sudah ada juga dilewati
+- --explain keluar dengan exit code 1 jika ada query yang full table scan;
+  jalankan di database dengan data nyata (tabel kosong selalu di-scan)
+"""
+
+import sys
+import os
+import argparse
+
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import new_database
+
+
+def tampilkan_status(prediksi=False):
+    status = new_database.get_status_migrasi(prediksi)
+    for versi, nama, applied_at in status.itertuples(index=False):
+        keterangan = f"✅ {applied_at}" if pd.notna(applied_at) else "⏳ belum"
+        print(f"  {nama:<40} {keterangan}")
+
+
+def cek_explain():
+    hasil = new_database.explain_query_utama()
+    print(hasil.to_string(index=False))
+    print("=" * 70)
+
+    full_scan = hasil[hasil['full_scan']]
+    if not full_scan.empty:
+        print(f"❌ {full_scan['query'].nunique()} query masih full table scan:")
+        for query, table in full_scan[['query', 'table']].itertuples(index=False):
+            print(f"  - {query} (tabel {table})")
+        sys.exit(1)
+
+    print("✅ Semua query utama memakai index")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrasi skema database")
+    parser.add_argument("--status", action="store_true", help="Tampilkan status migrasi saja")
+    parser.add_argument("--sampai", type=int, default=None, help="Versi migrasi terakhir yang dijalankan")
+    parser.add_argument("--explain", action="store_true", help="Cek EXPLAIN query utama")
+    parser.add_argument("--prediksi", action="store_true", help="Migrasi database prediksi")
+    args = parser.parse_args()
+
+    if args.explain:
+        cek_explain()
+        return
+
+    if not args.status:
+        terpasang, errors = new_database.jalankan_migrasi(args.sampai, args.prediksi)
+        for nama in terpasang:
+            print(f"  ✅ {nama}")
+        if not terpasang and not errors:
+            print("Tidak ada migrasi baru")
+        if errors:
+            for err in errors:
+                print(f"  ❌ {err}")
+            sys.exit(1)
+        print("=" * 70)
+
+    tampilkan_status(args.prediksi)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Script untuk backfill / rebuild ledger HPP FIFO (tabel hpp_allocation),
+kolom pembelian_detail.qty_sisa dan cube gross profit (gp_cube) dari data
+pembelian & penjualan yang ada.
+
+CARA PAKAI:
+1. Pastikan tabel hpp_allocation, gp_cube & kolom qty_sisa sudah ada (python tools/migrate.py)
+2. Jalankan dari root project: python tools/rebuild_hpp_allocation.py
+3. Opsional, rebuild 1 barang saja: python tools/rebuild_hpp_allocation.py --barang 12
+
+CATATAN:
+- Jalankan SEKALI setelah upgrade, setelah itu ledger di-update otomatis
+  oleh insert/delete penjualan & pembelian
+- Aman dijalankan ulang kapan saja (hasil selalu dihitung ulang dari data mentah)
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import new_database
+
+
+def print_progress(selesai, total):
+    print(f"\r  {selesai}/{total} barang", end="", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild ledger HPP FIFO")
+    parser.add_argument("--barang", type=int, default=None, help="ID barang (default: semua)")
+    args = parser.parse_args()
+
+    print("Rebuild ledger HPP FIFO...")
+    start = time.perf_counter()
+
+    total, errors = new_database.rebuild_hpp_allocation(args.barang, progress_callback=print_progress)
+
+    print()
+    print("=" * 70)
+    print(f"Selesai: {total} barang dalam {time.perf_counter() - start:.1f} detik")
+
+    if errors:
+        print(f"⚠️ {len(errors)} barang gagal:")
+        for err in errors:
+            print(f"  - {err}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Script untuk backfill / rebuild / verifikasi tabel stok_harian
+(saldo stok per barang per tanggal) dari data pembelian & penjualan.
+
+CARA PAKAI:
+1. Pastikan tabel stok_harian sudah ada (python tools/migrate.py)
+2. Jalankan dari root project: python tools/rebuild_stok_harian.py
+3. Cek saja tanpa menulis: python tools/rebuild_stok_harian.py --verify
+
+CATATAN:
+- Jalankan SEKALI setelah upgrade, setelah itu stok_harian di-update otomatis
+  oleh insert/delete penjualan & pembelian
+- Setelah rebuild, hasil langsung diverifikasi ulang terhadap data mentah
+- Exit code 1 jika masih ada selisih
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import new_database
+
+
+def print_selisih(selisih, limit=20):
+    print(f"⚠️ {len(selisih)} baris stok_harian tidak cocok dengan data mentah:")
+    print(selisih.head(limit).to_string(index=False))
+    if len(selisih) > limit:
+        print(f"  ... dan {len(selisih) - limit} baris lainnya")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild / verifikasi stok_harian")
+    parser.add_argument("--verify", action="store_true", help="Hanya cek, tidak rebuild")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    if not args.verify:
+        print("Rebuild stok_harian...")
+        total = new_database.rebuild_stok_harian()
+        print(f"  {total:,} baris ditulis dalam {time.perf_counter() - start:.1f} detik")
+
+    print("Verifikasi stok_harian...")
+    selisih = new_database.verify_stok_harian()
+    print("=" * 70)
+
+    if not selisih.empty:
+        print_selisih(selisih)
+        sys.exit(1)
+
+    print(f"✅ stok_harian cocok dengan data mentah ({time.perf_counter() - start:.1f} detik)")
+
+
+if __name__ == "__main__":
+    main()